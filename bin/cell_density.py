@@ -0,0 +1,29 @@
+# Cell density raster: cell centers binned onto a grid of screen pixels, for populations too large
+# to draw (or see) as individual circles
+
+import numpy as np
+
+
+def bin_cells(x, y, extent, shape, weights=None):
+    """
+    (ny, nx) 2-D histogram of the points (x,y) over extent = [xmin, xmax, ymin, ymax]:
+    the number of points in each bin, or the sum of their weights. Points outside the extent are ignored.
+    """
+    xmin, xmax, ymin, ymax = extent
+    ny, nx = shape
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    keep = (x >= xmin) & (x < xmax) & (y >= ymin) & (y < ymax)
+    ix = ((x[keep] - xmin) * (nx / (xmax - xmin))).astype(np.int64)
+    iy = ((y[keep] - ymin) * (ny / (ymax - ymin))).astype(np.int64)
+    np.minimum(ix, nx - 1, out=ix)   # guard against rounding at the upper edges
+    np.minimum(iy, ny - 1, out=iy)
+    if weights is not None:
+        weights = np.asarray(weights, dtype=np.float64)[keep]
+    return np.bincount(iy * nx + ix, weights=weights, minlength=nx * ny).astype(np.float64).reshape(ny, nx)
+
+
+def screen_shape(ax, bin_pixels=1):
+    """(ny, nx) bins of bin_pixels x bin_pixels screen pixels covering the axes."""
+    bbox = ax.get_window_extent()
+    return max(1, int(round(bbox.height / bin_pixels))), max(1, int(round(bbox.width / bin_pixels)))
@@ -0,0 +1,140 @@
+# Drawable cells of one frame (outer and nucleus circles), from a snapshot SVG or the cell matrices
+
+import numpy as np
+import snapshot_svg
+import cell_matrix
+from spatial_index import CellGrid
+from frame_cache import file_key
+
+
+class CellFrame(object):
+    """
+    Circles of one frame, both outer and nucleus, parsed once.
+
+    circles(show_nucleus) picks the arrays to draw, so toggling the nuclei (or edges)
+    never re-reads or re-parses the frame's files.
+    """
+
+    def __init__(self, x, y, r, rgba, outer, num_cells, time_str='', width=None, key=None, matrix=None):
+        self.x = x
+        self.y = y
+        self.r = r
+        self.rgba = rgba             # float RGBA in [0,1], or uint8 (e.g., from a sidecar cache)
+        self.outer = outer           # True for a cell's outer circle, False for its nucleus
+        self.num_cells = num_cells
+        self.time_str = time_str     # e.g. "1d, 2h, 30m" ('' if unknown)
+        self.width = width           # of the SVG drawing (None if not from an SVG)
+        self.key = key               # file key(s) of the files it was read from
+        self.matrix = matrix         # the CellMatrix it was made from, if any (its cell k is outer circle k)
+        self._grid = None
+        self._colors = None
+        self._outer_only = None
+        self._circle_cell = None
+
+    def __len__(self):
+        return self.num_cells
+
+    @property
+    def nbytes(self):
+        return self.x.nbytes + self.y.nbytes + self.r.nbytes + self.rgba.nbytes + self.outer.nbytes
+
+    @property
+    def colors(self):
+        """(n,4) float32 RGBA in [0,1], as matplotlib wants them."""
+        if self._colors is None:
+            if self.rgba.dtype == np.uint8:
+                self._colors = self.rgba * np.float32(1./255)
+            else:
+                self._colors = self.rgba
+        return self._colors
+
+    def circles(self, show_nucleus):
+        """(x, y, r, rgba) of the circles to draw: all of them, or only the outer ones."""
+        if show_nucleus:
+            return self.x, self.y, self.r, self.colors
+        if self._outer_only is None:
+            keep = self.outer
+            self._outer_only = (self.x[keep], self.y[keep], self.r[keep], self.colors[keep])
+        return self._outer_only
+
+    def circles_in(self, show_nucleus, xmin, xmax, ymin, ymax):
+        """circles(show_nucleus) of only the cells whose outer circle intersects the rectangle."""
+        visible = self.grid.in_rect(xmin, xmax, ymin, ymax)
+        if show_nucleus:
+            # all circles (outer and nuclei) of the visible cells, in drawing order
+            keep = np.zeros(len(self.grid), dtype=bool)
+            keep[visible] = True
+            visible = np.flatnonzero(keep[self.circle_cell])
+        x, y, r, rgba = self.circles(show_nucleus)
+        return x[visible], y[visible], r[visible], rgba[visible]
+
+    @property
+    def circle_cell(self):
+        """Index (into the outer circles) of the cell each circle belongs to."""
+        if self._circle_cell is None:
+            self._circle_cell = np.cumsum(self.outer) - 1
+        return self._circle_cell
+
+    @property
+    def grid(self):
+        """Spatial index (CellGrid) of the cells' outer circles; built on first use, then kept with the frame."""
+        if self._grid is None:
+            x, y, r, _ = self.circles(False)
+            self._grid = CellGrid(x, y, r)
+        return self._grid
+
+    def pick(self, px, py):
+        """Index of the cell under (px,py), or None."""
+        return self.grid.pick(px, py)
+
+    def cell_info(self, k):
+        """Attributes of cell k (an index into the outer circles), for a readout."""
+        x, y, r, rgba = self.circles(False)
+        info = {'cell': k, 'x': float(x[k]), 'y': float(y[k]), 'radius': float(r[k]),
+                'color': 'rgb(%d,%d,%d)' % tuple(np.round(rgba[k][:3] * 255))}
+        if self.matrix is not None:
+            row = np.array(self.matrix.data[k])
+            for name in ['ID', 'cell_type', 'current_phase']:
+                if name in self.matrix:
+                    info[name] = int(row[self.matrix.labels[name][0]])
+            for name in ['total_volume'] + self.matrix.custom_names:
+                if name in self.matrix:
+                    info[name] = float(row[self.matrix.labels[name][0]])
+        return info
+
+
+def cache_key(fnames, tag='cells'):
+    """Frame cache key of the cells read from fnames (a snapshot, or an output xml and its cell matrix)."""
+    return tuple(file_key(f, tag) for f in fnames)
+
+
+def time_str(mins):
+    hrs = int(mins/60)
+    days = int(hrs/24)
+    return "%dd, %dh, %dm" % (days, hrs%24, mins - hrs*60)
+
+
+def from_svg(svg_fname, xmin=0., ymin=0., key=None):
+    cells = snapshot_svg.read_cells(svg_fname, xmin=xmin, ymin=ymin)
+    tstr = ''
+    if cells['time_text']:
+        svals = cells['time_text'].split()
+        # remove the ".00" on minutes
+        tstr = svals[2] + "d, " + svals[4] + "h, " + svals[7][:-3] + "m"
+    return CellFrame(cells['x'], cells['y'], cells['r'], cells['rgba'], cells['outer'], cells['num_cells'],
+                     tstr, cells['width'], key)
+
+
+def from_matrix(cells, mins=None, color_params=(), key=None):
+    """
+    From a CellMatrix, colored as nanobio colors the SVGs (see cell_matrix.nanobio_colors);
+    each cell's nucleus comes right after (on top of) its outer circle, as in the SVGs.
+    """
+    outer_rgba, nucleus_rgba = cell_matrix.nanobio_colors(cells, *color_params)
+    n = len(cells)
+    x = np.repeat(cells['position'][:, 0].astype(np.float32), 2)
+    y = np.repeat(cells['position'][:, 1].astype(np.float32), 2)
+    r = np.column_stack([cells.radius, cells.nuclear_radius]).astype(np.float32).ravel()
+    rgba = np.stack([outer_rgba, nucleus_rgba], axis=1).reshape(2*n, 4)
+    outer = np.tile([True, False], n)
+    return CellFrame(x, y, r, rgba, outer, n, time_str(mins) if mins is not None else '', None, key, cells)
@@ -0,0 +1,172 @@
+# Cells of an output frame from PhysiCell's binary output: the output%08d_cells_physicell.mat matrix
+# (one column per cell), with its rows named by the <labels> declared in output%08d.xml, e.g.
+#   <label index="1" size="3">position</label>
+#   <label index="34" size="1">NP1</label>
+#   <label index="38" size="100">NPs bins</label>
+
+import os
+import math
+import xml.etree.ElementTree as ET
+import numpy as np
+import mat_reader
+
+# PhysiCell_constants phase codes of dead cells
+APOPTOTIC = 100
+NECROTIC = (101, 102, 103)   # necrotic_swelling, necrotic_lysed, necrotic
+
+# the last of PhysiCell's own labels; custom_data variables follow it
+LAST_STANDARD_LABEL = 'motility_reserved'
+
+DEFAULT_COLUMNS = ('position', 'total_volume', 'nuclear_volume', 'cell_type', 'current_phase')
+
+
+def read_schema(xml_fname):
+    """
+    ({label: (row, size)}, cells .mat filename) of the PhysiCell <simplified_data> in an output xml.
+    """
+    labels = {}
+    mat_fname = None
+    in_physicell = False
+    for event, elm in ET.iterparse(xml_fname, events=('start', 'end')):
+        if event == 'start':
+            if elm.tag == 'simplified_data' and elm.attrib.get('source') == 'PhysiCell':
+                in_physicell = True
+            continue
+        if not in_physicell:
+            continue
+        if elm.tag == 'label':
+            labels[elm.text.strip()] = (int(elm.attrib['index']), int(elm.attrib.get('size', 1)))
+        elif elm.tag == 'filename':
+            mat_fname = elm.text.strip()
+        elif elm.tag == 'simplified_data':
+            break
+    if not labels or mat_fname is None:
+        raise ValueError("%s: no PhysiCell cell labels found" % xml_fname)
+    return labels, os.path.join(os.path.dirname(xml_fname), mat_fname)
+
+
+def custom_names(labels, vectors=False):
+    """Scalar (and, with vectors=True, vector) custom_data variables of a schema's {label: (row, size)}, in index order."""
+    names = sorted(labels, key=lambda name: labels[name][0])
+    if LAST_STANDARD_LABEL not in names:
+        return []
+    return [name for name in names[names.index(LAST_STANDARD_LABEL)+1:] if vectors or labels[name][1] == 1]
+
+
+class CellMatrix(object):
+    """
+    Cells of one output frame as named NumPy columns, e.g.
+      cells['position'] -> (n,3), cells['NP1'] -> (n,), cells['NPs bins'] -> (n,100)
+
+    The .mat file is memory-mapped; a column is copied out of the map the first time it is used.
+    """
+
+    def __init__(self, data, labels):
+        self.data = data       # (num_cells, num_rows) memmap: matrix column k (cell k) is data[k]
+        self.labels = labels   # name -> (row, size)
+        self.columns = {}
+
+    def __len__(self):
+        return self.data.shape[0]
+
+    def __contains__(self, name):
+        return name in self.labels
+
+    def __getitem__(self, name):
+        if name not in self.columns:
+            row, size = self.labels[name]
+            self.columns[name] = np.array(self.data[:, row] if size == 1 else self.data[:, row:row+size])
+        return self.columns[name]
+
+    @property
+    def names(self):
+        return sorted(self.labels, key=lambda name: self.labels[name][0])
+
+    @property
+    def custom_names(self):
+        """Scalar custom_data variables, in custom_data index order."""
+        return custom_names(self.labels)
+
+    @property
+    def nbytes(self):
+        return sum(v.nbytes for v in self.columns.values())
+
+    @property
+    def radius(self):
+        return np.cbrt(self['total_volume'] * (0.75 / math.pi))
+
+    @property
+    def nuclear_radius(self):
+        return np.cbrt(self['nuclear_volume'] * (0.75 / math.pi))
+
+    @property
+    def dead(self):
+        return np.isin(self['current_phase'], (APOPTOTIC,) + NECROTIC)
+
+
+def matrix_files(xml_fname):
+    """[output%08d.xml, output%08d_cells_physicell.mat] of a frame."""
+    return [xml_fname, xml_fname[:-len('.xml')] + '_cells_physicell.mat']
+
+
+def read_cell_matrix(xml_fname, columns=DEFAULT_COLUMNS):
+    """CellMatrix for an output%08d.xml, with the given columns already copied out of the memory map."""
+    labels, mat_fname = read_schema(xml_fname)
+    header = mat_reader.read_header(mat_fname)
+    if header.rows < max(row + size for row, size in labels.values()):
+        raise ValueError("%s: %d rows, but %d labels in %s" % (mat_fname, header.rows, len(labels), xml_fname))
+    cells = CellMatrix(mat_reader.memmap(mat_fname, header), labels)
+    for name in columns:
+        if name in cells:
+            cells[name]
+    return cells
+
+
+def read_color_params(config_fname):
+    """(custom_data_index, blue_value, yellow_value) of <visualization> in a config.xml, or the defaults."""
+    params = [2, 0., 1.]
+    try:
+        node = ET.parse(config_fname).getroot().find('.//visualization')
+    except (OSError, ET.ParseError):
+        node = None
+    if node is not None:
+        for k, (tag, cast) in enumerate([('custom_data_index', int), ('blue_value', float), ('yellow_value', float)]):
+            if node.find(tag) is not None:
+                params[k] = cast(node.find(tag).text)
+    return tuple(params)
+
+
+def nanobio_colors(cells, custom_data_index=2, blue_value=0., yellow_value=1.):
+    """
+    (outer, nucleus) (n,4) float32 RGBA colors, as nanobio_coloring_function() draws them in the SVGs:
+    immune cells (type 1) black; live cells rgb(SV,SV,255-SV), SV scaled from a custom_data variable;
+    apoptotic red; necrotic brown; other dead cells black.
+    """
+    n = len(cells)
+    outer = np.zeros((n, 4), dtype=np.float32)
+    outer[:, 3] = 1.
+    nucleus = outer.copy()
+    if n == 0:
+        return outer, nucleus
+    phase = cells['current_phase']
+    live = ~cells.dead & (cells['cell_type'] != 1)
+
+    custom_names = cells.custom_names
+    if custom_data_index < len(custom_names):
+        scaled = (cells[custom_names[custom_data_index]] - blue_value) / (yellow_value - blue_value)
+    else:
+        scaled = np.zeros(n)
+    sv = np.round(np.clip(scaled, 0., 1.) * 255.) / 255.
+    outer[live, 0] = sv[live]
+    outer[live, 1] = sv[live]
+    outer[live, 2] = 1. - sv[live]
+    # nanobio.cpp halves the character codes of "rgb" for the nucleus: always rgb(57,52,49)
+    nucleus[live, :3] = np.array([57, 52, 49]) / 255.
+
+    apoptotic = (phase == APOPTOTIC) & (cells['cell_type'] != 1)
+    outer[apoptotic, :3] = (1., 0., 0.)
+    nucleus[apoptotic, :3] = np.array([125, 0, 0]) / 255.
+    necrotic = np.isin(phase, NECROTIC) & (cells['cell_type'] != 1)
+    outer[necrotic, :3] = np.array([250, 138, 38]) / 255.
+    nucleus[necrotic, :3] = np.array([139, 69, 19]) / 255.
+    return outer, nucleus
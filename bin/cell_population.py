@@ -0,0 +1,92 @@
+# Cell population over every frame of a run: counts per class, live/dead totals and total volume
+#
+# The classes are those nanobio_coloring_function() draws, from the snapshot fills or the cell matrices.
+
+import math
+import numpy as np
+import snapshot_svg
+import cell_matrix
+from frame_index import read_current_time
+from run_index import RunIndex
+
+CLASSES = ('immune', 'live', 'apoptotic', 'necrotic')
+COLUMNS = ('time',) + CLASSES + ('live total', 'dead total', 'total', 'total volume')
+
+SVG_PATTERN = 'snapshot%08d.svg'
+XML_PATTERN = 'output%08d.xml'
+
+# outer circle fills (uint8 RGB) of the classes, as nanobio.cpp writes them
+_black = (0, 0, 0)
+_apoptotic = (255, 0, 0)
+_necrotic = (250, 138, 38)
+
+
+def _row(mins, immune, live, apoptotic, necrotic, live_total, dead_total, volume):
+    return np.array([mins, immune, live, apoptotic, necrotic, live_total, dead_total,
+                     immune + live + apoptotic + necrotic, volume], dtype=np.float64)
+
+
+def svg_time(time_text):
+    """Simulated time (min) of a snapshot's "Current time: 1 days, 2 hours, and 30.00 minutes", or NaN."""
+    svals = time_text.split()
+    try:
+        return int(svals[2]) * 1440. + int(svals[4]) * 60. + float(svals[7])
+    except (IndexError, ValueError):
+        return float('nan')
+
+
+def svg_population(svg_fname):
+    """Row of COLUMNS for a snapshot, its cells classified by the fill of their outer circles."""
+    cells = snapshot_svg.read_cells(svg_fname)
+    outer = cells['outer']
+    rgb = np.round(cells['rgba'][outer, :3] * 255).astype(np.int32)
+    code = (rgb[:, 0] << 16) | (rgb[:, 1] << 8) | rgb[:, 2]
+    def count(color):
+        return int(np.count_nonzero(code == ((color[0] << 16) | (color[1] << 8) | color[2])))
+    immune, apoptotic, necrotic = count(_black), count(_apoptotic), count(_necrotic)
+    live = len(code) - immune - apoptotic - necrotic
+    volume = float((cells['r'][outer].astype(np.float64) ** 3).sum() * (4. * math.pi / 3.))
+    # dead immune cells are black too, so from colors alone they count as live
+    return _row(svg_time(cells['time_text']), immune, live, apoptotic, necrotic,
+                immune + live, apoptotic + necrotic, volume)
+
+
+def matrix_population(xml_fname):
+    """Row of COLUMNS for an output frame, its cells classified by cell_type and current_phase."""
+    cells = cell_matrix.read_cell_matrix(xml_fname, ('total_volume', 'cell_type', 'current_phase'))
+    immune_type = cells['cell_type'] == 1
+    dead = cells.dead
+    phase = cells['current_phase']
+    immune = int(np.count_nonzero(immune_type))
+    apoptotic = int(np.count_nonzero(~immune_type & (phase == cell_matrix.APOPTOTIC)))
+    necrotic = int(np.count_nonzero(~immune_type & np.isin(phase, cell_matrix.NECROTIC)))
+    live = len(cells) - immune - apoptotic - necrotic
+    return _row(read_current_time(xml_fname), immune, live, apoptotic, necrotic,
+                int(np.count_nonzero(~dead)), int(np.count_nonzero(dead)), float(cells['total_volume'].sum()))
+
+
+class PopulationIndex(object):
+    """Per-run population array, from the snapshots (source='svg') or the cell matrices ('mat')."""
+
+    def __init__(self, output_dir, source='svg', max_workers=None):
+        self.source = source
+        if source == 'svg':
+            pattern, func = SVG_PATTERN, svg_population
+        else:
+            pattern, func = XML_PATTERN, matrix_population
+        self.index = RunIndex(output_dir, 'cell_population_' + source, pattern, func, max_workers=max_workers)
+
+    @property
+    def output_dir(self):
+        return self.index.output_dir
+
+    def refresh(self):
+        return self.index.refresh()
+
+    def values(self):
+        """(frames, (num frames, len(COLUMNS)) array); the array is None if nothing is indexed."""
+        return self.index.values()
+
+    def column(self, name):
+        frames, values = self.values()
+        return frames, (values[:, COLUMNS.index(name)] if values is not None else None)
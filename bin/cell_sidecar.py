@@ -0,0 +1,102 @@
+# On-disk cache of parsed snapshot SVGs, so a run's cells are parsed from text only once
+#
+# For <output_dir>/snapshot%08d.svg we keep, in <output_dir>/cell_cache/:
+#   snapshot%08d.bin   the columns one after another (float32 x, y, r; uint8 RGBA; bool outer)
+#   snapshot%08d.json  the SVG's mtime/size (the sidecar is stale, and rebuilt, if they change),
+#                      the x,y offset used, each column's offset, and the frame's cells, time and width
+# The .bin is memory-mapped and each column is a contiguous view of it, so nothing is copied up front.
+
+import os
+import json
+import numpy as np
+import cell_frame
+
+SIDECAR_DIR = 'cell_cache'
+VERSION = 2
+
+COLUMNS = (('x', '<f4', ()), ('y', '<f4', ()), ('r', '<f4', ()), ('rgba', 'u1', (4,)), ('outer', '?', ()))
+ALIGN = 8   # column offsets are multiples of this
+
+
+def sidecar_fnames(svg_fname):
+    """(.bin, .json) sidecar filenames of a snapshot SVG."""
+    base = os.path.join(os.path.dirname(svg_fname), SIDECAR_DIR, os.path.splitext(os.path.basename(svg_fname))[0])
+    return base + '.bin', base + '.json'
+
+
+def _meta(svg_fname, xmin, ymin):
+    st = os.stat(svg_fname)
+    return {'version': VERSION, 'mtime_ns': st.st_mtime_ns, 'size': st.st_size, 'xmin': float(xmin), 'ymin': float(ymin)}
+
+
+def read_meta(svg_fname, xmin=0., ymin=0.):
+    """The .json of a snapshot SVG's sidecar, or None if there is none or it is stale."""
+    try:
+        with open(sidecar_fnames(svg_fname)[1]) as f:
+            meta = json.load(f)
+        expected = _meta(svg_fname, xmin, ymin)
+    except (OSError, ValueError):
+        return None
+    if any(meta.get(k) != v for k, v in expected.items()):
+        return None
+    return meta
+
+
+def load(svg_fname, xmin=0., ymin=0., key=None):
+    """CellFrame from the sidecar of a snapshot SVG, or None if there is none or it is stale."""
+    meta = read_meta(svg_fname, xmin, ymin)
+    if meta is None:
+        return None
+    n = meta.get('num_circles', 0)
+    try:
+        raw = np.memmap(sidecar_fnames(svg_fname)[0], dtype=np.uint8, mode='r') if n else np.zeros(0, np.uint8)
+        columns = {}
+        for name, dtype, shape in COLUMNS:
+            dtype = np.dtype(dtype)
+            offset = meta['offsets'][name] if n else 0
+            nbytes = n * dtype.itemsize * int(np.prod(shape))
+            if offset + nbytes > len(raw):
+                return None
+            columns[name] = raw[offset:offset + nbytes].view(dtype).reshape((n,) + shape)
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    return cell_frame.CellFrame(columns['x'], columns['y'], columns['r'], columns['rgba'], columns['outer'],
+                                meta['num_cells'], meta['time_str'], meta['width'], key)
+
+
+def save(svg_fname, cells, xmin=0., ymin=0.):
+    """Write the sidecar of a snapshot SVG; silently skipped if the run directory is read-only."""
+    bin_fname, json_fname = sidecar_fnames(svg_fname)
+    columns = {'x': cells.x, 'y': cells.y, 'r': cells.r, 'rgba': np.round(cells.colors * 255), 'outer': cells.outer}
+    offsets = {}
+    offset = 0
+    for name, dtype, shape in COLUMNS:
+        columns[name] = np.ascontiguousarray(columns[name], dtype=dtype)
+        offsets[name] = offset
+        offset += -(-columns[name].nbytes // ALIGN) * ALIGN
+    meta = _meta(svg_fname, xmin, ymin)
+    meta.update({'num_circles': len(cells.x), 'offsets': offsets, 'num_cells': cells.num_cells,
+                 'time_str': cells.time_str, 'width': cells.width})
+    try:
+        os.makedirs(os.path.dirname(bin_fname), exist_ok=True)
+        # the .json is written last: a sidecar is only used once both files are complete
+        with open(bin_fname + '.tmp', 'wb') as f:
+            for name, _, _ in COLUMNS:
+                f.seek(offsets[name])
+                f.write(columns[name].tobytes())
+            f.truncate(offset)
+        os.replace(bin_fname + '.tmp', bin_fname)
+        with open(json_fname + '.tmp', 'w') as f:
+            json.dump(meta, f)
+        os.replace(json_fname + '.tmp', json_fname)
+    except OSError:   # e.g., a read-only cached run
+        pass
+
+
+def read_cells(svg_fname, xmin=0., ymin=0., key=None):
+    """CellFrame of a snapshot SVG: from its sidecar if up to date, else parsed (and the sidecar written)."""
+    cells = load(svg_fname, xmin, ymin, key)
+    if cells is None:
+        cells = cell_frame.from_svg(svg_fname, xmin, ymin, key)
+        save(svg_fname, cells, xmin, ymin)
+    return cells
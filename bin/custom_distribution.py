@@ -0,0 +1,121 @@
+# Per-frame distributions of a cell custom_data variable (e.g. "NP1", "Drug effect") over a run
+#
+# Each frame is binned over its own [min, max]; heatmap() re-bins the frames onto common edges.
+# A vector variable (e.g. "NPs bins") is summed over the cells instead.
+
+import re
+import numpy as np
+import cell_matrix
+from cell_population import XML_PATTERN
+from run_index import RunIndex
+
+NUM_BINS = 128
+QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+STATS = ('count', 'min', 'max', 'mean') + tuple('q%02d' % round(q * 100) for q in QUANTILES)
+
+
+def _histogram(values, lo, hi, num_bins):
+    """Counts of values in num_bins equal bins over [lo, hi] (hi included in the last bin)."""
+    k = ((values - lo) * (num_bins / (hi - lo))).astype(np.int64)
+    np.clip(k, 0, num_bins - 1, out=k)
+    return np.bincount(k, minlength=num_bins).astype(np.float64)
+
+
+def _weighted_quantiles(hist, lo, hi):
+    """Quantiles of a histogram over [lo, hi], interpolated linearly within its bins."""
+    cdf = np.concatenate([[0.], np.cumsum(hist)])
+    if cdf[-1] <= 0:
+        return np.full(len(QUANTILES), np.nan)
+    edges = np.linspace(lo, hi, len(hist) + 1)
+    return np.interp(np.array(QUANTILES) * cdf[-1], cdf, edges)
+
+
+def frame_distribution(xml_fname, name, num_bins=NUM_BINS):
+    """Row of STATS followed by the histogram of a custom_data variable in an output frame (see distribution())."""
+    cells = cell_matrix.read_cell_matrix(xml_fname, (name,))
+    if name not in cells:
+        raise ValueError("%s: no cell variable %r" % (xml_fname, name))
+    return distribution(cells, name, num_bins)
+
+
+def distribution(cells, name, num_bins=NUM_BINS):
+    """
+    Row of STATS followed by the histogram of a custom_data variable of a CellMatrix.
+
+    A constant variable is all in the first bin; a vector variable's entries are summed over the cells.
+    """
+    values = np.asarray(cells[name], dtype=np.float64)
+    if values.ndim == 2:
+        hist = values.sum(axis=0)
+        size = len(hist)
+        total = hist.sum()
+        mean = (hist @ (np.arange(size) + 0.5)) / total if total > 0 else np.nan
+        stats = [len(values), 0., size, mean] + list(_weighted_quantiles(hist, 0., size))
+        return np.concatenate([stats, hist])
+    values = values[np.isfinite(values)]
+    if len(values) == 0:
+        return np.concatenate([[0.], np.full(len(STATS) - 1, np.nan), np.zeros(num_bins)])
+    lo, hi = float(values.min()), float(values.max())
+    stats = [len(values), lo, hi, values.mean()] + list(np.quantile(values, QUANTILES))
+    if hi > lo:
+        hist = _histogram(values, lo, hi, num_bins)
+    else:   # all cells alike
+        hist = np.zeros(num_bins)
+        hist[0] = len(values)
+    return np.concatenate([stats, hist])
+
+
+def rebin(hists, los, his, edges):
+    """
+    (num frames, len(edges)-1) histograms on common edges, from per-frame histograms over [lo, hi].
+    A constant frame (lo == hi) goes into the bin holding its value.
+    """
+    out = np.zeros((len(hists), len(edges) - 1))
+    for k, (hist, lo, hi) in enumerate(zip(hists, los, his)):
+        if not np.isfinite(lo) or not np.isfinite(hi):
+            continue
+        if hi <= lo:
+            if edges[0] <= lo <= edges[-1]:
+                out[k, min(np.searchsorted(edges, lo, side='right') - 1, len(edges) - 2)] = hist.sum()
+            continue
+        cdf = np.concatenate([[0.], np.cumsum(hist)])
+        out[k] = np.diff(np.interp(edges, np.linspace(lo, hi, len(hist) + 1), cdf))
+    return out
+
+
+class CustomDistributionIndex(object):
+    """Per-run distributions of one custom_data variable (see RunIndex)."""
+
+    def __init__(self, output_dir, name, num_bins=NUM_BINS, max_workers=None):
+        self.name = name
+        self.index = RunIndex(output_dir, 'custom_distribution_' + re.sub(r'\W+', '_', name), XML_PATTERN,
+                              frame_distribution, args=(name, num_bins), max_workers=max_workers)
+
+    @property
+    def output_dir(self):
+        return self.index.output_dir
+
+    def refresh(self):
+        return self.index.refresh()
+
+    def stats(self):
+        """(frames, (num frames, len(STATS)) array); the array is None if nothing is indexed."""
+        frames, values = self.index.values()
+        return frames, (values[:, :len(STATS)] if values is not None else None)
+
+    def heatmap(self, num_bins=None, value_range=None):
+        """(frames, bin edges, counts) on common bins over value_range (default: the run's range)."""
+        frames, values = self.index.values()
+        if values is None:
+            return frames, None, None
+        nstats = len(STATS)
+        hists = values[:, nstats:]
+        los, his = values[:, STATS.index('min')], values[:, STATS.index('max')]
+        if value_range is None:
+            finite = np.isfinite(los)
+            value_range = (los[finite].min(), his[finite].max()) if finite.any() else (0., 1.)
+            if value_range[1] <= value_range[0]:   # one value over the whole run
+                value_range = (value_range[0] - 0.5, value_range[0] + 0.5)
+        edges = np.linspace(value_range[0], value_range[1], (num_bins or hists.shape[1]) + 1)
+        return frames, edges, rebin(hists, los, his, edges)
+
@@ -0,0 +1,166 @@
+# Nanoparticle dose accounting over a run: NP1 in the domain and in the cells at each frame
+#
+# The boundary inflow isn't written; it is implied by the mass balance
+#   inflow(t) = total(t) - total(t0) + decay_rate * integral of extracellular dt
+
+import os
+import re
+import xml.etree.ElementTree as ET
+import numpy as np
+import mat_reader
+import cell_matrix
+import cell_frame
+from frame_cache import file_key
+from frame_index import read_current_time
+from cell_population import XML_PATTERN
+from substrate_stats import FIRST_FIELD_ROW, VOLUME_ROW, CHUNK_VOXELS
+from run_index import RunIndex
+
+COLUMNS = ('time', 'extracellular', 'intracellular', 'decay rate')
+SERIES = ('extracellular', 'intracellular', 'total', 'decayed', 'inflow', 'inflow rate')
+
+
+def read_substrate(xml_fname, name):
+    """(row in the microenvironment .mat, decay rate (1/min), .mat filename) of a substrate of an output xml."""
+    row = decay = mat_fname = None
+    variable = None
+    in_data = False
+    for event, elm in ET.iterparse(xml_fname, events=('start', 'end')):
+        if event == 'start':
+            if elm.tag == 'variable':
+                variable = elm.attrib.get('name')
+                if variable == name:
+                    row = FIRST_FIELD_ROW + int(elm.attrib['ID'])
+            elif elm.tag == 'data':
+                in_data = True
+            continue
+        if elm.tag == 'decay_rate' and variable == name:
+            decay = float(elm.text)
+        elif elm.tag == 'filename' and in_data:
+            mat_fname = elm.text.strip()
+        elif elm.tag == 'data':
+            in_data = False
+        elif elm.tag == 'microenvironment':
+            break
+    if row is None or mat_fname is None:
+        raise ValueError("%s: no substrate %r" % (xml_fname, name))
+    return row, (decay or 0.), os.path.join(os.path.dirname(xml_fname), mat_fname)
+
+
+def read_config_substrate(config_fname, name):
+    """(decay rate, (Dirichlet enabled, value)) of a substrate in a config; None if not found."""
+    try:
+        root = ET.parse(config_fname).getroot()
+    except (OSError, ET.ParseError):
+        return None, None
+    for var in root.iter('variable'):
+        if var.attrib.get('name') != name:
+            continue
+        decay = var.find('physical_parameter_set/decay_rate')
+        dirichlet = var.find('Dirichlet_boundary_condition')
+        try:
+            decay = float(decay.text) if decay is not None else None
+            if dirichlet is not None:
+                dirichlet = dirichlet.attrib.get('enabled', 'false').lower() == 'true', float(dirichlet.text)
+        except (TypeError, ValueError):
+            return None, None
+        return decay, dirichlet
+    return None, None
+
+
+def field_integral(mat_fname, row):
+    """sum(value * voxel volume) of one substrate row, streaming through the matrix a chunk of voxels at a time."""
+    header = mat_reader.read_header(mat_fname)
+    if not FIRST_FIELD_ROW <= row < header.rows:
+        raise ValueError("%s: no substrate row %d" % (mat_fname, row))
+    mm = mat_reader.memmap(mat_fname, header)
+    total = 0.
+    for k in range(0, header.cols, CHUNK_VOXELS):
+        block = mm[k:k + CHUNK_VOXELS]
+        total += float(np.dot(block[:, VOLUME_ROW].astype(np.float64), block[:, row]))
+    del mm
+    return total
+
+
+def cell_total(xml_fname, name, cells=None):
+    """Sum over the cells of a custom_data variable (NaN if the cells don't have it)."""
+    if cells is None:
+        try:
+            cells = cell_matrix.read_cell_matrix(xml_fname, ())
+        except OSError:   # no cell matrix written
+            return np.nan
+    if name not in cells:
+        return np.nan
+    return float(cells[name].sum(dtype=np.float64))
+
+
+def frame_dose(xml_fname, substrate='NP1', cell_variable='NP1'):
+    """Row of COLUMNS for an output frame."""
+    row, decay, mat_fname = read_substrate(xml_fname, substrate)
+    return np.array([read_current_time(xml_fname), field_integral(mat_fname, row),
+                     cell_total(xml_fname, cell_variable), decay])
+
+
+def cached_dose(frame_cache, xml_fname, substrate='NP1', cell_variable='NP1'):
+    """frame_dose() from a SubstrateTab's frame cache, or None if the field isn't cached."""
+    row, decay, mat_fname = read_substrate(xml_fname, substrate)
+    matrix = frame_cache.get(file_key(mat_fname))   # the whole matrix, if decoded with scipy
+    if matrix is not None:
+        field, volume = matrix[row, :], matrix[VOLUME_ROW, :]
+    else:
+        field = frame_cache.get(file_key(mat_fname, row))
+        if field is None:
+            return None
+        volume = frame_cache.get(file_key(mat_fname, VOLUME_ROW))
+        if volume is None:
+            volume = mat_reader.read_row(mat_fname, VOLUME_ROW)
+    try:
+        cells = frame_cache.get(cell_frame.cache_key(cell_matrix.matrix_files(xml_fname)))
+    except OSError:   # no cell matrix written
+        cells = None
+    cells = cells.matrix if cells is not None else None
+    return np.array([read_current_time(xml_fname), float(np.dot(volume, field)),
+                     cell_total(xml_fname, cell_variable, cells), decay])
+
+
+def dose_series(values, decay_rate=None):
+    """
+    {name: array} of SERIES and 'time' from rows of COLUMNS; decay_rate replaces the frames' (rounded) ones.
+    """
+    t, ext, internal, decay = values.T
+    if decay_rate is not None:
+        decay = np.full(len(t), decay_rate)
+    total = ext + np.nan_to_num(internal)
+    loss = decay * ext
+    decayed = np.concatenate([[0.], np.cumsum(np.diff(t) * (loss[1:] + loss[:-1]) / 2)])
+    inflow = total - total[0] + decayed
+    rate = np.gradient(inflow, t) if len(t) > 1 else np.zeros(len(t))
+    return {'time': t, 'extracellular': ext, 'intracellular': internal, 'total': total,
+            'decayed': decayed, 'inflow': inflow, 'inflow rate': rate}
+
+
+class DoseIndex(object):
+    """Per-run dose array (see RunIndex)."""
+
+    def __init__(self, output_dir, substrate='NP1', cell_variable='NP1', max_workers=None):
+        self.substrate = substrate
+        self.cell_variable = cell_variable
+        self.index = RunIndex(output_dir, 'dose_' + re.sub(r'\W+', '_', substrate), XML_PATTERN, frame_dose,
+                              args=(substrate, cell_variable), max_workers=max_workers)
+        self.decay_rate, self.dirichlet = read_config_substrate(os.path.join(output_dir, 'config.xml'), substrate)
+
+    @property
+    def output_dir(self):
+        return self.index.output_dir
+
+    def refresh(self, frame_cache=None):
+        """Add new frames, taking those decoded in frame_cache from it."""
+        lookup = None
+        if frame_cache is not None:
+            lookup = lambda fname: cached_dose(frame_cache, fname, self.substrate, self.cell_variable)
+        return self.index.refresh(lookup)
+
+    def series(self):
+        """(frames, dose_series() dict); the dict is None if nothing is indexed."""
+        frames, values = self.index.values()
+        return frames, (dose_series(values, self.decay_rate) if values is not None else None)
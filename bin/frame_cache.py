@@ -0,0 +1,109 @@
+# Frame cache: bounded, in-memory LRU of decoded output files (.mat, .xml, .svg)
+
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+
+
+def file_key(fname, tag=''):
+    """
+    Key for a decoded file: (abs path, mtime, size, tag).
+
+    The mtime/size make an entry go stale automatically when PhysiCell (re)writes
+    the file; "tag" lets several decoded views of the same file coexist (e.g., one row vs. the whole matrix).
+    """
+    st = os.stat(fname)
+    return (os.path.abspath(fname), st.st_mtime_ns, st.st_size, tag)
+
+
+def sizeof(value):
+    """Approximate memory (bytes) held by a cached value (arrays, or containers of them)."""
+    if value is None:
+        return 0
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(sizeof(v) for v in value.values()) + 64
+    if isinstance(value, (list, tuple)):
+        return sum(sizeof(v) for v in value) + 64
+    if hasattr(value, 'nbytes'):
+        return int(value.nbytes)
+    return 64
+
+
+class FrameCache(object):
+    """
+    Least-recently-used cache with a byte budget.
+
+    Values are evicted, oldest first, once the sum of their sizes exceeds max_bytes.
+    A value larger than the whole budget is returned to the caller but never stored.
+    Safe to share between the GUI thread and background workers.
+    """
+
+    def __init__(self, max_bytes=512*1024*1024):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()   # key -> (value, nbytes)
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key][0]
+
+    def put(self, key, value, nbytes=None):
+        if nbytes is None:
+            nbytes = sizeof(value)
+        with self._lock:
+            if key in self._entries:
+                self.nbytes -= self._entries.pop(key)[1]
+            if nbytes > self.max_bytes:
+                return value
+            self._entries[key] = (value, nbytes)
+            self.nbytes += nbytes
+            self._evict()
+        return value
+
+    def get_or_load(self, fname, loader, tag=''):
+        """Return loader(fname), decoding the file only if (fname, mtime, size, tag) is not cached."""
+        key = file_key(fname, tag)
+        value = self.get(key, self)   # self is a sentinel; None is a legit cached value
+        if value is self:
+            value = self.put(key, loader(fname))
+        return value
+
+    def set_max_bytes(self, max_bytes):
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def discard(self, key):
+        with self._lock:
+            if key in self._entries:
+                self.nbytes -= self._entries.pop(key)[1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def _evict(self):
+        while self.nbytes > self.max_bytes and self._entries:
+            _, (_, nbytes) = self._entries.popitem(last=False)
+            self.nbytes -= nbytes
@@ -0,0 +1,95 @@
+# Frame # -> simulated time index for the output%08d.xml files of a run
+
+import os
+import glob
+import json
+import threading
+import xml.etree.ElementTree as ET
+
+
+def read_current_time(xml_fname):
+    """Simulated time (min) from the <metadata> header only; stops parsing before the (large) body."""
+    for event, elm in ET.iterparse(xml_fname, events=('end',)):
+        if elm.tag == 'current_time':
+            return float(elm.text)
+        if elm.tag == 'metadata':
+            break
+    raise ValueError("%s: no <current_time> in <metadata>" % xml_fname)
+
+
+class FrameTimeIndex(object):
+    """
+    Maps frame # to simulated time for output%08d.xml files in output_dir.
+
+    Entries are stored with the file's mtime and size, saved to <output_dir>/frame_times.json
+    (when the directory is writable), and re-read only if the file changes.
+    """
+
+    index_name = 'frame_times.json'
+
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+        self.times = {}    # frame -> time (min)
+        self.stamps = {}   # frame -> (mtime_ns, size)
+        self.dirty = False
+        self._lock = threading.Lock()
+        self.load()
+
+    @property
+    def index_fname(self):
+        return os.path.join(self.output_dir, self.index_name)
+
+    def xml_fname(self, frame):
+        return os.path.join(self.output_dir, "output%08d.xml" % frame)
+
+    def load(self):
+        try:
+            with open(self.index_fname) as f:
+                entries = json.load(f)['frames']
+        except (OSError, ValueError, KeyError):
+            return
+        for frame, (t, mtime_ns, size) in entries.items():
+            self.times[int(frame)] = t
+            self.stamps[int(frame)] = (mtime_ns, size)
+
+    def save(self):
+        entries = {str(k): [self.times[k]] + list(self.stamps[k]) for k in sorted(self.times)}
+        tmp_fname = self.index_fname + '.tmp'
+        try:
+            with open(tmp_fname, 'w') as f:
+                json.dump({'frames': entries}, f)
+            os.replace(tmp_fname, self.index_fname)
+        except OSError:   # e.g., a read-only cached run; keep the index in memory only
+            pass
+
+    def _update(self, frame):
+        """(Re)read one frame's header if its file is new or changed; True if the index changed."""
+        st = os.stat(self.xml_fname(frame))
+        stamp = (st.st_mtime_ns, st.st_size)
+        if self.stamps.get(frame) == stamp:
+            return False
+        self.times[frame] = read_current_time(self.xml_fname(frame))
+        self.stamps[frame] = stamp
+        return True
+
+    def refresh(self):
+        """Add entries for output files written since the last refresh."""
+        changed = False
+        with self._lock:
+            for fname in glob.glob(os.path.join(self.output_dir, 'output*.xml')):
+                base = os.path.basename(fname)
+                if len(base) != 18 or not base[6:14].isdigit():   # "output%08d.xml" only
+                    continue
+                try:
+                    changed |= self._update(int(base[6:14]))
+                except (OSError, ValueError, ET.ParseError):   # still being written
+                    continue
+            if changed or self.dirty:
+                self.save()
+                self.dirty = False
+
+    def time(self, frame):
+        """Simulated time (min) of a frame; raises OSError if there is no such output file."""
+        with self._lock:
+            self.dirty |= self._update(frame)   # saved on the next refresh()
+            return self.times[frame]
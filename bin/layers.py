@@ -0,0 +1,51 @@
+# Compositing of separately rendered plot layers (e.g., substrate below, cells on top)
+#
+# A layer is the (height, width, 4) uint8 RGBA buffer of an Agg canvas: the bottom layer opaque, the
+# ones above it transparent wherever they draw nothing. Matplotlib's Agg buffers are not premultiplied.
+
+import io
+import numpy as np
+from PIL import Image as PILImage
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+
+def agg_canvas(fig):
+    """The figure's Agg canvas (attached on first use)."""
+    if not isinstance(fig.canvas, FigureCanvasAgg):
+        FigureCanvasAgg(fig)
+    return fig.canvas
+
+
+def render(fig):
+    """RGBA of the whole figure, as drawn now."""
+    canvas = agg_canvas(fig)
+    canvas.draw()
+    return np.array(canvas.buffer_rgba())
+
+
+def render_artists(fig, artists):
+    """RGBA of only the given artists (in order), on a transparent background; the figure's layout is not recomputed."""
+    canvas = agg_canvas(fig)
+    renderer = canvas.get_renderer()
+    renderer.clear()
+    for artist in artists:
+        artist.draw(renderer)
+    return np.array(canvas.buffer_rgba())
+
+
+def composite(bottom, *layers):
+    """RGB of the layers alpha-blended, in order, over an opaque bottom layer."""
+    out = bottom[..., :3].astype(np.float32)
+    for layer in layers:
+        if layer is None:
+            continue
+        alpha = layer[..., 3:4] * np.float32(1./255)
+        out += (layer[..., :3] - out) * alpha
+    return np.round(out).astype(np.uint8)
+
+
+def to_png(rgb):
+    """PNG bytes of an RGB(A) array; fast compression, as the image is shown once."""
+    buf = io.BytesIO()
+    PILImage.fromarray(rgb).save(buf, format='png', compress_level=1)
+    return buf.getvalue()
@@ -0,0 +1,79 @@
+# Row-selective reader for the MATLAB Level 4 .mat files written by BioFVM/PhysiCell
+#
+# BioFVM (write_matlab4_header in BioFVM_matlab.cpp) writes a 20-byte header,
+#   type (=1000*endian + 100*0 + 10*data_format + 0), rows, cols, imagf, name_length,
+# then the variable name (not NUL-terminated), then rows*cols values stored column by column,
+# i.e., one column per voxel (or cell): [x, y, z, volume, substrate0, substrate1, ...].
+# A "row" of the matrix (one substrate for every voxel) is therefore a strided slice of the file,
+# which we can pull out of a memory map without decoding the other rows.
+
+import numpy as np
+
+HEADER_BYTES = 20
+
+# MAT4 "P" digit of the type field -> numpy data type
+_data_formats = {0: 'f8', 1: 'f4', 2: 'i4', 3: 'i2', 4: 'u2', 5: 'u1'}
+
+
+class Mat4Header(object):
+    def __init__(self, name, rows, cols, dtype, offset):
+        self.name = name
+        self.rows = rows
+        self.cols = cols
+        self.dtype = dtype
+        self.offset = offset    # byte offset of the first data value
+
+
+def read_header(fname):
+    """Parse the MAT4 header; raise ValueError if this is not a full, real, Level 4 matrix."""
+    with open(fname, 'rb') as f:
+        raw = f.read(HEADER_BYTES)
+        if len(raw) < HEADER_BYTES:
+            raise ValueError("%s: truncated .mat header" % fname)
+        for endian in ('<', '>'):
+            mopt, rows, cols, imagf, name_len = np.frombuffer(raw, dtype=endian+'u4')
+            if mopt < 5000:
+                break
+        else:
+            raise ValueError("%s: not a MATLAB Level 4 file" % fname)
+        numeric_format = mopt // 1000
+        data_format = (mopt % 100) // 10
+        matrix_type = mopt % 10
+        if ((endian == '<') != (numeric_format == 0)) or (mopt % 1000) // 100 != 0 \
+                or data_format not in _data_formats or matrix_type != 0 or imagf != 0:
+            raise ValueError("%s: unsupported .mat layout (type=%d)" % (fname, mopt))
+        name = f.read(int(name_len)).rstrip(b'\0').decode('ascii', 'replace')
+    dtype = np.dtype(endian + _data_formats[data_format])
+    return Mat4Header(name, int(rows), int(cols), dtype, HEADER_BYTES + int(name_len))
+
+
+def memmap(fname, header=None):
+    """Memory-map the matrix as a (cols, rows) array, so that matrix row i is mm[:, i]."""
+    if header is None:
+        header = read_header(fname)
+    return np.memmap(fname, dtype=header.dtype, mode='r', offset=header.offset,
+                     shape=(header.cols, header.rows), order='C')
+
+
+def read_rows(fname, row_indices):
+    """
+    Return a (len(row_indices), cols) float array with only the requested matrix rows.
+
+    Only the requested rows are copied out of the memory map; the full matrix is never materialized.
+    """
+    header = read_header(fname)
+    mm = memmap(fname, header)
+    try:
+        out = np.empty((len(row_indices), header.cols), dtype=np.float64)
+        for k, idx in enumerate(row_indices):
+            if idx < 0 or idx >= header.rows:
+                raise IndexError("%s: row %d out of range (%d rows)" % (fname, idx, header.rows))
+            out[k, :] = mm[:, idx]
+    finally:
+        del mm
+    return out
+
+
+def read_row(fname, row_index):
+    """Return one matrix row, e.g., one substrate field for every voxel."""
+    return read_rows(fname, [row_index])[0]
@@ -0,0 +1,158 @@
+# Substrate mesh geometry for a run, built once and reused for every frame and field
+
+import os
+import xml.etree.ElementTree as ET
+import numpy as np
+import mat_reader
+
+
+class Mesh(object):
+    """
+    Voxel centers of the (2-D) microenvironment mesh.
+
+    BioFVM orders voxels x-fastest, so a substrate row M[k,:] reshapes to (numy, numx).
+    """
+
+    def __init__(self, xs, ys, bounding_box=None, regular=True):
+        self.xs = np.asarray(xs, dtype=np.float64)
+        self.ys = np.asarray(ys, dtype=np.float64)
+        self.numx = len(self.xs)
+        self.numy = len(self.ys)
+        self.dx = self.xs[1] - self.xs[0] if self.numx > 1 else 0.
+        self.dy = self.ys[1] - self.ys[0] if self.numy > 1 else 0.
+        if bounding_box is None:   # [xmin,ymin,zmin, xmax,ymax,zmax] (z unknown here)
+            bounding_box = [self.xs[0] - self.dx/2, self.ys[0] - self.dy/2, 0.,
+                            self.xs[-1] + self.dx/2, self.ys[-1] + self.dy/2, 0.]
+        self.bounding_box = [float(v) for v in bounding_box]
+        self.regular = regular
+        self._xgrid = None
+        self._ygrid = None
+        self._coarse = {}   # level-of-detail factor -> coarser Mesh
+
+    @property
+    def num_voxels(self):
+        return self.numx * self.numy
+
+    @property
+    def extent(self):
+        """[xmin, xmax, ymin, ymax] of the voxel edges, e.g. for imshow."""
+        return [self.xs[0] - self.dx/2, self.xs[-1] + self.dx/2, self.ys[0] - self.dy/2, self.ys[-1] + self.dy/2]
+
+    # 2-D coordinate arrays for contourf; built on first use only
+    @property
+    def xgrid(self):
+        if self._xgrid is None:
+            self._xgrid, self._ygrid = np.meshgrid(self.xs, self.ys)
+        return self._xgrid
+
+    @property
+    def ygrid(self):
+        if self._ygrid is None:
+            self._xgrid, self._ygrid = np.meshgrid(self.xs, self.ys)
+        return self._ygrid
+
+    def reshape(self, field):
+        """Reshape a substrate row (length numx*numy) to a (numy, numx) 2-D array (a view, no copy)."""
+        return np.asarray(field).reshape(self.numy, self.numx)
+
+    def matches(self, field):
+        return np.size(field) == self.num_voxels
+
+    def voxel_index(self, x, y):
+        """Index (matrix column) of the voxel whose center is nearest to (x,y)."""
+        ix = int(np.abs(self.xs - x).argmin())
+        iy = int(np.abs(self.ys - y).argmin())
+        return iy * self.numx + ix
+
+    def voxel_center(self, voxel):
+        return float(self.xs[voxel % self.numx]), float(self.ys[voxel // self.numx])
+
+    #----------------------------------------
+    # Level of detail: average factor x factor blocks of voxels, e.g. to about the plot's pixel resolution.
+    # The last row/column of blocks is padded with edge values when numx/numy isn't a multiple of factor.
+    def coarsen(self, factor):
+        """Mesh of the factor x factor voxel blocks (cached, so going back to a level is free)."""
+        if factor not in self._coarse:
+            nx = -(-self.numx // factor)
+            ny = -(-self.numy // factor)
+            xs = self.xs[0] - self.dx/2 + (np.arange(nx) + 0.5) * factor * self.dx
+            ys = self.ys[0] - self.dy/2 + (np.arange(ny) + 0.5) * factor * self.dy
+            self._coarse[factor] = Mesh(xs, ys, regular=self.regular)
+        return self._coarse[factor]
+
+    def block_mean(self, field, factor):
+        """Block-average a substrate row onto coarsen(factor); returns a flat row for that mesh."""
+        a = self.reshape(field)
+        nx = -(-self.numx // factor) * factor
+        ny = -(-self.numy // factor) * factor
+        if (ny, nx) != a.shape:
+            a = np.pad(a, ((0, ny - self.numy), (0, nx - self.numx)), mode='edge')
+        return a.reshape(ny // factor, factor, nx // factor, factor).mean(axis=(1, 3)).ravel()
+
+    #----------------------------------------
+    # Viewport: the sub-block of voxels covering [xmin,xmax] x [ymin,ymax], plus a voxel of margin on
+    # each side so that contours (drawn between voxel centers) still reach the viewport's edges.
+    def window_slices(self, xmin, xmax, ymin, ymax):
+        """(row slice, column slice) of reshape(field) covering the rectangle."""
+        def span(vs, d, lo, hi):
+            if len(vs) < 2 or d == 0:
+                return slice(0, len(vs))
+            k0 = int(np.floor((lo - vs[0]) / d)) - 1
+            k1 = int(np.ceil((hi - vs[0]) / d)) + 2
+            k0 = min(max(k0, 0), len(vs) - 1)
+            return slice(k0, min(max(k1, k0 + 1), len(vs)))
+        return span(self.ys, self.dy, ymin, ymax), span(self.xs, self.dx, xmin, xmax)
+
+    def window(self, field, xmin, xmax, ymin, ymax):
+        """(Mesh, flat row) of the voxels covering the rectangle; only that sub-block is copied."""
+        rows, cols = self.window_slices(xmin, xmax, ymin, ymax)
+        if (rows.stop - rows.start, cols.stop - cols.start) == (self.numy, self.numx):
+            return self, field
+        sub = Mesh(self.xs[cols], self.ys[rows], regular=self.regular)
+        return sub, np.ascontiguousarray(self.reshape(field)[rows, cols]).ravel()
+
+    #----------------------------------------
+    @classmethod
+    def from_xml(cls, xml_fname):
+        """Build from the <mesh> of a MultiCellDS file (e.g., initial.xml); stops parsing after the mesh."""
+        xs = ys = bbox = None
+        regular = True
+        for event, elm in ET.iterparse(xml_fname, events=('start', 'end')):
+            if event == 'start':
+                if elm.tag == 'mesh':
+                    regular = elm.attrib.get('type', 'Cartesian') == 'Cartesian' and \
+                        elm.attrib.get('uniform', 'true') == 'true' and elm.attrib.get('regular', 'true') == 'true'
+                continue
+            if elm.tag == 'x_coordinates':
+                xs = np.array(elm.text.split(), dtype=np.float64)
+            elif elm.tag == 'y_coordinates':
+                ys = np.array(elm.text.split(), dtype=np.float64)
+            elif elm.tag == 'bounding_box':
+                bbox = elm.text.split()
+            elif elm.tag == 'mesh':
+                break
+        if xs is None or ys is None:
+            raise ValueError("%s: no mesh coordinates found" % xml_fname)
+        return cls(xs, ys, bbox, regular)
+
+    @classmethod
+    def from_mat(cls, mat_fname):
+        """Build from the x,y rows of an output*_microenvironment0.mat file."""
+        xy = mat_reader.read_rows(mat_fname, [0, 1])
+        xs = np.unique(xy[0])
+        ys = np.unique(xy[1])
+        regular = all(len(v) < 3 or np.allclose(np.diff(v), v[1] - v[0]) for v in (xs, ys))
+        return cls(xs, ys, regular=regular)
+
+    @classmethod
+    def for_run(cls, output_dir, mat_fname=None):
+        """Prefer <output_dir>/initial.xml; otherwise use the first .mat we're given."""
+        xml_fname = os.path.join(output_dir, 'initial.xml')
+        if os.path.isfile(xml_fname):
+            try:
+                return cls.from_xml(xml_fname)
+            except (ValueError, ET.ParseError):
+                pass
+        if mat_fname is None:
+            raise ValueError("no mesh information in %s" % output_dir)
+        return cls.from_mat(mat_fname)
@@ -80,18 +80,7 @@ def read_config_cb(_b):
         # print("read_config_cb():  calling fill_gui_params with ",config_file)
         fill_gui_params(config_file)  #should verify file exists!
 
-        # If cells or substrates toggled off in Config tab, toggle off in Plots tab
-        if config_tab.toggle_svg.value == False:
-            sub.cells_toggle.value = False
-            sub.cells_toggle.disabled = True
-        else:
-            sub.cells_toggle.disabled = False
-
-        if config_tab.toggle_mcds.value == False:
-            sub.substrates_toggle.value = False
-            sub.substrates_toggle.disabled = True
-        else:
-            sub.substrates_toggle.disabled = False
+        set_plot_toggles()
 
     else:
         # with debug_view:
@@ -239,23 +228,27 @@ def run_done_func(s, rdir):
     #     print('RDF DONE')
 
 
-# This is used now for the ("smart") RunCommand
-def run_sim_func(s):
-    # with debug_view:
-    #     print('run_sim_func')
-
-    # If cells or substrates toggled off in Config tab, toggle off in Plots tab
+# If substrates toggled off in Config tab, toggle off in Plots tab; without SVGs, plot the cells from the .mat files
+def set_plot_toggles():
+    sub.cells_toggle.disabled = False
     if config_tab.toggle_svg.value == False:
-        sub.cells_toggle.value = False
-        sub.cells_toggle.disabled = True
-    else:
-        sub.cells_toggle.disabled = False
+        sub.cell_source.value = 'mat'
+    elif sub.cell_source.value == 'mat':
+        sub.cell_source.value = 'auto'
     if config_tab.toggle_mcds.value == False:
         sub.substrates_toggle.value = False
         sub.substrates_toggle.disabled = True
     else:
         sub.substrates_toggle.disabled = False
 
+
+# This is used now for the ("smart") RunCommand
+def run_sim_func(s):
+    # with debug_view:
+    #     print('run_sim_func')
+
+    set_plot_toggles()
+
     # make sure we are where we started
     os.chdir(homedir)
 
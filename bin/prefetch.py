@@ -0,0 +1,54 @@
+# Background prefetch of output files for the frames the user is likely to view next
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Prefetcher(object):
+    """
+    Runs "warm-up" jobs (read + decode into a FrameCache) on a small thread pool.
+
+    At most max_pending jobs are queued or running. Each request() replaces the wanted set:
+    queued jobs that are no longer wanted are cancelled (a job that already started runs to completion).
+    """
+
+    def __init__(self, max_workers=2, max_pending=6):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.pending = {}   # key -> Future
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def request(self, jobs):
+        """jobs: list of (key, callable), most wanted first."""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+            wanted = set(key for key, _ in jobs)
+            for key, future in list(self.pending.items()):
+                if future.done() or (key not in wanted and future.cancel()):
+                    del self.pending[key]
+            for key, job in jobs:
+                if len(self.pending) >= self.max_pending:
+                    break
+                if key not in self.pending:
+                    self.pending[key] = self._executor.submit(self._run, job)
+
+    def cancel_all(self):
+        with self._lock:
+            for future in self.pending.values():
+                future.cancel()
+            self.pending = {}
+
+    def shutdown(self):
+        self.cancel_all()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    @staticmethod
+    def _run(job):
+        try:
+            job()
+        except Exception:   # e.g., a file still being written by the simulation; the GUI will just read it later
+            pass
@@ -0,0 +1,167 @@
+# Per-frame results computed over all the output files of a run, cached in the run directory
+#
+# A RunIndex applies a (module-level, picklable) function to every frame file matching a pattern,
+# e.g. "output%08d_microenvironment0.mat", in a process pool, one file per task, and stores the
+# per-frame results with each file's mtime/size in <output_dir>/<name>.npz. A later refresh()
+# only computes frames that are new or whose file changed, so the index grows as a run writes output.
+
+import os
+import glob
+import re
+import json
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import numpy as np
+
+
+def list_frames(output_dir, pattern):
+    """{frame #: full filename} for files matching a printf-style pattern, e.g. 'snapshot%08d.svg'."""
+    prefix, suffix = pattern.split('%08d')
+    regex = re.compile(re.escape(prefix) + r'(\d{8})' + re.escape(suffix) + '$')
+    frames = {}
+    for fname in glob.glob(os.path.join(output_dir, prefix + '*' + suffix)):
+        m = regex.match(os.path.basename(fname))
+        if m:
+            frames[int(m.group(1))] = fname
+    return frames
+
+
+def default_workers():
+    return max(1, min(4, (os.cpu_count() or 1) - 1))
+
+
+def _safe_call(func, fname, *args):
+    try:
+        return func(fname, *args)
+    except Exception:   # e.g., a file still being written by the simulation
+        return None
+
+
+def map_frames(func, fnames, args=(), max_workers=None, use_processes=True):
+    """
+    [func(fname, *args) for fname in fnames], spread over a worker pool (one file per task).
+
+    A frame whose file cannot be read gives None.
+    """
+    if max_workers is None:
+        max_workers = default_workers()
+    if len(fnames) < 2 or max_workers < 2:
+        return [_safe_call(func, f, *args) for f in fnames]
+    arg_lists = [[func]*len(fnames), fnames] + [[a]*len(fnames) for a in args]
+    if use_processes:
+        try:
+            # spawned, not forked: the GUI has threads running (prefetch, panel refreshes)
+            with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+                return list(pool.map(_safe_call, *arg_lists))
+        except (OSError, ImportError, RuntimeError):   # e.g., no semaphores available; use threads
+            pass
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return list(pool.map(_safe_call, *arg_lists))
+
+
+class RunIndex(object):
+    """
+    Cached per-frame results of func(fname, *args) over a run.
+
+    Each result must be a numpy array of the same shape for every frame (so they stack into values()).
+    Changing args (or the index version) invalidates the stored results.
+    """
+
+    version = 1
+
+    def __init__(self, output_dir, name, pattern, func, args=(), max_workers=None, use_processes=True):
+        self.output_dir = output_dir
+        self.name = name
+        self.pattern = pattern
+        self.func = func
+        self.args = tuple(args)
+        self.max_workers = max_workers
+        self.use_processes = use_processes
+        self.results = {}   # frame -> ndarray
+        self.stamps = {}    # frame -> (mtime_ns, size)
+        self._lock = threading.Lock()
+        self.load()
+
+    @property
+    def index_fname(self):
+        return os.path.join(self.output_dir, self.name + '.npz')
+
+    @property
+    def params(self):
+        return json.dumps({'version': self.version, 'func': self.func.__name__, 'args': repr(self.args)})
+
+    def load(self):
+        try:
+            with np.load(self.index_fname, allow_pickle=False) as data:
+                if str(data['params']) != self.params:
+                    return
+                frames, stamps, values = data['frames'], data['stamps'], data['values']   # each read once
+            for k, frame in enumerate(frames):
+                self.results[int(frame)] = values[k].copy()   # not a view pinning the whole array
+                self.stamps[int(frame)] = tuple(int(v) for v in stamps[k])
+        except (OSError, KeyError, ValueError):
+            pass
+
+    def save(self):
+        if not self.results:
+            return
+        frames = self.frames()
+        tmp_fname = self.index_fname + '.tmp.npz'
+        try:
+            os.makedirs(os.path.dirname(tmp_fname), exist_ok=True)
+            np.savez(tmp_fname, params=np.array(self.params), frames=np.array(frames, dtype=np.int64),
+                     stamps=np.array([self.stamps[k] for k in frames], dtype=np.int64),
+                     values=np.stack([self.results[k] for k in frames]))
+            os.replace(tmp_fname, self.index_fname)
+        except OSError:   # e.g., a read-only cached run; keep the results in memory only
+            pass
+
+    def refresh(self, lookup=None):
+        """
+        Compute results for new or changed frame files; returns the number of frames tried.
+
+        lookup(fname), if given, may return a frame's result from data already in memory (e.g., a frame
+        the GUI has decoded), or None; only the frames it doesn't have are sent to the worker pool.
+        """
+        with self._lock:
+            todo = []
+            present = list_frames(self.output_dir, self.pattern)
+            for frame in [k for k in self.results if k not in present]:   # e.g., a new, shorter run in the same dir
+                del self.results[frame]
+                del self.stamps[frame]
+            for frame, fname in sorted(present.items()):
+                try:
+                    st = os.stat(fname)
+                except OSError:
+                    continue
+                stamp = (st.st_mtime_ns, st.st_size)
+                if self.stamps.get(frame) != stamp:
+                    todo.append((frame, fname, stamp))
+            if not todo:
+                return 0
+            results = [_safe_call(lookup, fname) if lookup else None for _, fname, _ in todo]
+            missing = [k for k, result in enumerate(results) if result is None]
+            if missing:
+                computed = map_frames(self.func, [todo[k][1] for k in missing], self.args,
+                                      self.max_workers, self.use_processes)
+                for k, result in zip(missing, computed):
+                    results[k] = result
+            for (frame, _, stamp), result in zip(todo, results):
+                if result is None:   # try again on the next refresh
+                    continue
+                self.results[frame] = np.asarray(result)
+                self.stamps[frame] = stamp
+            self.save()
+            return len(todo)
+
+    def frames(self):
+        return sorted(dict(self.results))
+
+    def values(self):
+        """(frames, stacked results) in frame order."""
+        results = dict(self.results)   # a snapshot: a refresh may be adding frames in another thread
+        frames = sorted(results)
+        if not frames:
+            return np.zeros(0, dtype=np.int64), None
+        return np.array(frames), np.stack([results[k] for k in frames])
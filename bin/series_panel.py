@@ -0,0 +1,425 @@
+# Time-series panels of the Plots tab, over every frame of a run
+
+import io
+import abc
+import base64
+import threading
+import numpy as np
+import xml.etree.ElementTree as ET
+from ipywidgets import Layout, Label, Checkbox, Button, Dropdown, HBox, VBox, Output
+from matplotlib.figure import Figure
+from substrate_stats import SubstrateSeriesIndex, SERIES_STATS, MICROENV_PATTERN
+from voxel_probe import ProbeIndex
+import cell_population
+from cell_population import PopulationIndex
+import custom_distribution
+from custom_distribution import CustomDistributionIndex
+from dose_accounting import DoseIndex
+from run_index import list_frames
+import cell_matrix
+from mesh import Mesh
+
+
+def show_figure(output, fig):
+    """Show a figure as a PNG in an Output widget (from any thread)."""
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png', pil_kwargs={'compress_level': 1})
+    # not clear_output()/display(): those act on the kernel's current output
+    output.outputs = ({'output_type': 'display_data', 'metadata': {},
+                       'data': {'image/png': base64.b64encode(buf.getvalue()).decode('ascii'),
+                                'text/plain': '<Figure>'}},)
+
+
+def clear_figure(output):
+    output.outputs = ()
+
+
+def frame_times_hours(tab, frames):
+    """Simulated times (h) of frames (NaN without an .xml)."""
+    times = np.full(len(frames), np.nan)
+    for k, frame in enumerate(frames):
+        try:
+            times[k] = tab.get_frame_times().time(int(frame)) / 60.
+        except (OSError, ValueError, KeyError, ET.ParseError):
+            pass
+    return times
+
+
+class RunPanel(abc.ABC):
+    """
+    Controls, Update button and status over a plot of a run index.
+
+    update() picks the index; refresh() and plot() run in the tab's series_worker.
+    """
+
+    title = ''
+    tooltip = 'Compute over all frames'
+    busy_text = 'computing...'
+
+    def __init__(self, tab, controls=()):
+        self.tab = tab          # the SubstrateTab
+        self.index = None
+        self.active = False     # True once computed; then kept up to date
+        self._lock = threading.Lock()
+        self._busy = False      # a refresh is queued or running
+        self._again = False     # update() was called meanwhile: refresh once more
+
+        self.update_button = Button(description='Update', tooltip=self.tooltip, layout=Layout(width='90px'))
+        self.update_button.on_click(lambda b: self.update())
+        self.status = Label('')
+        self.output = Output()
+        self.panel = VBox([HBox([Label(self.title)] + list(controls) + [self.update_button, self.status]),
+                           self.output])
+
+    @abc.abstractmethod
+    def get_index(self):
+        """The index to show, or None if there's nothing to compute."""
+
+    def refresh(self):
+        self.index.refresh()
+
+    @abc.abstractmethod
+    def plot(self):
+        """Draw the index in the output."""
+
+    def update(self):
+        """Index new frames in the background, then redraw."""
+        index = self.get_index()
+        if index is None:
+            return
+        with self._lock:
+            self.index = index
+            self.active = True
+            if self._busy:
+                self._again = True
+                return
+            self._busy = True
+        self.status.value = self.busy_text
+        self.tab.series_worker.submit(self._refresh)
+
+    def _refresh(self):
+        while True:
+            try:
+                self.refresh()
+                self.plot()
+            except Exception as e:   # e.g., a run being rewritten; the next update() tries again
+                self.status.value = 'error: %s' % e
+            with self._lock:
+                if not self._again:
+                    self._busy = False
+                    return
+                self._again = False
+
+    def wait(self):
+        """Wait for a pending refresh."""
+        self.tab.series_worker.submit(lambda: None).result()
+
+    def show_empty(self, status):
+        self.status.value = status
+        clear_figure(self.output)
+
+
+class SubstrateSeriesPanel(RunPanel):
+    """Total, mean, max or min of each substrate field vs. time."""
+
+    title = 'Substrate time series:'
+    tooltip = 'Compute the substrate time series of all frames'
+
+    def __init__(self, tab):
+        self.indexes = {}       # weighted? -> SubstrateSeriesIndex
+        self.stat = Dropdown(options=list(SERIES_STATS), value='mean', description='series',
+                             layout=Layout(width='180px'))
+        self.stat.observe(lambda b: self.plot() if self.active else None, names='value')
+        self.weighted = Checkbox(description='volume-weighted', value=True)
+        self.weighted.observe(lambda b: self.update() if self.active else None, names='value')
+        RunPanel.__init__(self, tab, [self.stat, self.weighted])
+
+    def get_index(self):
+        weighted = self.weighted.value
+        index = self.indexes.get(weighted)
+        if index is None or index.output_dir != self.tab.output_dir:
+            index = self.indexes[weighted] = SubstrateSeriesIndex(self.tab.output_dir, weighted)
+        return index
+
+    def plot(self):
+        index = self.index
+        frames, values = index.series(self.stat.value)
+        if values is None:
+            self.show_empty('no output*_microenvironment0.mat files')
+            return
+        self.status.value = '%d frames' % len(frames)
+        times = frame_times_hours(self.tab, frames)
+        num_fields = values.shape[1]
+        fig = Figure(figsize=(10, 2.2*num_fields + 0.8))
+        axes = fig.subplots(num_fields, 1, sharex=True, squeeze=False)[:, 0]
+        for k, ax in enumerate(axes):
+            ax.plot(times, values[:, k], '.-')
+            ax.set_ylabel(self.tab.field_dict.get(k, 'field %d' % k))
+            ax.grid(True, alpha=0.3)
+        axes[0].set_title('%s%s' % (self.stat.value, ' (volume-weighted)' if index.weighted else ''))
+        axes[-1].set_xlabel('time (h)')
+        fig.tight_layout()
+        show_figure(self.output, fig)
+
+
+class ProbePanel(RunPanel):
+    """The selected field vs. time at probe points (added at the tab's pick x,y)."""
+
+    title = 'Voxel probes:'
+    tooltip = 'Redraw for the selected field and new frames'
+    busy_text = 'reading...'
+
+    def __init__(self, tab):
+        self.voxels = []        # probed voxels (matrix columns), in the order added
+        self.mesh = None        # of the run, if the tab hasn't built it yet
+        self.mesh_dir = None
+        self.add_button = Button(description='Add probe', tooltip='Probe the substrates at pick x,y over all frames',
+                                 layout=Layout(width='100px'))
+        self.add_button.on_click(lambda b: self.add_probe(self.tab.pick_x.value, self.tab.pick_y.value))
+        self.clear_button = Button(description='Clear', tooltip='Remove all probes', layout=Layout(width='70px'))
+        self.clear_button.on_click(lambda b: self.clear())
+        RunPanel.__init__(self, tab, [self.add_button, self.clear_button])
+
+    def get_mesh(self):
+        if self.tab.mesh is not None:
+            return self.tab.mesh
+        if self.mesh is None or self.mesh_dir != self.tab.output_dir:
+            frames = list_frames(self.tab.output_dir, MICROENV_PATTERN)
+            if not frames:
+                return None
+            self.mesh = Mesh.for_run(self.tab.output_dir, frames[min(frames)])
+            self.mesh_dir = self.tab.output_dir
+        return self.mesh
+
+    def add_probe(self, x, y):
+        try:
+            mesh = self.get_mesh()
+        except (OSError, ValueError, ET.ParseError):
+            mesh = None
+        if mesh is None:
+            self.status.value = 'no output*_microenvironment0.mat files'
+            return
+        voxel = mesh.voxel_index(x, y)
+        if voxel not in self.voxels:
+            self.voxels.append(voxel)
+        self.update()
+
+    def clear(self):
+        self.voxels = []
+        self.active = False
+        self.show_empty('')
+
+    def get_index(self):
+        if not self.voxels:
+            return None
+        index = self.index
+        if index is None or index.output_dir != self.tab.output_dir:
+            index = ProbeIndex(self.tab.output_dir)
+        index.set_voxels(self.voxels)
+        return index
+
+    def plot(self):
+        index = self.index
+        voxels = index.voxels
+        frames, values = index.histories()
+        if not self.voxels:   # cleared meanwhile
+            return
+        if values is None:
+            self.show_empty('no output*_microenvironment0.mat files')
+            return
+        field = self.tab.mcds_field.value or 0
+        self.status.value = '%d probes, %d frames' % (len(voxels), len(frames))
+        times = frame_times_hours(self.tab, frames)
+        mesh = self.get_mesh()
+        fig = Figure(figsize=(10, 3.5))
+        ax = fig.add_subplot(111)
+        for k, voxel in enumerate(voxels):
+            ax.plot(times, values[:, k, field], '.-', label='(%g, %g)' % mesh.voxel_center(voxel))
+        ax.set_xlabel('time (h)')
+        ax.set_ylabel(self.tab.field_dict.get(field, 'field %d' % field))
+        ax.grid(True, alpha=0.3)
+        ax.legend(fontsize='small')
+        fig.tight_layout()
+        show_figure(self.output, fig)
+
+
+class PopulationPanel(RunPanel):
+    """Cell counts per class, live/dead totals and total cell volume vs. time."""
+
+    title = 'Cell population:'
+    tooltip = 'Count the cells of all frames'
+    busy_text = 'counting...'
+
+    def __init__(self, tab):
+        self.indexes = {}   # source -> PopulationIndex
+        self.source = Dropdown(options=['auto', 'svg', 'mat'], value='auto', description='from',
+                               layout=Layout(width='150px'))
+        self.source.observe(lambda b: self.update() if self.active else None, names='value')
+        RunPanel.__init__(self, tab, [self.source])
+
+    def get_index(self):
+        source = self.source.value
+        if source == 'auto':
+            source = 'svg' if list_frames(self.tab.output_dir, cell_population.SVG_PATTERN) else 'mat'
+        index = self.indexes.get(source)
+        if index is None or index.output_dir != self.tab.output_dir:
+            index = self.indexes[source] = PopulationIndex(self.tab.output_dir, source)
+        return index
+
+    def plot(self):
+        index = self.index
+        frames, values = index.values()
+        if values is None:
+            self.show_empty('no cell output files')
+            return
+        self.status.value = '%d frames (%s)' % (len(frames), index.source)
+        columns = cell_population.COLUMNS
+        times = values[:, columns.index('time')] / 60.
+        fig = Figure(figsize=(10, 6))
+        ax_counts, ax_volume = fig.subplots(2, 1, sharex=True)
+        for name, style in [('total', 'k-'), ('live total', 'b-'), ('dead total', 'k--'), ('immune', 'k:'),
+                            ('apoptotic', 'r-'), ('necrotic', '-')]:
+            kwargs = {'color': (250/255., 138/255., 38/255.)} if name == 'necrotic' else {}
+            ax_counts.plot(times, values[:, columns.index(name)], style, label=name, **kwargs)
+        ax_counts.set_ylabel('cells')
+        ax_counts.legend(fontsize='small', ncol=3)
+        ax_counts.grid(True, alpha=0.3)
+        ax_volume.plot(times, values[:, columns.index('total volume')], 'g-')
+        ax_volume.set_ylabel('total cell volume')
+        ax_volume.set_xlabel('time (h)')
+        ax_volume.grid(True, alpha=0.3)
+        fig.tight_layout()
+        show_figure(self.output, fig)
+
+
+class DistributionPanel(RunPanel):
+    """Heat-map of a cell custom_data variable vs. time, with quantile bands and the median."""
+
+    title = 'Cell variable distribution:'
+    tooltip = 'Compute the distributions of all frames'
+    busy_text = 'binning...'
+
+    def __init__(self, tab):
+        self.names_dir = None
+        self.vectors = set()    # vector variables, e.g. "NPs bins"
+        self.variable = Dropdown(options=[], description='variable', layout=Layout(width='280px'))
+        self.variable.observe(lambda b: self.update() if self.active else None, names='value')
+        self.fraction = Checkbox(description='fraction of cells', value=True)
+        self.fraction.observe(lambda b: self.plot() if self.active else None, names='value')
+        RunPanel.__init__(self, tab, [self.variable, self.fraction])
+
+    def update_variables(self):
+        """Fill the variable choices from the run's cell labels."""
+        if self.names_dir == self.tab.output_dir and self.variable.options:
+            return
+        frames = list_frames(self.tab.output_dir, cell_population.XML_PATTERN)
+        try:
+            labels = cell_matrix.read_schema(frames[max(frames)])[0] if frames else {}
+        except (OSError, ValueError, ET.ParseError):
+            labels = {}
+        names = cell_matrix.custom_names(labels, vectors=True)
+        self.vectors = set(name for name in names if labels[name][1] > 1)
+        active, self.active = self.active, False   # no update() while the options change
+        value = self.variable.value
+        self.variable.options = names
+        self.variable.value = value if value in names else (names[0] if names else None)
+        self.active = active
+        self.names_dir = self.tab.output_dir
+
+    def get_index(self):
+        self.update_variables()
+        name = self.variable.value
+        if name is None:
+            self.show_empty('no cell custom_data variables')
+            return None
+        index = self.index
+        if index is None or index.name != name or index.output_dir != self.tab.output_dir:
+            index = CustomDistributionIndex(self.tab.output_dir, name)
+        return index
+
+    def plot(self):
+        index = self.index
+        frames, edges, counts = index.heatmap()
+        if counts is None:
+            self.show_empty('no cell output files')
+            return
+        _, stats = index.stats()
+        self.status.value = '%d frames' % len(frames)
+        times = frame_times_hours(self.tab, frames)
+        if self.fraction.value:
+            totals = counts.sum(axis=1, keepdims=True)
+            counts = np.divide(counts, totals, out=np.zeros_like(counts), where=totals > 0)
+        # time edges halfway between frames, for pcolormesh
+        if len(times) > 1:
+            mid = (times[1:] + times[:-1]) / 2
+            time_edges = np.concatenate([[2*times[0] - mid[0]], mid, [2*times[-1] - mid[-1]]])
+        else:
+            time_edges = times[0] + np.array([-0.5, 0.5])
+
+        fig = Figure(figsize=(10, 4.5))
+        ax = fig.add_subplot(111)
+        # robust to frames whose cells all have one value
+        nonzero = counts[counts > 0]
+        vmax = np.percentile(nonzero, 99) if len(nonzero) else 1.
+        mesh = ax.pcolormesh(time_edges, edges, counts.T, cmap='viridis', shading='flat', vmin=0, vmax=vmax)
+        fig.colorbar(mesh, ax=ax, label='fraction of cells' if self.fraction.value else 'cells')
+        q = [stats[:, custom_distribution.STATS.index('q%02d' % round(p * 100))] for p in custom_distribution.QUANTILES]
+        ax.fill_between(times, q[0], q[-1], color='w', alpha=0.15, lw=0, label='5-95%')
+        ax.fill_between(times, q[1], q[-2], color='w', alpha=0.3, lw=0, label='25-75%')
+        ax.plot(times, q[2], 'w-', lw=1.5, label='median')
+        ax.set_ylabel('%s%s' % (index.name, ' (entry)' if index.name in self.vectors else ''))
+        ax.set_xlabel('time (h)')
+        ax.set_ylim(edges[0], edges[-1])
+        ax.legend(fontsize='small', loc='upper left')
+        fig.tight_layout()
+        show_figure(self.output, fig)
+
+
+class DosePanel(RunPanel):
+    """NP1 in the domain, in the cells, in total and the implied boundary inflow vs. time."""
+
+    substrate = 'NP1'
+    title = '%s dose accounting:' % substrate
+    tooltip = 'Account for the NP1 of all frames'
+    busy_text = 'accounting...'
+
+    def get_index(self):
+        index = self.index
+        if index is None or index.output_dir != self.tab.output_dir:
+            index = DoseIndex(self.tab.output_dir, self.substrate, self.substrate)
+        return index
+
+    def refresh(self):
+        self.index.refresh(self.tab.frame_cache)   # frames the tab has decoded aren't read again
+
+    def plot(self):
+        index = self.index
+        frames, series = index.series()
+        if series is None:
+            self.show_empty('no output files with %s' % self.substrate)
+            return
+        self.status.value = '%d frames' % len(frames)
+        times = series['time'] / 60.
+        fig = Figure(figsize=(10, 6))
+        ax_amount, ax_rate = fig.subplots(2, 1, sharex=True, gridspec_kw={'height_ratios': [2, 1]})
+        lines = []
+        for name, style in [('extracellular', 'b-'), ('total', 'k-'), ('inflow', 'g--'), ('decayed', 'k:')]:
+            lines += ax_amount.plot(times, series[name], style,
+                                    label=name if name != 'inflow' else 'boundary inflow (implied)')
+        ax_amount.set_ylabel(self.substrate)
+        # far less is in the cells: own axis
+        ax_cells = ax_amount.twinx()
+        lines += ax_cells.plot(times, series['intracellular'], 'r-', label='intracellular (right)')
+        ax_cells.set_ylabel('intracellular %s' % self.substrate, color='r')
+        ax_amount.legend(lines, [line.get_label() for line in lines], fontsize='small')
+        ax_amount.grid(True, alpha=0.3)
+        dirichlet = index.dirichlet
+        if dirichlet is not None:
+            ax_amount.set_title('Dirichlet boundary %s = %g (%s)' % (self.substrate, dirichlet[1],
+                                                                   'enabled' if dirichlet[0] else 'disabled'))
+        ax_rate.plot(times, series['inflow rate'], 'g.-')
+        ax_rate.set_ylabel('inflow / min')
+        ax_rate.set_xlabel('time (h)')
+        ax_rate.grid(True, alpha=0.3)
+        fig.tight_layout()
+        show_figure(self.output, fig)
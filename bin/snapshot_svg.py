@@ -0,0 +1,152 @@
+# Bulk reader for PhysiCell snapshot%08d.svg files: every cell circle as NumPy arrays, in one pass
+#
+# PhysiCell writes each agent as <g id="cellN"> holding an outer (cytoplasm) circle and,
+# usually, a nucleus circle:
+#   <circle cx="1135.78" cy="919.931" r="7.88573" stroke-width="0.5" stroke="black" fill="black"/>
+# Rather than building an ElementTree, the cells group is scanned with one regular expression and
+# the attribute strings are converted to numbers by NumPy, as whole arrays.
+
+import re
+import threading
+import xml.etree.ElementTree as ET
+import numpy as np
+import matplotlib.colors as mplc
+
+_width_re = re.compile(rb'<svg\b[^>]*?\swidth="([^"]*)"')
+_time_re = re.compile(rb'>\s*(Current time:[^<]*)<')
+# a group start (one per cell), or a circle's cx, cy, r and fill: exactly as PhysiCell writes them
+# (fastest), or allowing other attributes/spacing in between
+_item_res = [re.compile(rb'<(?:(g) |circle cx="([^"]*)" cy="([^"]*)" r="([^"]*)" '
+                        rb'stroke-width="[^"]*" stroke="[^"]*" fill="([^"]*)")'),
+             re.compile(rb'<(?:(g)\b|circle\s[^>]*?\bcx="([^"]*)"[^>]*?\bcy="([^"]*)"'
+                        rb'[^>]*?\br="([^"]*)"[^>]*?\bfill="([^"]*)")')]
+
+
+def decode_fill(fill):
+    """(r,g,b,a) in [0,1] of an SVG fill string, e.g. "rgb(175,175,80)" or "black"."""
+    if fill[0:3] == "rgb":
+        return [int(v) / 255. for v in fill[4:-1].split(",")] + [1.]
+    return list(mplc.to_rgba(fill))
+
+
+class ColorTable(object):
+    """
+    SVG fill string -> RGBA row, decoded once per distinct string for the whole session.
+
+    The table starts with matplotlib's named colors; "rgb(r,g,b)" (or other) strings are
+    decoded and appended the first time they are seen. A snapshot only uses a handful of
+    distinct fills, so decoding costs grow with the number of colors, not of cells.
+    """
+
+    def __init__(self):
+        self.index = {}   # fill (bytes) -> row of table
+        rows = []
+        for name, value in mplc.CSS4_COLORS.items():
+            self.index[name.encode()] = len(rows)
+            rows.append(mplc.to_rgba(value))
+        self.table = np.array(rows, dtype=np.float32)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.index)
+
+    def rows(self, fills):
+        """(rows, table): the table row of each fill string (adding new ones), and the table itself."""
+        with self._lock:
+            new = [f for f in dict.fromkeys(fills) if f not in self.index]
+            if new:
+                for f in new:
+                    self.index[f] = len(self.index)
+                self.table = np.vstack([self.table, np.array([decode_fill(f.decode()) for f in new], dtype=np.float32)])
+            return np.array([self.index[f] for f in fills], dtype=np.intp), self.table
+
+    def rgba(self, fills):
+        """(n,4) float32 colors of an array of fill strings, gathered from the table in one go."""
+        if len(fills) == 0:
+            return np.zeros((0, 4), dtype=np.float32)
+        distinct, inverse = np.unique(fills, return_inverse=True)
+        rows, table = self.rows(distinct.tolist())
+        return table[rows[inverse.ravel()]]
+
+
+fill_colors = ColorTable()
+
+
+def read_cells(fname, xmin=0., ymin=0., too_large_val=10000.):
+    """
+    Cells of a snapshot SVG, as a dict of arrays with one entry per circle (outer and nucleus):
+      x, y, r: float32 (x,y mapped into the domain by adding xmin, ymin)
+      rgba: (n,4) float32 fill colors (see ColorTable)
+      outer: bool, True for a cell's outer circle, False for its nucleus
+      cell: int32 index of the cell each circle belongs to
+    plus num_cells, width (of the SVG, or None) and time_text (the "Current time: ..." text, or '').
+
+    As in the per-circle parser this replaces, a circle with |x| or |y| > too_large_val is dropped,
+    and so is the rest of a cell whose outer circle is dropped.
+    """
+    with open(fname, 'rb') as f:
+        text = f.read()
+    start = text.find(b'id="cells"')
+    header = text[:start] if start >= 0 else text
+    m = _width_re.search(header)
+    width = float(m.group(1)) if m else None
+    m = _time_re.search(header)
+    time_text = m.group(1).decode().strip() if m else ''
+
+    if start < 0:
+        return _finish([], [], [], [], [], [], 0, xmin, ymin, too_large_val, width, time_text)
+    num_circles = text.count(b'<circle', start)
+    for item_re in _item_res:
+        items = item_re.findall(text, start)
+        if len(items) - text.count(b'<g', start) == num_circles:
+            break
+    else:   # e.g., attributes written in another order
+        return _read_cells_etree(fname, xmin, ymin, too_large_val, width, time_text)
+    if not items:
+        return _finish([], [], [], [], [], [], 0, xmin, ymin, too_large_val, width, time_text)
+    groups, xs, ys, rs, fills = [np.array(v) for v in zip(*items)]
+    is_group = groups == b'g'
+    is_circle = ~is_group
+    outer = np.concatenate(([False], is_group[:-1]))[is_circle]
+    cell = (np.cumsum(is_group) - 1)[is_circle]
+    return _finish(xs[is_circle], ys[is_circle], rs[is_circle], fills[is_circle], outer, cell,
+                   int(is_group.sum()), xmin, ymin, too_large_val, width, time_text)
+
+
+def _read_cells_etree(fname, xmin, ymin, too_large_val, width, time_text):
+    """Same as read_cells, for SVGs the regular expression can't scan; walks the ElementTree."""
+    xs, ys, rs, fills, outer, cell = [], [], [], [], [], []
+    num_cells = 0
+    for group in ET.parse(fname).getroot().iter('{http://www.w3.org/2000/svg}g'):
+        if group.attrib.get('id') != 'cells':
+            continue
+        for child in group:
+            for k, circle in enumerate(child):
+                xs.append(circle.attrib['cx'])
+                ys.append(circle.attrib['cy'])
+                rs.append(circle.attrib['r'])
+                fills.append(circle.attrib['fill'].encode())
+                outer.append(k == 0)
+                cell.append(num_cells)
+            num_cells += 1
+        break
+    return _finish(xs, ys, rs, fills, outer, cell, num_cells, xmin, ymin, too_large_val, width, time_text)
+
+
+def _finish(xs, ys, rs, fills, outer, cell, num_cells, xmin, ymin, too_large_val, width, time_text):
+    x = np.asarray(xs).astype(np.float32) + np.float32(xmin)
+    y = np.asarray(ys).astype(np.float32) + np.float32(ymin)
+    r = np.asarray(rs).astype(np.float32)
+    outer = np.asarray(outer, dtype=bool)
+    cell = np.asarray(cell, dtype=np.int32)
+
+    # test for bogus x,y locations (rwh TODO: use max of domain?)
+    bogus = (np.fabs(x) > too_large_val) | (np.fabs(y) > too_large_val)
+    if bogus.any():
+        bogus |= np.isin(cell, cell[bogus & outer])
+        print("%d circles with bogus x,y skipped" % bogus.sum())
+        keep = ~bogus
+        x, y, r, outer, cell = x[keep], y[keep], r[keep], outer[keep], cell[keep]
+        fills = np.asarray(fills)[keep]
+    return {'x': x, 'y': y, 'r': r, 'rgba': fill_colors.rgba(np.asarray(fills)), 'outer': outer, 'cell': cell,
+            'num_cells': num_cells, 'width': width, 'time_text': time_text}
@@ -0,0 +1,70 @@
+# Uniform grid hash of circles (cells), for picking and region queries without scanning every cell
+
+import numpy as np
+
+
+class CellGrid(object):
+    """
+    Circles (centers x,y and radii r) binned on a uniform grid, about one cell diameter per bin.
+
+    The circle indices are sorted by bin, so the circles of a row of bins are one contiguous
+    slice of self.order; a query only looks at the bins within reach of its region.
+    """
+
+    def __init__(self, x, y, r, bin_size=None):
+        self.x = np.asarray(x, dtype=np.float64)
+        self.y = np.asarray(y, dtype=np.float64)
+        self.r = np.asarray(r, dtype=np.float64)
+        n = len(self.x)
+        self.rmax = float(self.r.max()) if n else 0.
+        if bin_size is None:
+            bin_size = 2 * float(np.median(self.r)) if n else 1.
+        self.x0 = float(self.x.min()) if n else 0.
+        self.y0 = float(self.y.min()) if n else 0.
+        xspan = float(self.x.max()) - self.x0 if n else 0.
+        yspan = float(self.y.max()) - self.y0 if n else 0.
+        bin_size = max(bin_size, 1e-6, np.sqrt(xspan * yspan / (4. * n + 1024)))   # keep the bins ~ O(n)
+        self.bin_size = bin_size
+        self.nx = int(xspan / bin_size) + 1
+        self.ny = int(yspan / bin_size) + 1
+        bins = self._iy(self.y) * self.nx + self._ix(self.x)
+        self.order = np.argsort(bins, kind='stable')
+        self.starts = np.searchsorted(bins[self.order], np.arange(self.nx * self.ny + 1))
+
+    def __len__(self):
+        return len(self.x)
+
+    def _ix(self, x):
+        return np.clip(((np.asarray(x) - self.x0) / self.bin_size).astype(np.int64), 0, self.nx - 1)
+
+    def _iy(self, y):
+        return np.clip(((np.asarray(y) - self.y0) / self.bin_size).astype(np.int64), 0, self.ny - 1)
+
+    def candidates(self, xmin, xmax, ymin, ymax):
+        """Indices of circles whose centers may lie in [xmin,xmax] x [ymin,ymax] (a superset)."""
+        if len(self.x) == 0 or xmax < self.x0 - self.bin_size or ymax < self.y0 - self.bin_size:
+            return np.zeros(0, dtype=np.int64)
+        ix0, ix1 = int(self._ix(xmin)), int(self._ix(xmax))
+        iy0, iy1 = int(self._iy(ymin)), int(self._iy(ymax))
+        rows = np.arange(iy0, iy1 + 1) * self.nx
+        return np.concatenate([self.order[self.starts[k + ix0]:self.starts[k + ix1 + 1]] for k in rows])
+
+    def pick(self, px, py):
+        """Index of the circle containing (px,py), the last drawn (topmost) if several; None if none."""
+        idx = self.candidates(px - self.rmax, px + self.rmax, py - self.rmax, py + self.rmax)
+        inside = idx[(self.x[idx] - px)**2 + (self.y[idx] - py)**2 <= self.r[idx]**2]
+        return int(inside.max()) if len(inside) else None
+
+    def within_radius(self, px, py, radius):
+        """Sorted indices of the circles that intersect the disk of the given radius around (px,py)."""
+        reach = radius + self.rmax
+        idx = self.candidates(px - reach, px + reach, py - reach, py + reach)
+        d2 = (self.x[idx] - px)**2 + (self.y[idx] - py)**2
+        return np.sort(idx[d2 <= (radius + self.r[idx])**2])
+
+    def in_rect(self, xmin, xmax, ymin, ymax):
+        """Sorted indices of the circles that intersect the rectangle [xmin,xmax] x [ymin,ymax]."""
+        idx = self.candidates(xmin - self.rmax, xmax + self.rmax, ymin - self.rmax, ymax + self.rmax)
+        dx = np.maximum(np.maximum(xmin - self.x[idx], self.x[idx] - xmax), 0.)
+        dy = np.maximum(np.maximum(ymin - self.y[idx], self.y[idx] - ymax), 0.)
+        return np.sort(idx[dx**2 + dy**2 <= self.r[idx]**2])
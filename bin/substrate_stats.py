@@ -0,0 +1,106 @@
+# Per-frame statistics of the substrate fields in output%08d_microenvironment0.mat files
+
+import numpy as np
+import mat_reader
+from run_index import RunIndex
+
+MICROENV_PATTERN = 'output%08d_microenvironment0.mat'
+FIRST_FIELD_ROW = 4   # rows 0-3 are x, y, z, voxel volume
+
+RANGE_STATS = ('min', 'max', 'p01', 'p50', 'p99')
+SERIES_STATS = ('total', 'mean', 'max', 'min')
+
+VOLUME_ROW = 3
+CHUNK_VOXELS = 1 << 18   # voxels (matrix columns) read at a time, to bound a worker's memory
+
+
+def field_range_stats(mat_fname):
+    """(num fields, len(RANGE_STATS)) array: min, max and 1/50/99th percentiles of each substrate."""
+    header = mat_reader.read_header(mat_fname)
+    stats = np.empty((header.rows - FIRST_FIELD_ROW, len(RANGE_STATS)))
+    for k in range(stats.shape[0]):
+        field = mat_reader.read_row(mat_fname, FIRST_FIELD_ROW + k)   # one substrate in memory at a time
+        stats[k, :2] = field.min(), field.max()
+        stats[k, 2:] = np.percentile(field, [1, 50, 99])
+    return stats
+
+
+def field_series_stats(mat_fname, weighted=False):
+    """
+    (num fields, len(SERIES_STATS)) array: total, mean, max and min of each substrate.
+
+    With weighted=True, the total is sum(value * voxel volume) and the mean is per unit volume.
+    """
+    header = mat_reader.read_header(mat_fname)
+    num_fields = header.rows - FIRST_FIELD_ROW
+    if header.cols == 0 or num_fields < 1:
+        raise ValueError("%s: no substrate values" % mat_fname)
+    mm = mat_reader.memmap(mat_fname, header)
+    total = np.zeros(num_fields)
+    vmax = np.full(num_fields, -np.inf)
+    vmin = np.full(num_fields, np.inf)
+    volume = 0.
+    for k in range(0, header.cols, CHUNK_VOXELS):
+        block = np.asarray(mm[k:k + CHUNK_VOXELS], dtype=np.float64)
+        fields = block[:, FIRST_FIELD_ROW:]
+        if weighted:
+            total += block[:, VOLUME_ROW] @ fields
+            volume += block[:, VOLUME_ROW].sum()
+        else:
+            total += fields.sum(axis=0)
+            volume += len(block)
+        np.maximum(vmax, fields.max(axis=0), out=vmax)
+        np.minimum(vmin, fields.min(axis=0), out=vmin)
+    del mm
+    mean = total / volume if volume else np.full(num_fields, np.nan)
+    return np.column_stack([total, mean, vmax, vmin])
+
+
+class FieldRangeIndex(object):
+    """Per-run, per-field value ranges over every frame, for a colormap range that doesn't flicker."""
+
+    def __init__(self, output_dir, max_workers=None):
+        self.index = RunIndex(output_dir, 'substrate_ranges', MICROENV_PATTERN, field_range_stats,
+                              max_workers=max_workers)
+
+    @property
+    def output_dir(self):
+        return self.index.output_dir
+
+    def refresh(self):
+        return self.index.refresh()
+
+    def global_range(self, field, robust=False):
+        """
+        (min, max) of a field (0 = first substrate) over all frames indexed so far, or None.
+
+        With robust=True, use the lowest 1st and highest 99th percentile instead, to ignore a few extreme voxels.
+        """
+        frames, stats = self.index.values()
+        if stats is None or field >= stats.shape[1]:
+            return None
+        lo, hi = (RANGE_STATS.index('p01'), RANGE_STATS.index('p99')) if robust else (0, 1)
+        return float(stats[:, field, lo].min()), float(stats[:, field, hi].max())
+
+
+class SubstrateSeriesIndex(object):
+    """Per-run time series of each field's total, mean, max and min (see field_series_stats)."""
+
+    def __init__(self, output_dir, weighted=False, max_workers=None):
+        self.weighted = weighted
+        self.index = RunIndex(output_dir, 'substrate_series_weighted' if weighted else 'substrate_series',
+                              MICROENV_PATTERN, field_series_stats, args=(weighted,), max_workers=max_workers)
+
+    @property
+    def output_dir(self):
+        return self.index.output_dir
+
+    def refresh(self):
+        return self.index.refresh()
+
+    def series(self, stat):
+        """(frames, (num frames, num fields) values) of one of SERIES_STATS; values is None if nothing is indexed."""
+        frames, stats = self.index.values()
+        if stats is None:
+            return frames, None
+        return frames, stats[:, :, SERIES_STATS.index(stat)]
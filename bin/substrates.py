@@ -1,17 +1,20 @@
 # substrates  Tab
 
-import os, math
+import os, math, io
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from ipywidgets import Layout, Label, Text, Checkbox, Button, BoundedIntText, HBox, VBox, Box, \
     FloatText, Dropdown, interactive
 import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+import matplotlib.colorbar
 from matplotlib.colors import BoundaryNorm
 from matplotlib.ticker import MaxNLocator
 from matplotlib.collections import LineCollection
-from matplotlib.patches import Circle, Ellipse, Rectangle
-from matplotlib.collections import PatchCollection
-import matplotlib.colors as mplc
-from collections import deque
+from matplotlib.patches import Ellipse, Rectangle
+from matplotlib.collections import EllipseCollection
 import numpy as np
 import scipy.io
 import xml.etree.ElementTree as ET  # https://docs.python.org/2/library/xml.etree.elementtree.html
@@ -19,6 +22,21 @@ import glob
 import platform
 import zipfile
 from debug import debug_view 
+from IPython import get_ipython
+from IPython.display import display, Image
+from frame_cache import FrameCache, file_key
+import mat_reader
+import cell_matrix
+import cell_frame
+import cell_sidecar
+import cell_density
+import layers
+from prefetch import Prefetcher
+from frame_index import FrameTimeIndex
+from substrate_stats import FieldRangeIndex
+from mesh import Mesh
+from series_panel import SubstrateSeriesPanel, ProbePanel, PopulationPanel, DistributionPanel, \
+    DosePanel
 import warnings
 
 hublib_flag = True
@@ -50,6 +68,7 @@ class SubstrateTab(object):
 
         self.first_time = True
         self.modulo = 1
+        self.svg_flag = True   # snapshots written (else cells come from the .mat files)
 
         self.use_defaults = True
 
@@ -86,9 +105,61 @@ class SubstrateTab(object):
         # define dummy size of mesh (set in the tool's primary module)
         self.numx = 0
         self.numy = 0
+        # substrate mesh of the current run (see get_mesh())
+        self.mesh = None
+        # level of detail: block-average fields with more voxels than the plot has pixels
+        self.lod_enabled = True
+        self.lod_factor = 1   # of the last plotted frame; used for prefetching
+        # zoom/pan: view_zoom 1 is the whole domain (see get_viewport())
+        self.view_zoom = 1
+        self.view_center = None
 
         self.title_str = ''
 
+        # LRU of decoded output files, keyed by (path, mtime, size)
+        self.cache_max_mb = 512
+        self.frame_cache = FrameCache(max_bytes=self.cache_max_mb*1024*1024)
+
+        # reuse one figure per layout, updating its artists (see get_axes())
+        self.reuse_figure = True
+        self.figs = {}   # (figsize, colorbar) -> {'fig', 'ax', 'cax', 'cbar', 'image'}
+        self.fig_state = None
+        self.fig = None
+        self.cax = None
+        self.plot_artists = []   # artists drawn for the current frame; removed before the next one
+
+        # LRU of rendered PNGs, keyed by get_view_key()
+        self.render_cache_mb = 64
+        self.render_cache = FrameCache(max_bytes=self.render_cache_mb*1024*1024)
+        # rendered substrate and cell layers (RGBA), cached separately (see show_layers())
+        self.layer_cache_mb = 128
+        self.layer_cache = FrameCache(max_bytes=self.layer_cache_mb*1024*1024)
+
+        # decode the next few frames into frame_cache in the background
+        self.prefetch_depth = 3
+        self.prefetcher = Prefetcher(max_workers=2, max_pending=2*self.prefetch_depth)
+        # run index refreshes (Plots panels, global ranges), one at a time
+        self.series_worker = ThreadPoolExecutor(max_workers=1)
+        self.last_frame = None
+
+        # parsed cells of the current and nearby frames (see get_cell_frame())
+        self.cell_frames = OrderedDict()   # (frame, from .mat?) -> CellFrame
+        self.cell_frames_max = 2*self.prefetch_depth + 1
+        self.cell_frames_lock = threading.Lock()
+        self.cell_counts = {}   # cell frame key -> number of cells
+        # keep parsed snapshots in <output_dir>/cell_cache (see cell_sidecar.py)
+        self.cell_sidecars = True
+        # cell density raster (see draw_cell_density()): bin size in screen pixels, colormap
+        self.density_bin_pixels = 2
+        self.cell_density_cmap = 'cividis'
+        self.cells_density = False   # of the frame being drawn
+
+        # frame # -> simulated time (see get_frame_times())
+        self.frame_times = None
+        # per-field min/max over all frames, for the 'global' colormap range
+        self.field_ranges = None
+        self.field_ranges_pending = False   # a refresh is queued in series_worker
+
         tab_height = '600px'
         tab_height = '500px'
         constWidth = '180px'
@@ -228,6 +299,28 @@ class SubstrateTab(object):
 
         self.cmap_fixed_toggle.observe(cmap_fixed_toggle_cb)
 
+        # colormap range over *all* frames
+        self.cmap_global_toggle = Checkbox(
+            description='global',
+            disabled=False,
+#           layout=Layout(width=constWidth2),
+        )
+        def cmap_global_toggle_cb(b):
+            if (self.cmap_global_toggle.value):
+                self.refresh_field_ranges()   # redraws again once the new frames are in
+            self.i_plot.update()
+
+        self.cmap_global_toggle.observe(cmap_global_toggle_cb)
+
+        # 'auto': an image for regular meshes (faster than contourf)
+        self.render_mode = Dropdown(
+            options=['auto', 'raster', 'contour'],
+            value='auto',
+            description='render',
+           layout=Layout(width=constWidth),
+        )
+        self.render_mode.observe(self.mcds_field_cb)
+
         field_cmap_row2 = HBox([self.field_cmap, self.cmap_fixed_toggle])
 
 #        field_cmap_row3 = HBox([self.save_min_max, self.cmap_min, self.cmap_max])
@@ -295,12 +388,57 @@ class SubstrateTab(object):
             if (self.cells_toggle.value):
                 self.cell_edges_toggle.disabled = False
                 self.cell_nucleus_toggle.disabled = False
+                self.cell_source.disabled = False
+                self.cell_draw.disabled = False
+                self.cell_density_threshold.disabled = False
+                self.cell_weight.disabled = False
             else:
                 self.cell_edges_toggle.disabled = True
                 self.cell_nucleus_toggle.disabled = True
+                self.cell_source.disabled = True
+                self.cell_draw.disabled = True
+                self.cell_density_threshold.disabled = True
+                self.cell_weight.disabled = True
 
         self.cells_toggle.observe(cells_toggle_cb)
 
+        # cells from the snapshot SVGs or the cell .mat files ('auto': SVG if there is one)
+        self.cell_source = Dropdown(
+            options=['auto', 'svg', 'mat'],
+            value='auto',
+            description='from',
+            layout=Layout(width=constWidth),
+        )
+        def cell_source_cb(b):
+            self.i_plot.update()
+
+        self.cell_source.observe(cell_source_cb, names='value')
+
+        # cells as circles, or as a density raster
+        self.cell_draw = Dropdown(
+            options=['auto', 'circles', 'density'],
+            value='auto',
+            description='draw',
+            layout=Layout(width=constWidth),
+        )
+        self.cell_draw.observe(cell_source_cb, names='value')
+        # 'auto' draws the density for frames with at least this many cells
+        self.cell_density_threshold = BoundedIntText(
+            min=0, max=10**9, step=10000, value=200000,
+            description='density at',
+            tooltip='In auto mode, draw the density for frames with at least this many cells',
+            layout=Layout(width='200px'),
+        )
+        self.cell_density_threshold.observe(cell_source_cb, names='value')
+        # density weights: a color channel, or a custom_data variable (.mat cells)
+        self.cell_weight = Dropdown(
+            options=['count', 'red', 'green', 'blue'],
+            value='count',
+            description='weight',
+            layout=Layout(width=constWidth),
+        )
+        self.cell_weight.observe(cell_source_cb, names='value')
+
         #---------------------
         self.substrates_toggle = Checkbox(
             description='Substrates',
@@ -311,16 +449,20 @@ class SubstrateTab(object):
         def substrates_toggle_cb(b):
             if (self.substrates_toggle.value):  # seems bass-ackwards
                 self.cmap_fixed_toggle.disabled = False
+                self.cmap_global_toggle.disabled = False
                 self.cmap_min.disabled = False
                 self.cmap_max.disabled = False
                 self.mcds_field.disabled = False
                 self.field_cmap.disabled = False
+                self.render_mode.disabled = False
             else:
                 self.cmap_fixed_toggle.disabled = True
+                self.cmap_global_toggle.disabled = True
                 self.cmap_min.disabled = True
                 self.cmap_max.disabled = True
                 self.mcds_field.disabled = True
                 self.field_cmap.disabled = True
+                self.render_mode.disabled = True
 
         self.substrates_toggle.observe(substrates_toggle_cb)
 
@@ -352,7 +494,7 @@ class SubstrateTab(object):
                             align_items='stretch',
                             flex_direction='row',
                             display='flex')) 
-        row1b = Box( [self.cells_toggle, self.cell_nucleus_toggle, self.cell_edges_toggle], layout=Layout(border='1px solid black',
+        row1b = Box( [self.cells_toggle, self.cell_nucleus_toggle, self.cell_edges_toggle, self.cell_source], layout=Layout(border='1px solid black',
                             width='50%',
                             height='',
                             align_items='stretch',
@@ -360,14 +502,14 @@ class SubstrateTab(object):
                             display='flex')) 
         row1 = HBox( [row1a, Label('.....'), row1b])
 
-        row2a = Box([self.cmap_fixed_toggle, self.cmap_min, self.cmap_max], layout=Layout(border='1px solid black',
+        row2a = Box([self.cmap_fixed_toggle, self.cmap_min, self.cmap_max, self.cmap_global_toggle], layout=Layout(border='1px solid black',
                             width='50%',
                             height='',
                             align_items='stretch',
                             flex_direction='row',
                             display='flex'))
         # row2b = Box( [self.substrates_toggle, self.grid_toggle], layout=Layout(border='1px solid black',
-        row2b = Box( [self.substrates_toggle, ], layout=Layout(border='1px solid black',
+        row2b = Box( [self.substrates_toggle, self.render_mode], layout=Layout(border='1px solid black',
                             width='50%',
                             height='',
                             align_items='stretch',
@@ -376,6 +518,41 @@ class SubstrateTab(object):
         # row2 = HBox( [row2a, self.substrates_toggle, self.grid_toggle])
         row2 = HBox( [row2a, Label('.....'), row2b])
 
+        # cell readout at a typed-in point (and cells within radius)
+        self.pick_x = FloatText(description='pick x', value=0., layout=Layout(width='180px'))
+        self.pick_y = FloatText(description='y', value=0., layout=Layout(width='180px'))
+        self.pick_radius = FloatText(description='radius', value=0., layout=Layout(width='180px'))
+        self.pick_readout = Label('')
+        def pick_cb(b):
+            self.pick_readout.value = self.pick_cell(self.pick_x.value, self.pick_y.value, self.pick_radius.value)
+        for w in [self.pick_x, self.pick_y, self.pick_radius]:
+            w.observe(pick_cb, names='value')
+        pick_row = HBox([self.pick_x, self.pick_y, self.pick_radius, self.pick_readout])
+
+        # zoom in/out by 2x, pan by a quarter of the view
+        def view_button(description, tooltip, cb):
+            button = Button(description=description, tooltip=tooltip, layout=Layout(width='40px'))
+            button.on_click(cb)
+            return button
+        self.view_reset_button = Button(description='reset', tooltip='Show the whole domain', layout=Layout(width='60px'))
+        self.view_reset_button.on_click(lambda b: self.set_view(1, None))
+        self.view_label = Label('')
+        view_row = HBox([self.cell_draw, self.cell_density_threshold, self.cell_weight, Label('.....'), Label('view:'),
+                         view_button('+', 'Zoom in', lambda b: self.zoom_view(2.)),
+                         view_button('-', 'Zoom out', lambda b: self.zoom_view(0.5)),
+                         view_button('\u2190', 'Pan left', lambda b: self.pan_view(-0.25, 0.)),
+                         view_button('\u2192', 'Pan right', lambda b: self.pan_view(0.25, 0.)),
+                         view_button('\u2193', 'Pan down', lambda b: self.pan_view(0., -0.25)),
+                         view_button('\u2191', 'Pan up', lambda b: self.pan_view(0., 0.25)),
+                         self.view_reset_button, self.view_label])
+
+        # curves over all frames of the run, below the plot
+        self.series_panel = SubstrateSeriesPanel(self)
+        self.probe_panel = ProbePanel(self)
+        self.population_panel = PopulationPanel(self)
+        self.distribution_panel = DistributionPanel(self)
+        self.dose_panel = DosePanel(self)
+
         if (hublib_flag):
             self.download_button = Download('mcds.zip', style='warning', icon='cloud-download', 
                                                 tooltip='Download data', cb=self.download_cb)
@@ -385,12 +562,13 @@ class SubstrateTab(object):
             download_row = HBox([self.download_button.w, self.download_svg_button.w, Label("Download all cell plots (browser must allow pop-ups).")])
 
             # box_layout = Layout(border='0px solid')
-            controls_box = VBox([row1, row2])  # ,width='50%', layout=box_layout)
-            self.tab = VBox([controls_box, self.i_plot, download_row])
+            controls_box = VBox([row1, row2, view_row])  # ,width='50%', layout=box_layout)
+            self.tab = VBox([controls_box, self.i_plot, pick_row, self.probe_panel.panel, self.series_panel.panel, self.population_panel.panel, self.distribution_panel.panel, self.dose_panel.panel,
+                          download_row])
             # self.tab = VBox([controls_box, self.debug_str, self.i_plot, download_row])
         else:
             # self.tab = VBox([row1, row2])
-            self.tab = VBox([row1, row2, self.i_plot])
+            self.tab = VBox([row1, row2, view_row, self.i_plot, pick_row, self.probe_panel.panel, self.series_panel.panel, self.population_panel.panel, self.distribution_panel.panel, self.dose_panel.panel])
 
     #---------------------------------------------------
     def update_dropdown_fields(self, data_dir):
@@ -467,6 +645,9 @@ class SubstrateTab(object):
 
         self.numx =  math.ceil( (self.xmax - self.xmin) / config_tab.xdelta.value)
         self.numy =  math.ceil( (self.ymax - self.ymin) / config_tab.ydelta.value)
+        self.mesh = None   # domain may have changed; rebuild from the new run's output
+        with self.cell_frames_lock:   # SVG cells were placed relative to the old xmin/ymin
+            self.cell_frames.clear()
 
         if (self.x_range > self.y_range):  
             ratio = self.y_range / self.x_range
@@ -488,6 +669,8 @@ class SubstrateTab(object):
         self.svg_delta_t = config_tab.svg_interval.value
         self.substrate_delta_t = config_tab.mcds_interval.value
         self.modulo = int(self.substrate_delta_t / self.svg_delta_t)
+        if not self.svg_flag:   # no snapshots: cells from the .mat files
+            self.modulo = 1
         # print("substrates: update_params(): modulo=",self.modulo)        
 
         if self.customized_output_freq:
@@ -505,7 +688,15 @@ class SubstrateTab(object):
         # print("substrates: update rdir=", rdir)        
 
         if rdir:
+            if rdir != self.output_dir:
+                self.mesh = None
+                self.cell_counts.clear()
+                self.prefetcher.cancel_all()
+                self.last_frame = None
             self.output_dir = rdir
+        with self.cell_frames_lock:   # files may have been (re)written since they were read
+            self.cell_frames.clear()
+        self.view_center = self.clamp_view_center(self.view_center)   # the domain may have changed
 
         # print('update(): self.output_dir = ', self.output_dir)
 
@@ -527,9 +718,27 @@ class SubstrateTab(object):
                 self.substrate_delta_t = int(xml_root.find(".//full_data//interval").text)
                 # print("substrates: svg,substrate delta_t values=",self.svg_delta_t,self.substrate_delta_t)        
                 self.modulo = int(self.substrate_delta_t / self.svg_delta_t)
+                if not self.svg_flag:   # no snapshots: cells from the .mat files
+                    self.modulo = 1
                 # print("substrates: update(): modulo=",self.modulo)        
 
 
+        # pick up the times of any newly written output%08d.xml files
+        self.get_frame_times().refresh()
+        self.update_cell_weight_options()
+        if self.series_panel.active:
+            self.series_panel.update()
+        if self.probe_panel.active:
+            self.probe_panel.update()
+        if self.population_panel.active:
+            self.population_panel.update()
+        if self.distribution_panel.active:
+            self.distribution_panel.update()
+        if self.dose_panel.active:
+            self.dose_panel.update()
+        if self.cmap_global_toggle.value:
+            self.refresh_field_ranges()
+
         # all_files = sorted(glob.glob(os.path.join(self.output_dir, 'output*.xml')))  # if the substrates/MCDS
 
         all_files = sorted(glob.glob(os.path.join(self.output_dir, 'snap*.svg')))   # if .svg
@@ -542,6 +751,22 @@ class SubstrateTab(object):
                 last_file = substrate_files[-1]
                 self.max_frames.value = int(last_file[-12:-4])
 
+    # custom_data variables to weight the cell density by
+    def update_cell_weight_options(self):
+        names = []
+        xml_files = sorted(glob.glob(os.path.join(self.output_dir, 'output*.xml')))
+        if xml_files:
+            try:
+                labels = self.frame_cache.get_or_load(xml_files[0], lambda f: cell_matrix.read_schema(f)[0], tag='labels')
+                names = cell_matrix.custom_names(labels)
+            except (OSError, ValueError, ET.ParseError):
+                pass
+        options = ['count', 'red', 'green', 'blue'] + names
+        if list(self.cell_weight.options) != options:
+            value = self.cell_weight.value
+            self.cell_weight.options = options
+            self.cell_weight.value = value if value in options else 'count'
+
     def download_svg_cb(self):
         file_str = os.path.join(self.output_dir, '*.svg')
         # print('zip up all ',file_str)
@@ -613,6 +838,342 @@ class SubstrateTab(object):
         self.i_plot.update()
 
 
+    def set_cache_size(self, max_mb, render_max_mb=None, layer_max_mb=None):
+        self.cache_max_mb = max_mb
+        self.frame_cache.set_max_bytes(max_mb*1024*1024)
+        if render_max_mb is not None:
+            self.render_cache_mb = render_max_mb
+            self.render_cache.set_max_bytes(render_max_mb*1024*1024)
+        if layer_max_mb is not None:
+            self.layer_cache_mb = layer_max_mb
+            self.layer_cache.set_max_bytes(layer_max_mb*1024*1024)
+
+    #---------------------------------------------------------------------------
+    # zoom/pan: (xmin, xmax, ymin, ymax) shown, or None for the whole domain
+    def get_viewport(self):
+        if self.view_zoom <= 1 or self.view_center is None:
+            return None
+        w = (self.xmax - self.xmin) / self.view_zoom
+        h = (self.ymax - self.ymin) / self.view_zoom
+        cx, cy = self.view_center
+        return (cx - w/2, cx + w/2, cy - h/2, cy + h/2)
+
+    # keep the viewport inside the domain
+    def clamp_view_center(self, center):
+        if center is None or self.view_zoom <= 1:
+            return None
+        w = (self.xmax - self.xmin) / self.view_zoom
+        h = (self.ymax - self.ymin) / self.view_zoom
+        return (min(max(center[0], self.xmin + w/2), self.xmax - w/2),
+                min(max(center[1], self.ymin + h/2), self.ymax - h/2))
+
+    def set_view(self, zoom, center):
+        self.view_zoom = max(1, zoom)
+        if center is None and self.view_zoom > 1:
+            center = ((self.xmin + self.xmax)/2, (self.ymin + self.ymax)/2)
+        self.view_center = self.clamp_view_center(center)
+        viewport = self.get_viewport()
+        self.view_label.value = '' if viewport is None else \
+            'x: %g..%g, y: %g..%g (%gx)' % (viewport[0], viewport[1], viewport[2], viewport[3], self.view_zoom)
+        self.i_plot.update()
+
+    def zoom_view(self, factor):
+        self.set_view(self.view_zoom * factor, self.view_center)
+
+    def pan_view(self, fx, fy):
+        viewport = self.get_viewport()
+        if viewport is None:
+            return
+        x0, x1, y0, y1 = viewport
+        self.set_view(self.view_zoom, (self.view_center[0] + fx*(x1 - x0), self.view_center[1] + fy*(y1 - y0)))
+
+    def set_view_limits(self, ax):
+        viewport = self.get_viewport()
+        if viewport is None:
+            ax.set_xlim(self.xmin, self.xmax)
+            ax.set_ylim(self.ymin, self.ymax)
+        else:
+            ax.set_xlim(viewport[0], viewport[1])
+            ax.set_ylim(viewport[2], viewport[3])
+
+    # a frame's circles, only those in view if zoomed in
+    def get_visible_circles(self, cells):
+        viewport = self.get_viewport()
+        if viewport is None:
+            return cells.circles(self.show_nucleus)
+        return cells.circles_in(self.show_nucleus, *viewport)
+
+    # (substrate layer key, cell layer key) of a frame's view: settings + file keys; None if a file is missing
+    def get_view_key(self, frame, cells_density):
+        key = [self.figsize_width_substrate, self.figsize_height_substrate,
+               self.figsize_width_svg, self.figsize_height_svg, self.fontsize,
+               self.xmin, self.xmax, self.ymin, self.ymax, self.get_viewport()]
+        try:
+            # the substrate layer holds the axes (and, without cells, the title)
+            substrate_key = key + [self.cells_toggle.value, cells_density]
+            if self.substrates_toggle.value:
+                substrate_frame = self.get_substrate_frame(frame)
+                xml_key = file_key(os.path.join(self.output_dir, "output%08d.xml" % substrate_frame))
+                substrate_key += ['substrate', self.field_index, self.field_cmap.value, self.get_cmap_range(),
+                                  self.render_mode.value, self.lod_enabled,
+                                  file_key(os.path.join(self.output_dir, "output%08d_microenvironment0.mat" % substrate_frame)),
+                                  xml_key]
+            cells_key = None
+            if self.cells_toggle.value:
+                # the title and any density colorbar are drawn with the cells
+                use_matrix = self.use_cell_matrix(frame)
+                cells_key = key + [frame, cells_density, self.substrates_toggle.value and xml_key,
+                                   'cells', use_matrix, self.show_nucleus, self.show_edge, self.get_cell_frame_key(frame, use_matrix),
+                                   self.cell_draw.value, self.cell_density_threshold.value, self.cell_weight.value,
+                                   self.density_bin_pixels, self.cell_density_cmap]
+                cells_key = tuple(cells_key)
+        except (OSError, ValueError):
+            return None
+        return (tuple(substrate_key), cells_key)
+
+    #---------------------------------------------------------------------------
+    # decoders used by the frame cache (called only on a cache miss)
+    def read_microenv(self, mat_fname):
+        info_dict = {}
+        scipy.io.loadmat(mat_fname, info_dict)
+        return info_dict['multiscale_microenvironment']
+
+    # one row of M (0=x, 1=y, 2=z, 3=volume, 4+=substrates), memory-mapped
+    def read_microenv_row(self, mat_fname, row):
+        try:
+            return mat_reader.read_row(mat_fname, row)
+        except ValueError:   # not the Level 4 layout PhysiCell writes; decode it all
+            return self.frame_cache.get_or_load(mat_fname, self.read_microenv)[row, :]
+
+    def get_microenv_row(self, mat_fname, row):
+        return self.frame_cache.get_or_load(mat_fname, lambda f: self.read_microenv_row(f, row), tag=row)
+
+    # the row block-averaged to a coarser level of detail
+    def get_lod_row(self, mat_fname, row, mesh, factor):
+        return self.frame_cache.get_or_load(mat_fname,
+            lambda f: mesh.block_mean(self.get_microenv_row(f, row), factor), tag=(row, 'lod', factor))
+
+    # largest block size that still leaves at least one voxel per pixel of the axes
+    def get_lod_factor(self, ax, mesh):
+        if not self.lod_enabled:
+            return 1
+        bbox = ax.get_window_extent()
+        if bbox.width < 1 or bbox.height < 1:
+            return 1
+        return max(1, int(min(mesh.numx / bbox.width, mesh.numy / bbox.height)))
+
+    def get_field_ranges(self):
+        if self.field_ranges is None or self.field_ranges.output_dir != self.output_dir:
+            self.field_ranges = FieldRangeIndex(self.output_dir)
+        return self.field_ranges
+
+    # index the field ranges of new frames in series_worker, then redraw
+    def refresh_field_ranges(self):
+        if self.field_ranges_pending:
+            return
+        self.field_ranges_pending = True
+        field_ranges = self.get_field_ranges()
+        def refresh():
+            try:
+                num_new = field_ranges.refresh()
+            finally:
+                self.field_ranges_pending = False
+            if num_new and self.cmap_global_toggle.value:
+                self.call_in_gui(self.i_plot.update)
+        self.series_worker.submit(refresh)
+
+    # run fn on the kernel's thread (directly outside a kernel)
+    def call_in_gui(self, fn):
+        ip = get_ipython()
+        io_loop = getattr(getattr(ip, 'kernel', None), 'io_loop', None)
+        if io_loop is not None:
+            io_loop.add_callback(fn)
+        else:
+            fn()
+
+    # (min, max) colormap range, or None for each frame's own
+    def get_cmap_range(self):
+        if self.cmap_global_toggle.value:
+            field_ranges = self.get_field_ranges()
+            if not field_ranges.index.results:   # until indexed, fall back to the fixed or per-frame range
+                self.refresh_field_ranges()
+            global_range = field_ranges.global_range(self.field_index - 4)
+            if global_range is not None:
+                return global_range
+        if self.cmap_fixed_toggle.value:
+            return (self.cmap_min.value, self.cmap_max.value)
+        return None
+
+    def get_frame_times(self):
+        if self.frame_times is None or self.frame_times.output_dir != self.output_dir:
+            self.frame_times = FrameTimeIndex(self.output_dir)
+        return self.frame_times
+
+    # mesh of the current run, rebuilt if a frame's size doesn't match
+    def get_mesh(self, mat_fname, field):
+        if self.mesh is not None and self.mesh.matches(field):
+            return self.mesh
+        self.mesh = None
+        for build in (lambda: Mesh.for_run(self.output_dir, mat_fname), lambda: Mesh.from_mat(mat_fname)):
+            try:
+                mesh = build()
+            except (ValueError, OSError, ET.ParseError):
+                continue
+            if mesh.matches(field):
+                self.mesh = mesh
+                self.numx = mesh.numx
+                self.numy = mesh.numy
+                break
+        return self.mesh
+
+    #---------------------------------------------------------------------------
+    # map a (cell) frame # to its substrate frame #
+    def get_substrate_frame(self, frame):
+        # rwh - funky way to figure out substrate frame for pc4cancerbots (due to user-defined "save_interval*")
+        if (self.customized_output_freq and (frame > self.max_svg_frame_pre_therapy)):
+            # max_svg_frame_pre_therapy = int(self.therapy_activation_time/self.svg_delta_t)
+            # max_substrate_frame_pre_therapy = int(self.therapy_activation_time/self.substrate_delta_t)
+            return self.max_substrate_frame_pre_therapy + (frame - self.max_svg_frame_pre_therapy)
+        return int(frame / self.modulo)
+
+    # queue the next frames in the scrub direction (widgets are read here, not in workers)
+    def prefetch_frames(self, frame):
+        if self.prefetch_depth <= 0:
+            return
+        step = -1 if (self.last_frame is not None and frame < self.last_frame) else 1
+        self.last_frame = frame
+        field_index = self.field_index
+        substrates = self.substrates_toggle.value
+        cells = self.cells_toggle.value
+        jobs = []
+        for k in range(1, self.prefetch_depth + 1):
+            next_frame = frame + step*k
+            if next_frame < 0 or next_frame > self.max_frames.value:
+                break
+            cells_mat = cells and self.use_cell_matrix(next_frame)
+            key = (next_frame, field_index, substrates, cells, cells_mat)
+            jobs.append((key, lambda n=next_frame, m=cells_mat: self.warm_frame(n, field_index, substrates, cells, m)))
+        self.prefetcher.request(jobs)
+
+    # decode a frame's files into the frame cache, as the plot would
+    def warm_frame(self, frame, field_index, substrates, cells, cells_mat=False):
+        if substrates:
+            substrate_frame = self.get_substrate_frame(frame)
+            full_fname = os.path.join(self.output_dir, "output%08d_microenvironment0.mat" % substrate_frame)
+            full_xml_fname = os.path.join(self.output_dir, "output%08d.xml" % substrate_frame)
+            if os.path.isfile(full_fname) and os.path.isfile(full_xml_fname):
+                self.get_frame_times().time(substrate_frame)
+                mesh, lod = self.mesh, self.lod_factor
+                if mesh is not None and lod > 1:
+                    self.get_lod_row(full_fname, field_index, mesh, lod)
+                else:
+                    self.get_microenv_row(full_fname, field_index)
+        if cells and all(os.path.isfile(f) for f in self.get_cell_files(frame, cells_mat)):
+            self.get_cell_frame(frame, cells_mat)
+
+    #---------------------------------------------------------------------------
+    # axes for the next frame; with reuse_figure, the previous frame's artists are removed
+    def get_axes(self, width, height, colorbar=False, cell_colorbar=False):
+        if not self.reuse_figure:
+            self.fig = plt.figure(figsize=(width, height))
+            self.fig_state = None
+            self.cax = None
+            self.plot_artists = []
+            return self.fig.gca()
+
+        for artist in self.plot_artists:
+            try:
+                artist.remove()
+            except (ValueError, AttributeError, NotImplementedError):  # older matplotlib ContourSet
+                for c in getattr(artist, 'collections', []):
+                    c.remove()
+        self.plot_artists = []
+
+        key = (width, height, colorbar, cell_colorbar)
+        if key not in self.figs:
+            fig = Figure(figsize=(width, height))
+            ax = fig.add_subplot(111)
+            cax = ccax = None
+            if colorbar:
+                cax, _ = matplotlib.colorbar.make_axes(ax)
+            if cell_colorbar:   # for the cell density, below the plot
+                ccax, _ = matplotlib.colorbar.make_axes(ax, location='bottom')
+            self.figs[key] = {'fig':fig, 'ax':ax, 'cax':cax, 'ccax':ccax, 'cbar':None, 'image':None}
+        self.fig_state = self.figs[key]
+        self.fig = self.fig_state['fig']
+        self.cax = self.fig_state['cax']
+        return self.fig_state['ax']
+
+    def draw_colorbar(self, mappable):
+        if self.cax is None:
+            return self.fig.colorbar(mappable)
+        cbar = self.fig_state['cbar']
+        if cbar is not None and cbar.mappable is mappable and cbar.extend == getattr(mappable.norm, 'extend', None):
+            cbar.update_normal(mappable)   # same image, new data/limits
+            return cbar
+        if cbar is not None and getattr(cbar.mappable, 'colorbar_cid', None) is not None:
+            cbar.mappable.callbacks.disconnect(cbar.mappable.colorbar_cid)   # don't update a cleared colorbar
+        self.cax.cla()   # reuse the colorbar's axes; contour levels may differ from the last frame
+        self.fig_state['cbar'] = self.fig.colorbar(mappable, cax=self.cax)
+        return self.fig_state['cbar']
+
+    def use_raster(self, mesh):
+        if self.render_mode.value == 'auto':
+            return mesh.regular
+        return self.render_mode.value == 'raster'
+
+    # substrate field as an image, banded with contourf's levels
+    def draw_raster(self, ax, mesh, field, levels, extend):
+        cmap = plt.get_cmap(self.field_cmap.value)
+        norm = BoundaryNorm(levels, ncolors=cmap.N, extend=extend)
+        data = mesh.reshape(field)
+        image = self.fig_state['image'] if self.fig_state else None
+        if image is None:
+            image = ax.imshow(data, origin='lower', extent=mesh.extent, cmap=cmap, norm=norm,
+                              interpolation='nearest', aspect='auto')
+            if self.fig_state:
+                self.fig_state['image'] = image
+        else:
+            image.set_data(data)
+            image.set_cmap(cmap)
+            image.set_norm(norm)
+            image.set_extent(mesh.extent)
+            image.set_visible(True)
+        return image
+
+    # render the figure into the plot's output (no bbox_inches='tight': it draws twice)
+    def show_figure(self):
+        buf = io.BytesIO()
+        self.fig.savefig(buf, format='png', pil_kwargs={'compress_level': 1})
+        display(Image(data=buf.getvalue(), format='png'))
+
+    # render the substrate and/or cell layer not cached yet, then composite them
+    def show_layers(self, view_key, base_layer, cell_layer, cell_artists):
+        substrate_key, cells_key = view_key
+        ax, ccax = self.fig_state['ax'], self.fig_state['ccax']
+        overlay = [ax.title] + ([ccax] if ccax is not None else [])
+        if base_layer is None:
+            title = ax.title.get_text()
+            hidden = []
+            if cells_key is not None:
+                # blank the title, don't hide it (a hidden one shifts the axes)
+                ax.title.set_text('')
+                hidden = cell_artists + list(ax.spines.values()) + overlay[1:]
+            for artist in hidden:
+                artist.set_visible(False)
+            base_layer = layers.render(self.fig)
+            for artist in hidden:
+                artist.set_visible(True)
+            ax.title.set_text(title)
+            self.layer_cache.put(substrate_key, base_layer)
+        if cells_key is not None and cell_layer is None:
+            # axes frame on top, as in a single drawing
+            cell_layer = layers.render_artists(self.fig, cell_artists + list(ax.spines.values()) + overlay)
+            self.layer_cache.put(cells_key, cell_layer)
+        png = layers.to_png(layers.composite(base_layer, cell_layer if cells_key is not None else None))
+        self.render_cache.put(view_key, png)
+        display(Image(data=png, format='png'))
+
     #---------------------------------------------------------------------------
     def circles(self, x, y, s, c='b', vmin=None, vmax=None, **kwargs):
         """
@@ -643,7 +1204,7 @@ class SubstrateTab(object):
             norm, cmap, transform, etc.
         Returns
         -------
-        paths : `~matplotlib.collections.PathCollection`
+        paths : `~matplotlib.collections.EllipseCollection`
         Examples
         --------
         a = np.arange(11)
@@ -669,27 +1230,35 @@ class SubstrateTab(object):
             kwargs.setdefault('linewidth', kwargs.pop('lw'))
         # You can set `facecolor` with an array for each patch,
         # while you can only set `facecolors` with a value for all.
-
-        zipped = np.broadcast(x, y, s)
-        patches = [Circle((x_, y_), s_)
-                for x_, y_, s_ in zipped]
-        collection = PatchCollection(patches, **kwargs)
+        ax = kwargs.pop('ax', None)
+        if ax is None:
+            ax = plt.gca()
+
+        # one collection for all the circles, sized in data units like Circle patches
+        x, y, s = np.broadcast_arrays(x, y, s)
+        offsets = np.column_stack([np.ravel(x), np.ravel(y)])
+        d = 2 * np.ravel(s)
+        try:
+            collection = EllipseCollection(d, d, 0., units='xy', offsets=offsets, offset_transform=ax.transData, **kwargs)
+        except (TypeError, AttributeError):   # matplotlib < 3.6
+            collection = EllipseCollection(d, d, 0., units='xy', offsets=offsets, transOffset=ax.transData, **kwargs)
         if c is not None:
-            c = np.broadcast_to(c, zipped.shape).ravel()
+            c = np.broadcast_to(c, d.shape).ravel()
             collection.set_array(c)
             collection.set_clim(vmin, vmax)
 
-        ax = plt.gca()
         ax.add_collection(collection)
         ax.autoscale_view()
         # plt.draw_if_interactive()
-        if c is not None:
+        if c is not None and not self.reuse_figure:
             plt.sci(collection)
-        # return collection
+        return collection
 
     #------------------------------------------------------------
     # def plot_svg(self, frame, rdel=''):
-    def plot_svg(self, frame):
+    def plot_svg(self, frame, ax=None):
+        if ax is None:
+            ax = plt.gca()
         # global current_idx, axes_max
         global current_frame
         current_frame = frame
@@ -702,119 +1271,12 @@ class SubstrateTab(object):
             print("Once output files are generated, click the slider.")   
             return
 
-        xlist = deque()
-        ylist = deque()
-        rlist = deque()
-        rgb_list = deque()
-
-        #  print('\n---- ' + fname + ':')
-#        tree = ET.parse(fname)
-        tree = ET.parse(full_fname)
-        root = tree.getroot()
-        #  print('--- root.tag ---')
-        #  print(root.tag)
-        #  print('--- root.attrib ---')
-        #  print(root.attrib)
-        #  print('--- child.tag, child.attrib ---')
-        numChildren = 0
-        for child in root:
-            #    print(child.tag, child.attrib)
-            #    print("keys=",child.attrib.keys())
-            if self.use_defaults and ('width' in child.attrib.keys()):
-                self.axes_max = float(child.attrib['width'])
-                # print("debug> found width --> axes_max =", axes_max)
-            if child.text and "Current time" in child.text:
-                svals = child.text.split()
-                # remove the ".00" on minutes
-                self.title_str += "   cells: " + svals[2] + "d, " + svals[4] + "h, " + svals[7][:-3] + "m"
-
-                # self.cell_time_mins = int(svals[2])*1440 + int(svals[4])*60 + int(svals[7][:-3])
-                # self.title_str += "   cells: " + str(self.cell_time_mins) + "m"   # rwh
-
-            # print("width ",child.attrib['width'])
-            # print('attrib=',child.attrib)
-            # if (child.attrib['id'] == 'tissue'):
-            if ('id' in child.attrib.keys()):
-                # print('-------- found tissue!!')
-                tissue_parent = child
-                break
-
-        # print('------ search tissue')
-        cells_parent = None
-
-        for child in tissue_parent:
-            # print('attrib=',child.attrib)
-            if (child.attrib['id'] == 'cells'):
-                # print('-------- found cells, setting cells_parent')
-                cells_parent = child
-                break
-            numChildren += 1
-
-        num_cells = 0
-        #  print('------ search cells')
-        for child in cells_parent:
-            #    print(child.tag, child.attrib)
-            #    print('attrib=',child.attrib)
-            for circle in child:  # two circles in each child: outer + nucleus
-                #  circle.attrib={'cx': '1085.59','cy': '1225.24','fill': 'rgb(159,159,96)','r': '6.67717','stroke': 'rgb(159,159,96)','stroke-width': '0.5'}
-                #      print('  --- cx,cy=',circle.attrib['cx'],circle.attrib['cy'])
-                xval = float(circle.attrib['cx'])
-
-                # map SVG coords into comp domain
-                # xval = (xval-self.svg_xmin)/self.svg_xrange * self.x_range + self.xmin
-                xval = xval/self.x_range * self.x_range + self.xmin
-
-                s = circle.attrib['fill']
-                # print("s=",s)
-                # print("type(s)=",type(s))
-                if (s[0:3] == "rgb"):  # if an rgb string, e.g. "rgb(175,175,80)" 
-                    rgb = list(map(int, s[4:-1].split(",")))  
-                    rgb[:] = [x / 255. for x in rgb]
-                else:     # otherwise, must be a color name
-                    rgb_tuple = mplc.to_rgb(mplc.cnames[s])  # a tuple
-                    rgb = [x for x in rgb_tuple]
-
-                # test for bogus x,y locations (rwh TODO: use max of domain?)
-                too_large_val = 10000.
-                if (np.fabs(xval) > too_large_val):
-                    print("bogus xval=", xval)
-                    break
-                yval = float(circle.attrib['cy'])
-                # yval = (yval - self.svg_xmin)/self.svg_xrange * self.y_range + self.ymin
-                yval = yval/self.y_range * self.y_range + self.ymin
-                if (np.fabs(yval) > too_large_val):
-                    print("bogus xval=", xval)
-                    break
-
-                rval = float(circle.attrib['r'])
-                # if (rgb[0] > rgb[1]):
-                #     print(num_cells,rgb, rval)
-                xlist.append(xval)
-                ylist.append(yval)
-                rlist.append(rval)
-                rgb_list.append(rgb)
-
-                # For .svg files with cells that *have* a nucleus, there will be a 2nd
-                if (not self.show_nucleus):
-                #if (not self.show_nucleus):
-                    break
-
-            num_cells += 1
-
-            # if num_cells > 3:   # for debugging
-            #   print(fname,':  num_cells= ',num_cells," --- debug exit.")
-            #   sys.exit(1)
-            #   break
-
-            # print(fname,':  num_cells= ',num_cells)
-
-        xvals = np.array(xlist)
-        yvals = np.array(ylist)
-        rvals = np.array(rlist)
-        rgbs = np.array(rgb_list)
-        # print("xvals[0:5]=",xvals[0:5])
-        # print("rvals[0:5]=",rvals[0:5])
-        # print("rvals.min, max=",rvals.min(),rvals.max())
+        cells = self.get_cell_frame(frame)
+        if self.use_defaults and cells.width is not None:
+            self.axes_max = cells.width
+        if cells.time_str:
+            self.title_str += "   cells: " + cells.time_str
+        num_cells = cells.num_cells
 
         # rwh - is this where I change size of render window?? (YES - yipeee!)
         #   plt.figure(figsize=(6, 6))
@@ -827,10 +1289,9 @@ class SubstrateTab(object):
             # hrs = int(mins/60)
             # days = int(hrs/24)
             # title_str = '%dd, %dh, %dm' % (int(days),(hrs%24), mins - (hrs*60))
-        plt.title(self.title_str)
+        ax.set_title(self.title_str)
 
-        plt.xlim(self.xmin, self.xmax)
-        plt.ylim(self.ymin, self.ymax)
+        self.set_view_limits(ax)
 
         #   plt.xlim(axes_min,axes_max)
         #   plt.ylim(axes_min,axes_max)
@@ -858,18 +1319,7 @@ class SubstrateTab(object):
         # markers_size = markers_size/4000000.
         # print('max=',markers_size.max())
 
-        #rwh - temp fix - Ah, error only occurs when "edges" is toggled on
-        if (self.show_edge):
-            try:
-                # plt.scatter(xvals,yvals, s=markers_size, c=rgbs, edgecolor='black', linewidth=0.5)
-                self.circles(xvals,yvals, s=rvals, color=rgbs, edgecolor='black', linewidth=0.5)
-                # cell_circles = self.circles(xvals,yvals, s=rvals, color=rgbs, edgecolor='black', linewidth=0.5)
-                # plt.sci(cell_circles)
-            except (ValueError):
-                pass
-        else:
-            # plt.scatter(xvals,yvals, s=markers_size, c=rgbs)
-            self.circles(xvals,yvals, s=rvals, color=rgbs)
+        self.draw_cell_layer(ax, frame, cells)
 
         # if (self.show_tracks):
         #     for key in self.trackd.keys():
@@ -883,6 +1333,299 @@ class SubstrateTab(object):
 #        axx.set_title(title_str)
         # plt.title(title_str)
 
+    # the frame's cells as circles, or as a density raster
+    def draw_cell_layer(self, ax, frame, cells):
+        if self.cells_density:
+            self.draw_cell_density(ax, cells)
+        else:
+            xvals, yvals, rvals, rgbs = self.get_visible_circles(cells)
+            self.draw_cells(ax, xvals, yvals, rvals, rgbs)
+
+    def use_cell_density(self, frame):
+        if self.cell_draw.value != 'auto':
+            return self.cell_draw.value == 'density'
+        try:
+            return self.get_cell_count(frame, self.use_cell_matrix(frame)) >= self.cell_density_threshold.value
+        except (OSError, ValueError):   # no (readable) cells for the frame
+            return False
+
+    # number of cells in a frame, from a header/sidecar if not read yet
+    def get_cell_count(self, frame, use_matrix=False):
+        key = self.get_cell_frame_key(frame, use_matrix)
+        count = self.cell_counts.get(key)
+        if count is None:
+            fnames = self.get_cell_files(frame, use_matrix)
+            if use_matrix:
+                count = mat_reader.read_header(fnames[1]).cols
+            else:
+                meta = cell_sidecar.read_meta(fnames[0], self.xmin, self.ymin) if self.cell_sidecars else None
+                count = meta['num_cells'] if meta is not None else len(self.get_cell_frame(frame, use_matrix))
+            self.cell_counts[key] = count
+        return count
+
+    # (weights, colorbar label) of the cell density
+    def get_cell_weights(self, cells):
+        name = self.cell_weight.value
+        if name in ('red', 'green', 'blue'):
+            return cells.circles(False)[3][:, ['red', 'green', 'blue'].index(name)], name + ' per bin'
+        if name != 'count' and cells.matrix is not None and name in cells.matrix:
+            return cells.matrix[name], name + ' per bin'
+        if name != 'count':
+            return None, 'cells per bin (%s: cells from .mat only)' % name
+        return None, 'cells per bin'
+
+    # cell centers binned at screen resolution, drawn as one image (empty bins transparent)
+    def draw_cell_density(self, ax, cells):
+        extent = self.get_viewport() or (self.xmin, self.xmax, self.ymin, self.ymax)
+        shape = cell_density.screen_shape(ax, self.density_bin_pixels)
+        x, y, _, _ = cells.circles(False)
+        weights, label = self.get_cell_weights(cells)
+        counts = cell_density.bin_cells(x, y, extent, shape)
+        values = counts if weights is None else cell_density.bin_cells(x, y, extent, shape, weights)
+        image = ax.imshow(np.ma.masked_where(counts == 0, values), origin='lower', extent=extent,
+                          cmap=self.cell_density_cmap, interpolation='nearest', aspect='auto')
+        self.plot_artists.append(image)
+        ccax = self.fig_state['ccax'] if self.fig_state else None
+        if ccax is None:
+            cbar = self.fig.colorbar(image, ax=ax, orientation='horizontal')
+        else:
+            ccax.cla()
+            cbar = self.fig.colorbar(image, cax=ccax, orientation='horizontal')
+        cbar.set_label(label, fontsize=self.fontsize)
+        cbar.ax.tick_params(labelsize=self.fontsize)
+
+    def draw_cells(self, ax, xvals, yvals, rvals, rgbs):
+        #rwh - temp fix - Ah, error only occurs when "edges" is toggled on
+        if (self.show_edge):
+            try:
+                # plt.scatter(xvals,yvals, s=markers_size, c=rgbs, edgecolor='black', linewidth=0.5)
+                cell_circles = self.circles(xvals,yvals, s=rvals, color=rgbs, edgecolor='black', linewidth=0.5, ax=ax)
+                self.plot_artists.append(cell_circles)
+                # cell_circles = self.circles(xvals,yvals, s=rvals, color=rgbs, edgecolor='black', linewidth=0.5)
+                # plt.sci(cell_circles)
+            except (ValueError):
+                pass
+        else:
+            # plt.scatter(xvals,yvals, s=markers_size, c=rgbs)
+            cell_circles = self.circles(xvals,yvals, s=rvals, color=rgbs, ax=ax)
+            self.plot_artists.append(cell_circles)
+
+    #------------------------------------------------------------
+    # cells from the frame's output%08d_cells_physicell.mat, colored as in the SVGs
+    def use_cell_matrix(self, frame):
+        if self.cell_source.value == 'mat':
+            return True
+        if self.cell_source.value == 'svg':
+            return False
+        with self.cell_frames_lock:
+            if (frame, False) in self.cell_frames:   # already read from its SVG
+                return False
+        return not os.path.isfile(os.path.join(self.output_dir, "snapshot%08d.svg" % frame))
+
+    def get_cell_color_params(self):
+        config_fname = os.path.join(self.output_dir, 'config.xml')
+        if not os.path.isfile(config_fname):
+            return cell_matrix.read_color_params(config_fname)   # the defaults
+        return self.frame_cache.get_or_load(config_fname, cell_matrix.read_color_params, tag='colors')
+
+    def plot_cell_matrix(self, frame, ax):
+        if not os.path.isfile(self.get_cell_files(frame, True)[0]):
+            print("Once output files are generated, click the slider.")
+            return
+        cells = self.get_cell_frame(frame, True)
+        self.title_str += "   cells: " + cells.time_str
+        self.title_str += " (" + str(cells.num_cells) + " agents)"
+        ax.set_title(self.title_str)
+        self.set_view_limits(ax)
+        self.draw_cell_layer(ax, frame, cells)
+
+    # readout of the cell at (x,y) in the last plotted frame
+    def pick_cell(self, x, y, radius=0.):
+        if not self.cells_toggle.value:
+            return ''
+        use_matrix = self.use_cell_matrix(self.svg_frame)
+        try:
+            cells = self.get_cell_frame(self.svg_frame, use_matrix)
+        except (OSError, ValueError):
+            return ''
+        readout = ''
+        if radius > 0:
+            readout = '%d cells within %g;  ' % (len(cells.grid.within_radius(x, y, radius)), radius)
+        k = cells.pick(x, y)
+        if k is None:
+            return readout + 'no cell at (%g, %g)' % (x, y)
+        info = cells.cell_info(k)
+        return readout + ',  '.join('%s=%.4g' % (name, v) if isinstance(v, float) else '%s=%s' % (name, v)
+                                    for name, v in info.items())
+
+    #------------------------------------------------------------
+    # cells of a frame (outer and nucleus circles), parsed once
+    def get_cell_files(self, frame, use_matrix=False):
+        if use_matrix:
+            cells_frame = self.get_substrate_frame(frame)
+            return cell_matrix.matrix_files(os.path.join(self.output_dir, "output%08d.xml" % cells_frame))
+        return [os.path.join(self.output_dir, "snapshot%08d.svg" % frame)]
+
+    def get_cell_frame_key(self, frame, use_matrix=False):
+        with self.cell_frames_lock:
+            cells = self.cell_frames.get((frame, use_matrix))
+        if cells is not None:
+            return cells.key
+        return self.cell_cache_key(self.get_cell_files(frame, use_matrix), use_matrix)
+
+    # SVG cells are placed relative to xmin/ymin
+    def cell_cache_key(self, fnames, use_matrix):
+        return cell_frame.cache_key(fnames, 'cells' if use_matrix else ('cells', self.xmin, self.ymin))
+
+    def get_cell_frame(self, frame, use_matrix=False):
+        with self.cell_frames_lock:
+            if (frame, use_matrix) in self.cell_frames:
+                self.cell_frames.move_to_end((frame, use_matrix))
+                return self.cell_frames[(frame, use_matrix)]
+        fnames = self.get_cell_files(frame, use_matrix)
+        key = self.cell_cache_key(fnames, use_matrix)
+        cells = self.frame_cache.get(key)
+        if cells is None:
+            if use_matrix:
+                mins = round(self.get_frame_times().time(self.get_substrate_frame(frame)))
+                cells = cell_frame.from_matrix(cell_matrix.read_cell_matrix(fnames[0]), mins,
+                                               self.get_cell_color_params(), key)
+            elif self.cell_sidecars:
+                cells = cell_sidecar.read_cells(fnames[0], self.xmin, self.ymin, key)
+            else:
+                cells = cell_frame.from_svg(fnames[0], self.xmin, self.ymin, key)
+            self.frame_cache.put(key, cells)
+        self.cell_counts[key] = len(cells)
+        with self.cell_frames_lock:
+            self.cell_frames[(frame, use_matrix)] = cells
+            while len(self.cell_frames) > self.cell_frames_max:
+                self.cell_frames.popitem(last=False)
+        return cells
+
+    # draw the substrate field (colorbar, title) into ax
+    def draw_substrate(self, ax, full_fname):
+        # scipy.io.loadmat(fullname, info_dict)
+        #     global_field_index = int(mcds_field.value)
+        #     print('plot_substrate: field_index =',field_index)
+        f = self.get_microenv_row(full_fname, self.field_index)   # 4=tumor cells field, 5=blood vessel density, 6=growth substrate
+        # plt.clf()
+        # my_plot = plt.imshow(f.reshape(400,400), cmap='jet', extent=[0,20, 0,20])
+    
+        # self.fig = plt.figure(figsize=(18.0,15))  # this strange figsize results in a ~square contour plot
+
+        # plt.subplot(grid[0:1, 0:1])
+        # main_ax = self.fig.add_subplot(grid[0:1, 0:1])  # works, but tiny upper-left region
+        #main_ax = self.fig.add_subplot(grid[0:2, 0:2])
+        # main_ax = self.fig.add_subplot(grid[0:, 0:2])
+        #main_ax = self.fig.add_subplot(grid[:-1, 0:])   # nrows, ncols
+        #main_ax = self.fig.add_subplot(grid[0:, 0:])   # nrows, ncols
+        #main_ax = self.fig.add_subplot(grid[0:4, 0:])   # nrows, ncols
+
+
+        # main_ax = self.fig.add_subplot(grid[0:3, 0:])   # nrows, ncols
+        # main_ax = self.fig.add_subplot(111)   # nrows, ncols
+
+
+        # plt.rc('font', size=10)  # TODO: does this affect the Cell plots fonts too? YES. Not what we want.
+
+        #     fig.set_tight_layout(True)
+        #     ax = plt.axes([0, 0.05, 0.9, 0.9 ]) #left, bottom, width, height
+        #     ax = plt.axes([0, 0.0, 1, 1 ])
+        #     cmap = plt.cm.viridis # Blues, YlOrBr, ...
+        #     im = ax.imshow(f.reshape(100,100), interpolation='nearest', cmap=cmap, extent=[0,20, 0,20])
+        #     ax.grid(False)
+
+        # print("substrates.py: ------- numx, numy = ", self.numx, self.numy )
+        # if (self.numx == 0):   # need to parse vals from the config.xml
+        #     # print("--- plot_substrate(): full_fname=",full_fname)
+        #     fname = os.path.join(self.output_dir, "config.xml")
+        #     tree = ET.parse(fname)
+        #     xml_root = tree.getroot()
+        #     self.xmin = float(xml_root.find(".//x_min").text)
+        #     self.xmax = float(xml_root.find(".//x_max").text)
+        #     dx = float(xml_root.find(".//dx").text)
+        #     self.ymin = float(xml_root.find(".//y_min").text)
+        #     self.ymax = float(xml_root.find(".//y_max").text)
+        #     dy = float(xml_root.find(".//dy").text)
+        #     self.numx =  math.ceil( (self.xmax - self.xmin) / dx)
+        #     self.numy =  math.ceil( (self.ymax - self.ymin) / dy)
+
+        num_contours = 15
+        cmap_range = self.get_cmap_range()
+        mesh = self.get_mesh(full_fname, f)
+        viewport = self.get_viewport()
+        f_range = None
+        if mesh is None:
+            print("substrates.py: mismatched mesh size for reshape: numx,numy=",self.numx, self.numy)
+        elif viewport is None:
+            lod = self.lod_factor = self.get_lod_factor(ax, mesh)
+            if lod > 1:
+                f = self.get_lod_row(full_fname, self.field_index, mesh, lod)
+                mesh = mesh.coarsen(lod)
+        else:
+            # zoomed in: only the voxels in view (levels from the whole frame)
+            if cmap_range is None:
+                f_range = (f.min(), f.max())
+            mesh, f = mesh.window(f, *viewport)
+            lod = self.get_lod_factor(ax, mesh)
+            if lod > 1:
+                f = mesh.block_mean(f, lod)
+                mesh = mesh.coarsen(lod)
+            self.lod_factor = 1   # prefetch full-resolution rows, to window
+        if cmap_range is not None:
+            levels = MaxNLocator(nbins=num_contours).tick_values(cmap_range[0], cmap_range[1])
+        contour_ok = True
+        if self.fig_state and self.fig_state['image'] is not None:
+            self.fig_state['image'].set_visible(False)
+        if mesh is not None and self.use_raster(mesh):
+            try:
+                if cmap_range is not None:
+                    substrate_plot = self.draw_raster(ax, mesh, f, levels, 'both')
+                else:
+                    # same automatic levels as contourf(..., num_contours)
+                    auto_levels = MaxNLocator(nbins=num_contours+1, min_n_ticks=1).tick_values(
+                        *(f_range or (f.min(), f.max())))
+                    substrate_plot = self.draw_raster(ax, mesh, f, auto_levels, 'neither')
+            except:
+                contour_ok = False
+        elif cmap_range is not None:
+            try:
+                # substrate_plot = main_ax.contourf(xgrid, ygrid, M[self.field_index, :].reshape(self.numy, self.numx), levels=levels, extend='both', cmap=self.field_cmap.value, fontsize=self.fontsize)
+                substrate_plot = ax.contourf(mesh.xgrid, mesh.ygrid, mesh.reshape(f), levels=levels, extend='both', cmap=self.field_cmap.value)
+            except:
+                contour_ok = False
+                # print('got error on contourf 1.')
+        else:    
+            try:
+                # substrate_plot = main_ax.contourf(xgrid, ygrid, M[self.field_index, :].reshape(self.numy,self.numx), num_contours, cmap=self.field_cmap.value)
+                if f_range is None:
+                    substrate_plot = ax.contourf(mesh.xgrid, mesh.ygrid, mesh.reshape(f), num_contours, cmap=self.field_cmap.value)
+                else:
+                    auto_levels = MaxNLocator(nbins=num_contours+1, min_n_ticks=1).tick_values(*f_range)
+                    substrate_plot = ax.contourf(mesh.xgrid, mesh.ygrid, mesh.reshape(f), auto_levels, cmap=self.field_cmap.value)
+            except:
+                contour_ok = False
+                # print('got error on contourf 2.')
+
+        if (contour_ok):
+            # main_ax.set_title(self.title_str, fontsize=self.fontsize)
+            if substrate_plot is not (self.fig_state and self.fig_state['image']):
+                self.plot_artists.append(substrate_plot)
+            ax.set_title(self.title_str, fontsize=self.fontsize)
+            # main_ax.tick_params(labelsize=self.fontsize)
+        # cbar = plt.colorbar(my_plot)
+            # cbar = self.fig.colorbar(substrate_plot, ax=main_ax)
+            cbar = self.draw_colorbar(substrate_plot)
+            cbar.ax.tick_params(labelsize=self.fontsize)
+            # cbar = main_ax.colorbar(my_plot)
+            # cbar.ax.tick_params(labelsize=self.fontsize)
+        # axes_min = 0
+        # axes_max = 2000
+
+        # main_ax.set_xlim([self.xmin, self.xmax])
+        # main_ax.set_ylim([self.ymin, self.ymax])
+        self.set_view_limits(ax)
+
     #---------------------------------------------------------------------------
     # assume "frame" is cell frame #, unless Cells is togggled off, then it's the substrate frame #
     # def plot_substrate(self, frame, grid):
@@ -892,6 +1635,21 @@ class SubstrateTab(object):
         # print("plot_substrate(): frame*self.substrate_delta_t  = ",frame*self.substrate_delta_t)
         # print("plot_substrate(): frame*self.svg_delta_t  = ",frame*self.svg_delta_t)
         self.title_str = ''
+        ax = None
+
+        # circles or density, chosen once for the frame
+        cells_density = self.cells_density = self.cells_toggle.value and self.use_cell_density(frame)
+        view_key = self.get_view_key(frame, cells_density) if self.reuse_figure else None
+        base_layer = cell_layer = None
+        if view_key is not None:
+            png = self.render_cache.get(view_key)
+            if png is not None:
+                display(Image(data=png, format='png'))
+                self.prefetch_frames(frame)
+                return
+            base_layer = self.layer_cache.get(view_key[0])
+            if view_key[1] is not None:
+                cell_layer = self.layer_cache.get(view_key[1])
 
         # Recall:
         # self.svg_delta_t = config_tab.svg_interval.value
@@ -909,17 +1667,13 @@ class SubstrateTab(object):
         if (self.substrates_toggle.value):
             # self.fig = plt.figure(figsize=(14, 15.6))
             # self.fig = plt.figure(figsize=(15.0, 12.5))
-            self.fig = plt.figure(figsize=(self.figsize_width_substrate, self.figsize_height_substrate))
+            ax = self.get_axes(self.figsize_width_substrate, self.figsize_height_substrate, colorbar=True,
+                               cell_colorbar=cells_density)
 
             # rwh - funky way to figure out substrate frame for pc4cancerbots (due to user-defined "save_interval*")
             # self.cell_time_mins 
             # self.substrate_frame = int(frame / self.modulo)
-            if (self.customized_output_freq and (frame > self.max_svg_frame_pre_therapy)):
-                # max_svg_frame_pre_therapy = int(self.therapy_activation_time/self.svg_delta_t)
-                # max_substrate_frame_pre_therapy = int(self.therapy_activation_time/self.substrate_delta_t)
-                self.substrate_frame = self.max_substrate_frame_pre_therapy + (frame - self.max_svg_frame_pre_therapy)
-            else:
-                self.substrate_frame = int(frame / self.modulo)
+            self.substrate_frame = self.get_substrate_frame(frame)
 
             # print("plot_substrate(): self.substrate_frame=",self.substrate_frame)        
 
@@ -948,10 +1702,8 @@ class SubstrateTab(object):
                 return
 
     #        tree = ET.parse(xml_fname)
-            tree = ET.parse(full_xml_fname)
-            xml_root = tree.getroot()
-            mins = round(int(float(xml_root.find(".//current_time").text)))  # TODO: check units = mins
-            self.substrate_mins= round(int(float(xml_root.find(".//current_time").text)))  # TODO: check units = mins
+            mins = round(int(self.get_frame_times().time(self.substrate_frame)))  # TODO: check units = mins
+            self.substrate_mins = mins
 
             hrs = int(mins/60)
             days = int(hrs/24)
@@ -959,99 +1711,8 @@ class SubstrateTab(object):
             # self.title_str = 'substrate: %dm' % (mins )   # rwh
 
 
-            info_dict = {}
-    #        scipy.io.loadmat(fullname, info_dict)
-            scipy.io.loadmat(full_fname, info_dict)
-            M = info_dict['multiscale_microenvironment']
-            #     global_field_index = int(mcds_field.value)
-            #     print('plot_substrate: field_index =',field_index)
-            f = M[self.field_index, :]   # 4=tumor cells field, 5=blood vessel density, 6=growth substrate
-            # plt.clf()
-            # my_plot = plt.imshow(f.reshape(400,400), cmap='jet', extent=[0,20, 0,20])
-        
-            # self.fig = plt.figure(figsize=(18.0,15))  # this strange figsize results in a ~square contour plot
-
-            # plt.subplot(grid[0:1, 0:1])
-            # main_ax = self.fig.add_subplot(grid[0:1, 0:1])  # works, but tiny upper-left region
-            #main_ax = self.fig.add_subplot(grid[0:2, 0:2])
-            # main_ax = self.fig.add_subplot(grid[0:, 0:2])
-            #main_ax = self.fig.add_subplot(grid[:-1, 0:])   # nrows, ncols
-            #main_ax = self.fig.add_subplot(grid[0:, 0:])   # nrows, ncols
-            #main_ax = self.fig.add_subplot(grid[0:4, 0:])   # nrows, ncols
-
-
-            # main_ax = self.fig.add_subplot(grid[0:3, 0:])   # nrows, ncols
-            # main_ax = self.fig.add_subplot(111)   # nrows, ncols
-
-
-            # plt.rc('font', size=10)  # TODO: does this affect the Cell plots fonts too? YES. Not what we want.
-
-            #     fig.set_tight_layout(True)
-            #     ax = plt.axes([0, 0.05, 0.9, 0.9 ]) #left, bottom, width, height
-            #     ax = plt.axes([0, 0.0, 1, 1 ])
-            #     cmap = plt.cm.viridis # Blues, YlOrBr, ...
-            #     im = ax.imshow(f.reshape(100,100), interpolation='nearest', cmap=cmap, extent=[0,20, 0,20])
-            #     ax.grid(False)
-
-            # print("substrates.py: ------- numx, numy = ", self.numx, self.numy )
-            # if (self.numx == 0):   # need to parse vals from the config.xml
-            #     # print("--- plot_substrate(): full_fname=",full_fname)
-            #     fname = os.path.join(self.output_dir, "config.xml")
-            #     tree = ET.parse(fname)
-            #     xml_root = tree.getroot()
-            #     self.xmin = float(xml_root.find(".//x_min").text)
-            #     self.xmax = float(xml_root.find(".//x_max").text)
-            #     dx = float(xml_root.find(".//dx").text)
-            #     self.ymin = float(xml_root.find(".//y_min").text)
-            #     self.ymax = float(xml_root.find(".//y_max").text)
-            #     dy = float(xml_root.find(".//dy").text)
-            #     self.numx =  math.ceil( (self.xmax - self.xmin) / dx)
-            #     self.numy =  math.ceil( (self.ymax - self.ymin) / dy)
-
-            try:
-                xgrid = M[0, :].reshape(self.numy, self.numx)
-                ygrid = M[1, :].reshape(self.numy, self.numx)
-            except:
-                print("substrates.py: mismatched mesh size for reshape: numx,numy=",self.numx, self.numy)
-                pass
-#                xgrid = M[0, :].reshape(self.numy, self.numx)
-#                ygrid = M[1, :].reshape(self.numy, self.numx)
-
-            num_contours = 15
-            levels = MaxNLocator(nbins=num_contours).tick_values(self.cmap_min.value, self.cmap_max.value)
-            contour_ok = True
-            if (self.cmap_fixed_toggle.value):
-                try:
-                    # substrate_plot = main_ax.contourf(xgrid, ygrid, M[self.field_index, :].reshape(self.numy, self.numx), levels=levels, extend='both', cmap=self.field_cmap.value, fontsize=self.fontsize)
-                    substrate_plot = plt.contourf(xgrid, ygrid, M[self.field_index, :].reshape(self.numy, self.numx), levels=levels, extend='both', cmap=self.field_cmap.value, fontsize=self.fontsize)
-                except:
-                    contour_ok = False
-                    # print('got error on contourf 1.')
-            else:    
-                try:
-                    # substrate_plot = main_ax.contourf(xgrid, ygrid, M[self.field_index, :].reshape(self.numy,self.numx), num_contours, cmap=self.field_cmap.value)
-                    substrate_plot = plt.contourf(xgrid, ygrid, M[self.field_index, :].reshape(self.numy,self.numx), num_contours, cmap=self.field_cmap.value)
-                except:
-                    contour_ok = False
-                    # print('got error on contourf 2.')
-
-            if (contour_ok):
-                # main_ax.set_title(self.title_str, fontsize=self.fontsize)
-                plt.title(self.title_str, fontsize=self.fontsize)
-                # main_ax.tick_params(labelsize=self.fontsize)
-            # cbar = plt.colorbar(my_plot)
-                # cbar = self.fig.colorbar(substrate_plot, ax=main_ax)
-                cbar = self.fig.colorbar(substrate_plot)
-                cbar.ax.tick_params(labelsize=self.fontsize)
-                # cbar = main_ax.colorbar(my_plot)
-                # cbar.ax.tick_params(labelsize=self.fontsize)
-            # axes_min = 0
-            # axes_max = 2000
-
-            # main_ax.set_xlim([self.xmin, self.xmax])
-            # main_ax.set_ylim([self.ymin, self.ymax])
-            plt.xlim(self.xmin, self.xmax)
-            plt.ylim(self.ymin, self.ymax)
+            if base_layer is None:   # not rendered already, see show_layers()
+                self.draw_substrate(ax, full_fname)
 
             # if (frame == 0):  # maybe allow substrate grid display later
             #     xs = np.linspace(self.xmin,self.xmax,self.numx)
@@ -1070,11 +1731,26 @@ class SubstrateTab(object):
         if (self.cells_toggle.value):
             if (not self.substrates_toggle.value):
                 # self.fig = plt.figure(figsize=(12, 12))
-                self.fig = plt.figure(figsize=(self.figsize_width_svg, self.figsize_height_svg))
+                ax = self.get_axes(self.figsize_width_svg, self.figsize_height_svg, cell_colorbar=cells_density)
             # self.plot_svg(frame)
             self.svg_frame = frame
             # print('plot_svg with frame=',self.svg_frame)
-            self.plot_svg(self.svg_frame)
+            num_artists = len(self.plot_artists)
+            if cell_layer is not None:   # rendered already, see show_layers()
+                pass
+            elif self.use_cell_matrix(frame):
+                self.plot_cell_matrix(frame, ax)
+            else:
+                self.plot_svg(self.svg_frame, ax)
+            cell_artists = self.plot_artists[num_artists:]
+
+        if self.reuse_figure and ax is not None:
+            if view_key is None:
+                self.show_figure()
+            else:
+                self.show_layers(view_key, base_layer, cell_layer, cell_artists if self.cells_toggle.value else [])
+
+        self.prefetch_frames(frame)
 
         # plt.subplot(grid[2, 0])
         # oxy_ax = self.fig.add_subplot(grid[2:, 0:1])
@@ -2,17 +2,14 @@
 import os
 from ipywidgets import Layout, Label, Text, Checkbox, Button, HBox, VBox, Box, \
     FloatText, BoundedIntText, BoundedFloatText, HTMLMath, Dropdown, interactive, Output
-from collections import deque
-import xml.etree.ElementTree as ET
 import matplotlib.pyplot as plt
 #from matplotlib.patches import Circle, Ellipse, Rectangle
-from matplotlib.patches import Circle
-from matplotlib.collections import PatchCollection
-import matplotlib.colors as mplc
+from matplotlib.collections import EllipseCollection
 import numpy as np
 import zipfile
 import glob
 import platform
+import snapshot_svg
 # from debug import debug_view
 
 hublib_flag = True
@@ -178,7 +175,7 @@ class SVGTab(object):
             norm, cmap, transform, etc.
         Returns
         -------
-        paths : `~matplotlib.collections.PathCollection`
+        paths : `~matplotlib.collections.EllipseCollection`
         Examples
         --------
         a = np.arange(11)
@@ -205,16 +202,22 @@ class SVGTab(object):
         # You can set `facecolor` with an array for each patch,
         # while you can only set `facecolors` with a value for all.
 
-        zipped = np.broadcast(x, y, s)
-        patches = [Circle((x_, y_), s_)
-                for x_, y_, s_ in zipped]
-        collection = PatchCollection(patches, **kwargs)
+        ax = plt.gca()
+
+        # one collection for all the circles: diameters in data units (units='xy'), centered at
+        # the offsets in data coords, so they scale with the axes just like Circle patches do
+        x, y, s = np.broadcast_arrays(x, y, s)
+        offsets = np.column_stack([np.ravel(x), np.ravel(y)])
+        d = 2 * np.ravel(s)
+        try:
+            collection = EllipseCollection(d, d, 0., units='xy', offsets=offsets, offset_transform=ax.transData, **kwargs)
+        except (TypeError, AttributeError):   # matplotlib < 3.6
+            collection = EllipseCollection(d, d, 0., units='xy', offsets=offsets, transOffset=ax.transData, **kwargs)
         if c is not None:
-            c = np.broadcast_to(c, zipped.shape).ravel()
+            c = np.broadcast_to(c, d.shape).ravel()
             collection.set_array(c)
             collection.set_clim(vmin, vmax)
 
-        ax = plt.gca()
         ax.add_collection(collection)
         ax.autoscale_view()
         plt.draw_if_interactive()
@@ -235,111 +238,20 @@ class SVGTab(object):
             print("Once output files are generated, click the slider.")   
             return
 
-        xlist = deque()
-        ylist = deque()
-        rlist = deque()
-        rgb_list = deque()
-
-        #  print('\n---- ' + fname + ':')
-#        tree = ET.parse(fname)
-        tree = ET.parse(full_fname)
-        root = tree.getroot()
-        #  print('--- root.tag ---')
-        #  print(root.tag)
-        #  print('--- root.attrib ---')
-        #  print(root.attrib)
-        #  print('--- child.tag, child.attrib ---')
-        numChildren = 0
-        for child in root:
-            #    print(child.tag, child.attrib)
-            #    print("keys=",child.attrib.keys())
-            if self.use_defaults and ('width' in child.attrib.keys()):
-                self.axes_max = float(child.attrib['width'])
-                # print("debug> found width --> axes_max =", axes_max)
-            if child.text and "Current time" in child.text:
-                svals = child.text.split()
-                # title_str = "(" + str(current_idx) + ") Current time: " + svals[2] + "d, " + svals[4] + "h, " + svals[7] + "m"
-                # title_str = "Current time: " + svals[2] + "d, " + svals[4] + "h, " + svals[7] + "m"
-                title_str = svals[2] + "d, " + svals[4] + "h, " + svals[7] + "m"
-
-            # print("width ",child.attrib['width'])
-            # print('attrib=',child.attrib)
-            # if (child.attrib['id'] == 'tissue'):
-            if ('id' in child.attrib.keys()):
-                # print('-------- found tissue!!')
-                tissue_parent = child
-                break
-
-        # print('------ search tissue')
-        cells_parent = None
-
-        for child in tissue_parent:
-            # print('attrib=',child.attrib)
-            if (child.attrib['id'] == 'cells'):
-                # print('-------- found cells, setting cells_parent')
-                cells_parent = child
-                break
-            numChildren += 1
-
-        num_cells = 0
-        #  print('------ search cells')
-        for child in cells_parent:
-            #    print(child.tag, child.attrib)
-            #    print('attrib=',child.attrib)
-            for circle in child:  # two circles in each child: outer + nucleus
-                #  circle.attrib={'cx': '1085.59','cy': '1225.24','fill': 'rgb(159,159,96)','r': '6.67717','stroke': 'rgb(159,159,96)','stroke-width': '0.5'}
-                #      print('  --- cx,cy=',circle.attrib['cx'],circle.attrib['cy'])
-                xval = float(circle.attrib['cx'])
-
-                s = circle.attrib['fill']
-                # print("s=",s)
-                # print("type(s)=",type(s))
-                if (s[0:3] == "rgb"):  # if an rgb string, e.g. "rgb(175,175,80)" 
-                    rgb = list(map(int, s[4:-1].split(",")))  
-                    rgb[:] = [x / 255. for x in rgb]
-                else:     # otherwise, must be a color name
-                    rgb_tuple = mplc.to_rgb(mplc.cnames[s])  # a tuple
-                    rgb = [x for x in rgb_tuple]
-
-                # test for bogus x,y locations (rwh TODO: use max of domain?)
-                too_large_val = 10000.
-                if (np.fabs(xval) > too_large_val):
-                    print("bogus xval=", xval)
-                    break
-                yval = float(circle.attrib['cy'])
-                if (np.fabs(yval) > too_large_val):
-                    print("bogus xval=", xval)
-                    break
-
-                rval = float(circle.attrib['r'])
-                # if (rgb[0] > rgb[1]):
-                #     print(num_cells,rgb, rval)
-                xlist.append(xval)
-                ylist.append(yval)
-                rlist.append(rval)
-                rgb_list.append(rgb)
-
-                # For .svg files with cells that *have* a nucleus, there will be a 2nd
-                if (self.show_nucleus == 0):
-                #if (not self.show_nucleus):
-                    break
-
-            num_cells += 1
-
-            # if num_cells > 3:   # for debugging
-            #   print(fname,':  num_cells= ',num_cells," --- debug exit.")
-            #   sys.exit(1)
-            #   break
-
-            # print(fname,':  num_cells= ',num_cells)
-
-        xvals = np.array(xlist)
-        yvals = np.array(ylist)
-        rvals = np.array(rlist)
-        rgbs = np.array(rgb_list)
-        # print("xvals[0:5]=",xvals[0:5])
-        # print("rvals[0:5]=",rvals[0:5])
-        # print("rvals.min, max=",rvals.min(),rvals.max())
+        cells = snapshot_svg.read_cells(full_fname)
+        if self.use_defaults and cells['width'] is not None:
+            self.axes_max = cells['width']
+        title_str = ''
+        if cells['time_text']:
+            svals = cells['time_text'].split()
+            title_str = svals[2] + "d, " + svals[4] + "h, " + svals[7] + "m"
+        # For .svg files with cells that *have* a nucleus, there will be a 2nd circle per cell
+        keep = cells['outer'] if (self.show_nucleus == 0) else slice(None)
+        xvals = cells['x'][keep]
+        yvals = cells['y'][keep]
+        rvals = cells['r'][keep]
+        rgbs = cells['rgba'][keep]
+        num_cells = cells['num_cells']
 
         # rwh - is this where I change size of render window?? (YES - yipeee!)
         #   plt.figure(figsize=(6, 6))
@@ -0,0 +1,58 @@
+# Substrate values at a few voxels over every frame of a run, without reading whole frames
+#
+# A voxel is one column of the .mat matrix: one seek and one small read per probe and frame.
+
+import os
+import numpy as np
+import mat_reader
+from run_index import RunIndex
+from substrate_stats import MICROENV_PATTERN, FIRST_FIELD_ROW
+
+PROBE_DIR = 'probe_cache'   # <output_dir>/probe_cache/voxel%d.npz: one history per voxel
+
+
+def voxel_values(mat_fname, voxels):
+    """(len(voxels), num fields) substrate values at the given voxels (matrix columns) of one frame."""
+    header = mat_reader.read_header(mat_fname)
+    itemsize = header.dtype.itemsize
+    num_fields = header.rows - FIRST_FIELD_ROW
+    out = np.empty((len(voxels), num_fields))
+    with open(mat_fname, 'rb') as f:
+        for k, voxel in enumerate(voxels):
+            if voxel < 0 or voxel >= header.cols:
+                raise IndexError("%s: voxel %d out of range (%d voxels)" % (mat_fname, voxel, header.cols))
+            f.seek(header.offset + (voxel * header.rows + FIRST_FIELD_ROW) * itemsize)
+            raw = f.read(num_fields * itemsize)
+            if len(raw) < num_fields * itemsize:
+                raise ValueError("%s: truncated" % mat_fname)
+            out[k] = np.frombuffer(raw, dtype=header.dtype)
+    return out
+
+
+class ProbeIndex(object):
+    """Histories of the substrates at a set of voxels, each cached in <output_dir>/probe_cache (on threads)."""
+
+    def __init__(self, output_dir, voxels=(), max_workers=None):
+        self.output_dir = output_dir
+        self.max_workers = max_workers
+        self.indexes = {}   # voxel -> RunIndex of its history
+        self.set_voxels(voxels)
+
+    def set_voxels(self, voxels):
+        self.voxels = tuple(int(v) for v in voxels)
+        for voxel in self.voxels:
+            if voxel not in self.indexes:
+                self.indexes[voxel] = RunIndex(self.output_dir, os.path.join(PROBE_DIR, 'voxel%d' % voxel),
+                                               MICROENV_PATTERN, voxel_values, args=((voxel,),),
+                                               max_workers=self.max_workers, use_processes=False)
+
+    def refresh(self):
+        return sum(self.indexes[voxel].refresh() for voxel in self.voxels)
+
+    def histories(self):
+        """(frames, (num frames, num voxels, num fields) values); values is None if nothing is indexed."""
+        results = [dict(self.indexes[voxel].results) for voxel in self.voxels]
+        frames = sorted(set.intersection(*[set(r) for r in results])) if results else []
+        if not frames:
+            return np.zeros(0, dtype=np.int64), None
+        return np.array(frames), np.stack([np.concatenate([r[k] for r in results]) for k in frames])
@@ -0,0 +1,48 @@
+# Shared fixtures: the modules under bin/ on the path, and a one-frame run made from tmpdir/initial.*
+
+import os
+import sys
+import shutil
+import xml.etree.ElementTree as ET
+import pytest
+import matplotlib
+
+matplotlib.use('Agg')
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_DIR = os.path.join(REPO_DIR, 'tmpdir')
+sys.path.insert(0, os.path.join(REPO_DIR, 'bin'))
+
+
+@pytest.fixture
+def sample_dir():
+    return SAMPLE_DIR
+
+
+@pytest.fixture
+def run_dir(tmp_path):
+    """Output dir of a run whose frame 0 is the sample's initial.* files."""
+    for fname in os.listdir(SAMPLE_DIR):
+        shutil.copy(os.path.join(SAMPLE_DIR, fname), tmp_path)
+    shutil.copy(tmp_path / 'initial.xml', tmp_path / 'output00000000.xml')
+    shutil.copy(tmp_path / 'initial_microenvironment0.mat', tmp_path / 'output00000000_microenvironment0.mat')
+    shutil.copy(tmp_path / 'initial_cells_physicell.mat', tmp_path / 'output00000000_cells_physicell.mat')
+    shutil.copy(tmp_path / 'initial.svg', tmp_path / 'snapshot00000000.svg')
+    return str(tmp_path)
+
+
+@pytest.fixture
+def substrate_tab(run_dir):
+    """SubstrateTab showing run_dir, as the GUI sets it up after a run."""
+    from config import ConfigTab
+    from substrates import SubstrateTab
+    config_tab = ConfigTab()
+    config_tab.fill_gui(ET.parse(os.path.join(run_dir, 'config.xml')).getroot())
+    tab = SubstrateTab()
+    tab.update_dropdown_fields(run_dir)
+    tab.update_params(config_tab, None)
+    tab.update(run_dir)
+    tab.prefetch_depth = 0
+    yield tab
+    tab.i_plot.update = lambda *args, **kwargs: None   # widgets closed at exit would redraw
+    tab.cmap_global_toggle.value = False   # ... or queue a refresh on the shut-down series_worker
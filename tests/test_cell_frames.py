@@ -0,0 +1,24 @@
+# The tab's cells of a frame: cached by their files, and (from an SVG) by the domain they're placed in
+
+import os
+import xml.etree.ElementTree as ET
+import numpy as np
+from config import ConfigTab
+
+
+def test_svg_cells_follow_the_domain(substrate_tab, run_dir):
+    tab = substrate_tab
+    cells = tab.get_cell_frame(0, use_matrix=False)
+    key = tab.get_cell_frame_key(0, use_matrix=False)
+
+    config_tab = ConfigTab()
+    config_tab.fill_gui(ET.parse(os.path.join(run_dir, 'config.xml')).getroot())
+    config_tab.xmin.value -= 100.
+    config_tab.ymin.value -= 50.
+    tab.update_params(config_tab, None)
+
+    assert tab.get_cell_frame_key(0, use_matrix=False) != key
+    moved = tab.get_cell_frame(0, use_matrix=False)
+    assert moved is not cells
+    np.testing.assert_allclose(moved.x, cells.x - 100.)
+    np.testing.assert_allclose(moved.y, cells.y - 50.)
@@ -0,0 +1,34 @@
+import os
+import xml.etree.ElementTree as ET
+import numpy as np
+import pytest
+import cell_frame
+import cell_matrix
+
+
+@pytest.mark.parametrize('svg_enabled, modulo', [('true', 3), ('false', 1)])
+def test_modulo_without_snapshots(run_dir, request, svg_enabled, modulo):
+    config_fname = os.path.join(run_dir, 'config.xml')
+    tree = ET.parse(config_fname)
+    tree.find('.//SVG/interval').text = '20'
+    tree.find('.//SVG/enable').text = svg_enabled
+    tree.write(config_fname)
+    if svg_enabled == 'false':
+        os.remove(os.path.join(run_dir, 'snapshot00000000.svg'))
+    tab = request.getfixturevalue('substrate_tab')
+    assert tab.modulo == modulo   # without SVGs, every frame is an output frame
+
+
+def test_matrix_cells_match_the_svg(sample_dir):
+    config_fname = os.path.join(sample_dir, 'config.xml')
+    root = ET.parse(config_fname).getroot()
+    xmin, ymin = float(root.find('.//x_min').text), float(root.find('.//y_min').text)
+    svg = cell_frame.from_svg(os.path.join(sample_dir, 'initial.svg'), xmin, ymin)
+    mat = cell_frame.from_matrix(cell_matrix.read_cell_matrix(os.path.join(sample_dir, 'initial.xml')), 0,
+                                 cell_matrix.read_color_params(config_fname))
+    assert len(mat) == len(svg) > 0
+    assert np.array_equal(mat.outer, svg.outer)
+    np.testing.assert_allclose(mat.x, svg.x, atol=0.01)   # the SVG has 6 significant digits
+    np.testing.assert_allclose(mat.y, svg.y, atol=0.01)
+    np.testing.assert_allclose(mat.r, svg.r, rtol=1e-5)
+    np.testing.assert_allclose(mat.rgba, svg.rgba, atol=0.5 / 255)
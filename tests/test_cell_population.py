@@ -0,0 +1,66 @@
+import os
+import re
+import numpy as np
+import cell_population
+from cell_population import COLUMNS, PopulationIndex
+
+
+def recolor(svg_fname, out_fname, fills, time_text=None):
+    """Copy of a snapshot with its first outer circles filled with fills, in order."""
+    with open(svg_fname) as f:
+        text = f.read()
+    fills = iter(fills)
+
+    def outer(m):   # the first circle of each cell's group
+        fill = next(fills, None)
+        return m.group(0) if fill is None else m.group(1) + 'fill="%s"' % fill
+    text = re.sub(r'(<g id="cell[^>]*>\s*<circle [^>]*?)fill="[^"]*"', outer, text)
+    if time_text is not None:
+        text = re.sub(r'Current time:[^<]*', time_text, text, count=1)
+    with open(out_fname, 'w') as f:
+        f.write(text)
+
+
+def row(values):
+    return dict(zip(COLUMNS, values))
+
+
+def test_svg_time():
+    assert cell_population.svg_time('Current time: 1 days, 2 hours, and 30.50 minutes, z = 0.00 &#956;m') == 1590.5
+    assert cell_population.svg_time('Current time: 0 days, 0 hours, and 0.00 minutes') == 0.
+    assert np.isnan(cell_population.svg_time(''))
+    assert np.isnan(cell_population.svg_time('Current time: soon'))
+
+
+def test_snapshot_and_matrix_agree(sample_dir):
+    svg = row(cell_population.svg_population(os.path.join(sample_dir, 'initial.svg')))
+    mat = row(cell_population.matrix_population(os.path.join(sample_dir, 'initial.xml')))
+    for name in COLUMNS[:-1]:
+        assert svg[name] == mat[name], name
+    assert svg['total'] == 889 and svg['live'] + svg['immune'] == svg['live total']
+    assert np.isclose(svg['total volume'], mat['total volume'], rtol=1e-4)
+
+
+def test_classes_from_fills(run_dir):
+    fname = os.path.join(run_dir, 'snapshot00000001.svg')
+    recolor(os.path.join(run_dir, 'initial.svg'), fname,
+            ['black'] * 3 + ['rgb(255,0,0)'] * 5 + ['rgb(250,138,38)'] * 7 + ['rgb(0,255,0)'],
+            'Current time: 0 days, 1 hours, and 0.00 minutes')
+    counts = row(cell_population.svg_population(fname))
+    assert (counts['time'], counts['immune'], counts['apoptotic'], counts['necrotic']) == (60., 3, 5, 7)
+    assert counts['live'] == 889 - 15 and counts['total'] == 889
+    assert (counts['live total'], counts['dead total']) == (889 - 12, 12)
+
+    index = PopulationIndex(run_dir, 'svg')
+    index.refresh()
+    frames, values = index.values()
+    assert list(frames) == [0, 1]
+    assert values.shape == (2, len(COLUMNS))
+    assert np.array_equal(values[1], cell_population.svg_population(fname))
+    frames, necrotic = index.column('necrotic')
+    assert list(necrotic) == [0, 7]
+
+    index = PopulationIndex(run_dir, 'mat')
+    index.refresh()
+    frames, total = index.column('total')
+    assert list(frames) == [0] and list(total) == [889]
@@ -0,0 +1,59 @@
+import os
+import numpy as np
+import cell_frame
+import cell_sidecar
+
+
+def assert_same_cells(a, b):
+    for name in ('x', 'y', 'r', 'outer'):
+        assert np.array_equal(getattr(a, name), getattr(b, name)), name
+    assert np.allclose(a.colors, b.colors, atol=0.5 / 255)
+    assert (a.num_cells, a.time_str, a.width) == (b.num_cells, b.time_str, b.width)
+
+
+def test_round_trip_columns(run_dir):
+    svg_fname = os.path.join(run_dir, 'snapshot00000000.svg')
+    parsed = cell_sidecar.read_cells(svg_fname, -10., 5.)   # parses and writes the sidecar
+    assert os.path.isfile(cell_sidecar.sidecar_fnames(svg_fname)[0])
+    cached = cell_sidecar.load(svg_fname, -10., 5.)
+    assert_same_cells(cached, parsed)
+    assert_same_cells(cached, cell_frame.from_svg(svg_fname, -10., 5.))
+    for name in ('x', 'y', 'r', 'rgba', 'outer'):   # contiguous views of the memory map
+        column = getattr(cached, name)
+        assert column.flags['C_CONTIGUOUS'] and not column.flags['OWNDATA']
+        assert isinstance(column.base, np.memmap)
+    assert cell_sidecar.load(svg_fname, 0., 0.) is None   # placed for another domain
+
+
+def test_stale_sidecar_is_rebuilt(run_dir):
+    svg_fname = os.path.join(run_dir, 'snapshot00000000.svg')
+    first = cell_sidecar.read_cells(svg_fname)
+    with open(svg_fname, 'rb') as f:
+        text = f.read()
+    start = text.index(b'<g id="cell', text.index(b'id="cells"') + 1)
+    end = text.index(b'</g>', start) + len(b'</g>')
+    with open(svg_fname, 'wb') as f:   # the simulation rewrites the snapshot, with one cell less
+        f.write(text[:start] + text[end:])
+    assert cell_sidecar.read_meta(svg_fname) is None
+    second = cell_sidecar.read_cells(svg_fname)
+    assert second.num_cells == first.num_cells - 1
+    assert_same_cells(cell_sidecar.load(svg_fname), cell_frame.from_svg(svg_fname))
+
+    replacement = svg_fname + '.new'   # same size, replaced by a newer file
+    with open(replacement, 'wb') as f:
+        f.write(text[:start] + text[end:])
+    st = os.stat(svg_fname)
+    os.replace(replacement, svg_fname)
+    os.utime(svg_fname, ns=(st.st_atime_ns, st.st_mtime_ns + 1000))
+    assert cell_sidecar.load(svg_fname) is None
+    assert cell_sidecar.read_cells(svg_fname).num_cells == second.num_cells
+    assert cell_sidecar.load(svg_fname) is not None
+
+
+def test_no_cells(tmp_path):
+    svg_fname = str(tmp_path / 'snapshot00000000.svg')
+    with open(svg_fname, 'w') as f:
+        f.write('<svg xmlns="http://www.w3.org/2000/svg" width="100"><g id="cells"></g></svg>')
+    assert len(cell_sidecar.read_cells(svg_fname)) == 0
+    cached = cell_sidecar.load(svg_fname)
+    assert len(cached) == 0 and len(cached.x) == 0
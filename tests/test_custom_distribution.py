@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+import cell_matrix
+import custom_distribution as cd
+
+NUM_BINS = 8
+LABELS = {'ID': (0, 1), 'NP1': (1, 1), 'NPs bins': (2, 4)}
+
+
+def make_cells(np1, bins=None):
+    """CellMatrix of len(np1) cells with an "NP1" scalar and a 4-entry "NPs bins" vector."""
+    data = np.zeros((len(np1), 6))
+    data[:, 0] = np.arange(len(np1))
+    data[:, 1] = np1
+    if bins is not None:
+        data[:, 2:] = bins
+    return cell_matrix.CellMatrix(data, LABELS)
+
+
+def stat(row, name):
+    return row[cd.STATS.index(name)]
+
+
+def test_scalar_histogram_and_quantiles():
+    values = np.random.RandomState(1).gamma(2., size=500)
+    row = cd.distribution(make_cells(values), 'NP1', NUM_BINS)
+    hist = row[len(cd.STATS):]
+    assert np.array_equal(hist, np.histogram(values, NUM_BINS, (values.min(), values.max()))[0])
+    assert stat(row, 'count') == 500
+    assert stat(row, 'mean') == pytest.approx(values.mean())
+    assert stat(row, 'q50') == pytest.approx(np.median(values))
+
+
+def test_constant_frame():
+    row = cd.distribution(make_cells(np.full(10, 3.)), 'NP1', NUM_BINS)
+    assert stat(row, 'min') == stat(row, 'max') == 3.
+    assert row[len(cd.STATS)] == 10 and row[len(cd.STATS):].sum() == 10
+    edges = np.linspace(0., 4., 5)
+    out = cd.rebin([row[len(cd.STATS):]], [3.], [3.], edges)
+    assert out.tolist() == [[0, 0, 0, 10]]
+    out = cd.rebin([row[len(cd.STATS):]], [5.], [5.], edges)   # outside the edges
+    assert out.sum() == 0
+
+
+@pytest.mark.parametrize('np1', [np.full(5, np.nan), np.zeros(0)], ids=['all NaN', 'no cells'])
+def test_frame_without_values(np1):
+    row = cd.distribution(make_cells(np1), 'NP1', NUM_BINS)
+    assert len(row) == len(cd.STATS) + NUM_BINS
+    assert stat(row, 'count') == 0
+    assert np.isnan(row[1:len(cd.STATS)]).all()
+    assert row[len(cd.STATS):].sum() == 0
+    assert cd.rebin([row[len(cd.STATS):]], [row[1]], [row[2]], np.linspace(0, 1, 3)).sum() == 0
+
+
+def test_vector_variable():
+    bins = np.array([[1., 0., 2., 0.], [0., 0., 2., 1.]])
+    row = cd.distribution(make_cells(np.zeros(2), bins), 'NPs bins', NUM_BINS)
+    assert len(row) == len(cd.STATS) + 4   # the vector's size, not NUM_BINS
+    assert row[len(cd.STATS):].tolist() == [1., 0., 4., 1.]
+    assert (stat(row, 'min'), stat(row, 'max')) == (0., 4.)
+    assert stat(row, 'q50') == pytest.approx(2.5)   # half of the 6 counts are below entry 2.5
+    empty = cd.distribution(make_cells(np.zeros(0), np.zeros((0, 4))), 'NPs bins', NUM_BINS)
+    assert stat(empty, 'count') == 0 and np.isnan(stat(empty, 'mean'))
+
+
+def test_rebin_conserves_counts():
+    rng = np.random.RandomState(2)
+    frames = [rng.uniform(lo, lo + 2., 300) for lo in (0., 0.5, 1.)]
+    rows = [cd.distribution(make_cells(v), 'NP1', 64) for v in frames]
+    hists = [row[len(cd.STATS):] for row in rows]
+    edges = np.linspace(0., 3., 7)
+    out = cd.rebin(hists, [r[1] for r in rows], [r[2] for r in rows], edges)
+    assert np.allclose(out.sum(axis=1), 300)
+    for counts, values in zip(out, frames):
+        exact = np.histogram(values, edges)[0]
+        assert np.abs(counts - exact).max() <= 0.05 * 300   # spread evenly within the frame's bins
@@ -0,0 +1,47 @@
+import os
+import numpy as np
+import scipy.io
+import dose_accounting
+from dose_accounting import COLUMNS, dose_series, DoseIndex
+
+
+def rows(t, ext, internal, decay):
+    return np.column_stack([t, ext, internal, np.full(len(t), decay)])
+
+
+def test_closed_system_has_no_inflow():
+    decay = 1e-3
+    t = np.linspace(0., 2000., 401)
+    total = 1e6 * np.exp(-decay * t)    # decaying outside the cells only
+    internal = np.zeros_like(t)
+    series = dose_series(rows(t, total, internal, decay))
+    assert np.allclose(series['inflow'], 0., atol=1e-3 * total[0])
+    assert np.allclose(series['decayed'], total[0] - total, rtol=1e-4)
+
+    # particles taken up by the cells (which don't decay) move between the two amounts
+    ext = 5e5 * (1 + np.exp(-t / 300.))
+    internal = 1e6 - ext
+    series = dose_series(rows(t, ext, internal, 0.))
+    assert np.allclose(series['total'], 1e6)
+    assert np.allclose(series['inflow'], 0.)
+    assert np.allclose(series['inflow rate'], 0.)
+
+
+def test_inflow_and_config_decay_rate():
+    t = np.linspace(0., 100., 11)
+    ext = 10. * t        # a constant inflow of 10 / min, no decay
+    series = dose_series(rows(t, ext, np.full(len(t), np.nan), 0.))
+    assert np.allclose(series['inflow'], ext)
+    assert np.allclose(series['inflow rate'], 10.)
+    assert np.allclose(dose_series(rows(t, ext, np.zeros(len(t)), 0.), decay_rate=0.01)['decayed'], 0.05 * t**2)
+
+
+def test_frame_dose_matches_scipy(run_dir):
+    matrix = scipy.io.loadmat(os.path.join(run_dir, 'output00000000_microenvironment0.mat'))['multiscale_microenvironment']
+    row, _, _ = dose_accounting.read_substrate(os.path.join(run_dir, 'output00000000.xml'), 'NP1')
+    index = DoseIndex(run_dir)
+    index.refresh()
+    frames, values = index.index.values()
+    assert list(frames) == [0]
+    assert np.isclose(values[0, COLUMNS.index('extracellular')], np.dot(matrix[3], matrix[row]))
+    assert index.decay_rate is not None and index.decay_rate > 0
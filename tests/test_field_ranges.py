@@ -0,0 +1,19 @@
+# The 'global' colormap range: the run's field ranges are indexed in the background, then the plot is redrawn with them
+
+
+def test_global_range_refreshes_in_background(substrate_tab):
+    tab = substrate_tab
+    redraws = []
+    tab.i_plot.update = lambda *args, **kwargs: redraws.append(tab.get_cmap_range())
+
+    tab.cmap_global_toggle.value = True
+    assert redraws   # drawn at once, with whatever range is indexed so far
+    tab.series_worker.submit(lambda: None).result()
+    assert len(redraws) == 2   # and again once the frames are in
+    lo, hi = redraws[-1]
+    assert (lo, hi) == tab.get_field_ranges().global_range(tab.field_index - 4)
+    assert not tab.field_ranges_pending
+
+    tab.update(tab.output_dir)   # nothing new: no redraw
+    tab.series_worker.submit(lambda: None).result()
+    assert len(redraws) == 2
@@ -0,0 +1,79 @@
+import os
+import numpy as np
+from frame_cache import FrameCache, file_key
+
+
+def test_lru_eviction_order():
+    cache = FrameCache(max_bytes=300)
+    for key in 'abc':
+        cache.put(key, np.zeros(100, dtype=np.uint8))
+    assert cache.nbytes == 300
+    cache.get('a')   # now the most recently used
+    cache.put('d', np.zeros(100, dtype=np.uint8))
+    assert 'b' not in cache
+    assert [key for key in 'acd' if key in cache] == ['a', 'c', 'd']
+    cache.put('e', np.zeros(150, dtype=np.uint8))
+    assert 'c' not in cache and 'a' not in cache
+    assert cache.nbytes == 250
+
+
+def test_byte_budget():
+    cache = FrameCache(max_bytes=1000)
+    for k in range(20):
+        cache.put(k, np.zeros(30, dtype=np.float64))   # 240 bytes
+        assert cache.nbytes <= 1000
+    assert len(cache) == 4
+    cache.put(19, np.zeros(10, dtype=np.uint8))   # replacing a value updates the total
+    assert cache.nbytes == 3*240 + 10
+    cache.set_max_bytes(300)
+    assert len(cache) == 2 and cache.nbytes == 250
+    cache.discard(19)
+    assert cache.nbytes == 240
+
+
+def test_value_larger_than_budget():
+    cache = FrameCache(max_bytes=100)
+    cache.put('small', np.zeros(50, dtype=np.uint8))
+    big = np.zeros(101, dtype=np.uint8)
+    assert cache.put('big', big) is big
+    assert 'big' not in cache
+    assert 'small' in cache and cache.nbytes == 50
+
+
+def test_rewritten_file_is_reloaded(tmp_path):
+    fname = str(tmp_path / 'frame.npy')
+    np.save(fname, np.arange(3))
+    cache = FrameCache()
+    loads = []
+
+    def loader(f):
+        loads.append(f)
+        return np.load(f)
+    assert np.array_equal(cache.get_or_load(fname, loader), [0, 1, 2])
+    assert np.array_equal(cache.get_or_load(fname, loader), [0, 1, 2])
+    assert len(loads) == 1
+    assert cache.hits == 1
+
+    key = file_key(fname)
+    np.save(fname, np.arange(4))   # other size
+    assert np.array_equal(cache.get_or_load(fname, loader), [0, 1, 2, 3])
+    assert len(loads) == 2
+    assert file_key(fname) != key
+
+    np.save(fname, np.arange(4) * 2)   # same size, newer mtime
+    st = os.stat(fname)
+    os.utime(fname, ns=(st.st_atime_ns, st.st_mtime_ns + 1000))
+    assert np.array_equal(cache.get_or_load(fname, loader), [0, 2, 4, 6])
+    assert len(loads) == 3
+    assert cache.get_or_load(fname, loader, tag='row') is not None   # another view of the same file
+    assert len(loads) == 4
+
+
+def test_none_is_cached(tmp_path):
+    fname = str(tmp_path / 'empty')
+    open(fname, 'w').close()
+    cache = FrameCache()
+    loads = []
+    assert cache.get_or_load(fname, lambda f: loads.append(f)) is None
+    assert cache.get_or_load(fname, lambda f: loads.append(f)) is None
+    assert len(loads) == 1
@@ -0,0 +1,67 @@
+import os
+import json
+import shutil
+import pytest
+import frame_index
+from frame_index import FrameTimeIndex
+
+
+def write_frame(run_dir, frame, minutes):
+    """output%08d.xml of the sample, at another simulated time."""
+    with open(os.path.join(run_dir, 'initial.xml')) as f:
+        text = f.read()
+    fname = os.path.join(run_dir, 'output%08d.xml' % frame)
+    with open(fname, 'w') as f:
+        f.write(text.replace('>0.000000</current_time>', '>%f</current_time>' % minutes, 1))
+    return fname
+
+
+def test_index_round_trip(run_dir, monkeypatch):
+    write_frame(run_dir, 1, 60.)
+    write_frame(run_dir, 2, 120.)
+    shutil.copy(os.path.join(run_dir, 'config.xml'), os.path.join(run_dir, 'output_extra.xml'))   # not a frame
+    index = FrameTimeIndex(run_dir)
+    index.refresh()
+    assert index.times == {0: 0., 1: 60., 2: 120.}
+    with open(index.index_fname) as f:
+        assert sorted(json.load(f)['frames']) == ['0', '1', '2']
+
+    def unexpected(fname):
+        raise AssertionError('re-read ' + fname)
+    monkeypatch.setattr(frame_index, 'read_current_time', unexpected)
+    index = FrameTimeIndex(run_dir)   # from frame_times.json, without reading any .xml
+    index.refresh()
+    assert [index.time(k) for k in (0, 1, 2)] == [0., 60., 120.]
+    with pytest.raises(OSError):
+        index.time(3)
+
+
+def test_changed_files_are_reread(run_dir):
+    fname = write_frame(run_dir, 1, 60.)
+    index = FrameTimeIndex(run_dir)
+    index.refresh()
+    st = os.stat(fname)
+    write_frame(run_dir, 1, 90.)   # the same size: only the mtime changes
+    os.utime(fname, ns=(st.st_atime_ns, st.st_mtime_ns + 1000))
+    assert os.path.getsize(fname) == st.st_size
+    assert FrameTimeIndex(run_dir).time(1) == 90.
+    write_frame(run_dir, 3, 180.)
+    assert index.time(3) == 180.   # a frame not indexed yet
+    assert index.dirty
+    index.refresh()   # ... is saved on the next refresh
+    assert not index.dirty
+    assert FrameTimeIndex(run_dir).times[3] == 180.
+
+
+def test_read_only_run(run_dir, monkeypatch):
+    write_frame(run_dir, 1, 60.)
+    with open(os.path.join(run_dir, FrameTimeIndex.index_name), 'w') as f:
+        f.write('{"frames": ')   # cut short
+    index = FrameTimeIndex(run_dir)
+    assert not index.times
+
+    def read_only(src, dst):
+        raise OSError('read-only')
+    monkeypatch.setattr(os, 'replace', read_only)
+    index.refresh()   # kept in memory only
+    assert index.times == {0: 0., 1: 60.}
@@ -0,0 +1,72 @@
+import io
+import numpy as np
+from PIL import Image as PILImage
+import pytest
+import layers
+
+
+def png_pixels(png):
+    return np.asarray(PILImage.open(io.BytesIO(png)).convert('RGB')).astype(np.int16)
+
+
+def test_composite_over():
+    bottom = np.full((2, 2, 4), 255, np.uint8)
+    top = np.zeros((2, 2, 4), np.uint8)
+    top[0, 0] = (255, 0, 0, 255)
+    top[1, 1] = (0, 0, 0, 128)
+    out = layers.composite(bottom, top, None)
+    assert out.shape == (2, 2, 3)
+    assert tuple(out[0, 0]) == (255, 0, 0)
+    assert tuple(out[0, 1]) == (255, 255, 255)
+    assert np.all(np.abs(out[1, 1].astype(int) - 127) <= 1)
+
+
+@pytest.fixture
+def shown(substrate_tab, monkeypatch):
+    """PNGs the tab displays, in order."""
+    import substrates
+    pngs = []
+    monkeypatch.setattr(substrates, 'display', lambda image: pngs.append(image.data))
+    return pngs
+
+
+def single_pass(tab, shown, frame):
+    """The frame drawn in one pass, as without layer caching."""
+    view_key = tab.get_view_key
+    tab.get_view_key = lambda *args: None
+    try:
+        tab.plot_substrate(frame)
+    finally:
+        tab.get_view_key = view_key
+    return shown[-1]
+
+
+@pytest.mark.parametrize('cell_draw', ['circles', 'density'])
+def test_layers_match_single_pass(substrate_tab, shown, cell_draw):
+    tab = substrate_tab
+    tab.cell_draw.value = cell_draw
+    for change in [None,                                          # both layers rendered here
+                   lambda: setattr(tab.field_cmap, 'value', 'jet'),  # cell layer from the cache
+                   lambda: tab.set_view(2, None)]:                # zoomed: new layers
+        if change is not None:
+            change()
+        tab.render_cache.clear()
+        tab.plot_substrate(0)
+        layered = png_pixels(shown[-1])
+        reference = png_pixels(single_pass(tab, shown, 0))
+        assert layered.shape == reference.shape
+        diff = np.abs(layered - reference)
+        assert diff.max() <= 8            # antialiasing rounding at most
+        assert (diff > 2).mean() < 1e-3
+
+
+def test_auto_density_threshold(substrate_tab):
+    tab = substrate_tab
+    tab.cell_draw.value = 'auto'
+    num_cells = tab.get_cell_count(0, tab.use_cell_matrix(0))
+    tab.cell_density_threshold.value = num_cells + 1
+    assert not tab.use_cell_density(0)
+    key = tab.get_view_key(0, False)
+    tab.cell_density_threshold.value = num_cells
+    assert tab.use_cell_density(0)
+    assert tab.get_view_key(0, False) != key   # the cell layer is redrawn
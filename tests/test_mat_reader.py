@@ -0,0 +1,44 @@
+import os
+import numpy as np
+import scipy.io
+import pytest
+import mat_reader
+
+
+def test_rows_match_scipy(sample_dir):
+    fname = os.path.join(sample_dir, 'initial_microenvironment0.mat')
+    matrix = scipy.io.loadmat(fname)['multiscale_microenvironment']
+    header = mat_reader.read_header(fname)
+    assert header.name == 'multiscale_microenvironment'
+    assert (header.rows, header.cols) == matrix.shape
+    assert np.array_equal(mat_reader.read_rows(fname, [4, 0, 3]), matrix[[4, 0, 3]])
+    assert np.array_equal(mat_reader.read_row(fname, matrix.shape[0] - 1), matrix[-1])
+    assert np.array_equal(np.asarray(mat_reader.memmap(fname, header)).T, matrix)
+    with pytest.raises(IndexError):
+        mat_reader.read_row(fname, matrix.shape[0])
+
+
+def test_other_layouts(tmp_path):
+    matrix = np.arange(12, dtype=np.float64).reshape(3, 4)
+    fname = str(tmp_path / 'm.mat')
+    scipy.io.savemat(fname, {'m': matrix}, format='4')
+    assert np.array_equal(mat_reader.read_rows(fname, [2, 1]), matrix[[2, 1]])
+
+    with open(fname, 'wb') as f:   # big-endian float32, as a MAT4 writer on such a machine would
+        f.write(np.array([1010, 3, 4, 0, 2], dtype='>u4').tobytes() + b'm\0')
+        f.write(matrix.T.astype('>f4').tobytes())
+    header = mat_reader.read_header(fname)
+    assert header.dtype == np.dtype('>f4')
+    assert np.array_equal(mat_reader.read_rows(fname, [0, 2]), matrix[[0, 2]])
+
+
+def test_not_a_mat4(tmp_path):
+    fname = str(tmp_path / 'short.mat')
+    with open(fname, 'wb') as f:
+        f.write(b'\0' * 8)
+    with pytest.raises(ValueError):
+        mat_reader.read_header(fname)
+    fname = str(tmp_path / 'v5.mat')
+    scipy.io.savemat(fname, {'m': np.ones((2, 2))})
+    with pytest.raises(ValueError):
+        mat_reader.read_header(fname)
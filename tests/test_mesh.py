@@ -0,0 +1,56 @@
+import os
+import numpy as np
+import pytest
+import scipy.io
+from mesh import Mesh
+
+
+def small_mesh(numx=7, numy=5):
+    mesh = Mesh(10. + 20. * np.arange(numx), -40. + 20. * np.arange(numy))
+    field = np.arange(mesh.num_voxels, dtype=np.float64) ** 1.5
+    return mesh, field
+
+
+def test_xml_and_mat_agree(sample_dir):
+    from_xml = Mesh.from_xml(os.path.join(sample_dir, 'initial.xml'))
+    from_mat = Mesh.from_mat(os.path.join(sample_dir, 'initial_microenvironment0.mat'))
+    assert np.allclose(from_xml.xs, from_mat.xs) and np.allclose(from_xml.ys, from_mat.ys)
+    assert from_xml.regular and from_mat.regular
+    xy = scipy.io.loadmat(os.path.join(sample_dir, 'initial_microenvironment0.mat'))['multiscale_microenvironment'][:2]
+    assert np.array_equal(from_xml.reshape(xy[0])[0], from_xml.xs)   # x fastest
+    assert np.array_equal(from_xml.reshape(xy[1])[:, 0], from_xml.ys)
+    voxel = from_xml.voxel_index(*xy[:, 123])
+    assert voxel == 123 and from_xml.voxel_center(voxel) == tuple(xy[:, 123])
+
+
+@pytest.mark.parametrize('factor', [1, 2, 3, 7, 8])
+def test_block_mean(factor):
+    mesh, field = small_mesh()
+    coarse = mesh.coarsen(factor)
+    assert coarse is mesh.coarsen(factor)   # cached
+    mean = mesh.block_mean(field, factor)
+    assert coarse.matches(mean)
+    a = mesh.reshape(field)
+    for iy in range(coarse.numy):   # each block, edge-padded past the last row/column
+        for ix in range(coarse.numx):
+            rows = np.minimum(np.arange(iy * factor, (iy + 1) * factor), mesh.numy - 1)
+            cols = np.minimum(np.arange(ix * factor, (ix + 1) * factor), mesh.numx - 1)
+            assert np.isclose(coarse.reshape(mean)[iy, ix], a[np.ix_(rows, cols)].mean())
+    if mesh.numx % factor == 0 and mesh.numy % factor == 0:
+        assert np.isclose(mean.mean(), field.mean())
+    assert np.isclose(coarse.xs[0], mesh.extent[0] + factor * mesh.dx / 2)   # block centers
+    assert np.isclose(coarse.ys[0], mesh.extent[2] + factor * mesh.dy / 2)
+
+
+def test_window():
+    mesh, field = small_mesh()
+    assert mesh.window(field, -1e6, 1e6, -1e6, 1e6) == (mesh, field)   # all of it: no copy
+    sub, f = mesh.window(field, 45., 75., -25., -15.)
+    assert sub.numx < mesh.numx and sub.numy < mesh.numy
+    assert sub.xs[0] <= 45. - mesh.dx and sub.xs[-1] >= 75. + mesh.dx   # at least a voxel of margin
+    assert sub.ys[0] == mesh.ys[0] and sub.ys[-1] >= -15. + mesh.dy
+    assert f.flags['C_CONTIGUOUS'] and sub.matches(f)
+    for k, v in enumerate(f):
+        assert v == field[mesh.voxel_index(*sub.voxel_center(k))]
+    sub, f = mesh.window(field, 1000., 2000., 1000., 2000.)   # off the mesh: the nearest voxels
+    assert sub.num_voxels >= 1 and sub.matches(f)
@@ -0,0 +1,50 @@
+import threading
+from prefetch import Prefetcher
+
+
+def blocked(prefetcher, release):
+    """Occupy all of the prefetcher's workers until release is set."""
+    started = threading.Barrier(prefetcher.max_workers + 1)
+    prefetcher.request([(('busy', k), lambda: (started.wait(), release.wait())) for k in range(prefetcher.max_workers)])
+    started.wait()
+
+
+def test_unwanted_jobs_are_cancelled():
+    prefetcher = Prefetcher(max_workers=1, max_pending=3)
+    release = threading.Event()
+    blocked(prefetcher, release)
+    ran = []
+    prefetcher.request([(('busy', 0), None)] + [(k, lambda k=k: ran.append(k)) for k in (1, 2, 3)])
+    assert set(prefetcher.pending) == {('busy', 0), 1, 2}   # at most max_pending
+    prefetcher.request([(('busy', 0), None), (2, None), (4, lambda: ran.append(4))])   # scrubbed on
+    assert set(prefetcher.pending) == {('busy', 0), 2, 4}   # 1 is cancelled; 2 isn't queued twice
+    release.set()
+    for future in list(prefetcher.pending.values()):
+        future.result()
+    assert ran == [2, 4]
+    prefetcher.request([])
+    assert not prefetcher.pending
+    prefetcher.shutdown()
+
+
+def test_cancel_all_and_failing_jobs():
+    prefetcher = Prefetcher(max_workers=1, max_pending=4)
+    release = threading.Event()
+    blocked(prefetcher, release)
+    ran = []
+    prefetcher.request([(1, lambda: ran.append(1))])
+    prefetcher.cancel_all()
+    assert not prefetcher.pending
+    release.set()
+
+    def fail():
+        raise OSError('still being written')
+    prefetcher.request([(2, fail), (3, lambda: ran.append(3))])
+    for future in list(prefetcher.pending.values()):
+        assert future.result() is None   # errors are swallowed
+    assert ran == [3]
+    prefetcher.shutdown()
+    prefetcher.request([(4, lambda: ran.append(4))])   # a new pool after shutdown
+    prefetcher.pending[4].result()
+    assert ran == [3, 4]
+    prefetcher.shutdown()
@@ -0,0 +1,61 @@
+# Rendered PNGs of the plot, keyed by the view's settings and files: a repeated view isn't redrawn
+
+import os
+import pytest
+
+
+@pytest.fixture
+def renders(substrate_tab, monkeypatch):
+    """(shown, drawn): PNGs the tab displays, and those it encoded (i.e., not from the render cache)."""
+    import substrates
+    import layers
+    shown = []
+    drawn = []
+    to_png = layers.to_png
+    monkeypatch.setattr(substrates, 'display', lambda image: shown.append(image.data))
+    monkeypatch.setattr(layers, 'to_png', lambda rgb: drawn.append(to_png(rgb)) or drawn[-1])
+    monkeypatch.setattr(substrate_tab.i_plot, 'update', lambda *args, **kwargs: None)   # plotted here only
+    substrate_tab.render_cache.clear()
+    return shown, drawn
+
+
+def test_repeated_view_is_not_redrawn(substrate_tab, renders):
+    tab = substrate_tab
+    shown, drawn = renders
+    tab.plot_substrate(0)
+    assert len(drawn) == len(shown) == 1
+    num_drawn = len(drawn)
+    tab.plot_substrate(0)
+    assert len(drawn) == num_drawn   # straight from the render cache
+    assert shown[1] == shown[0]
+
+    cmap = tab.field_cmap.value
+    tab.field_cmap.value = 'jet'   # another setting: drawn again
+    tab.plot_substrate(0)
+    assert len(drawn) == num_drawn + 1 and shown[2] != shown[0]
+    tab.field_cmap.value = cmap    # and back: cached
+    tab.plot_substrate(0)
+    assert len(drawn) == num_drawn + 1 and shown[3] == shown[0]
+
+
+def test_rewritten_files_are_redrawn(substrate_tab, renders):
+    tab = substrate_tab
+    shown, drawn = renders
+    tab.plot_substrate(0)
+    num_drawn = len(drawn)
+    fname = os.path.join(tab.output_dir, 'output00000000_microenvironment0.mat')
+    st = os.stat(fname)
+    os.utime(fname, ns=(st.st_atime_ns, st.st_mtime_ns + 1000))   # the simulation wrote the frame again
+    tab.plot_substrate(0)
+    assert len(drawn) > num_drawn
+
+
+def test_no_render_cache(substrate_tab, renders):
+    tab = substrate_tab
+    shown, drawn = renders
+    tab.set_cache_size(tab.cache_max_mb, render_max_mb=0)
+    tab.plot_substrate(0)
+    num_drawn = len(drawn)
+    tab.plot_substrate(0)
+    assert len(drawn) > num_drawn
+    assert len(tab.render_cache) == 0
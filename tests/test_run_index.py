@@ -0,0 +1,59 @@
+import os
+import numpy as np
+import run_index
+from run_index import RunIndex
+
+
+def frame_sum(fname, scale):
+    return np.load(fname).sum() * np.array([1., scale])
+
+
+def write_frame(output_dir, frame, value):
+    fname = os.path.join(output_dir, 'frame%08d.npy' % frame)
+    np.save(fname, np.full(3, float(value)))
+    return fname
+
+
+def test_save_load_round_trip(tmp_path):
+    output_dir = str(tmp_path)
+    for frame in range(4):
+        write_frame(output_dir, frame, frame)
+    index = RunIndex(output_dir, 'sums', 'frame%08d.npy', frame_sum, args=(2.,), max_workers=1)
+    assert index.refresh() == 4
+    frames, values = index.values()
+    assert list(frames) == [0, 1, 2, 3]
+    assert np.array_equal(values, [[0., 0.], [3., 6.], [6., 12.], [9., 18.]])
+
+    loaded = RunIndex(output_dir, 'sums', 'frame%08d.npy', frame_sum, args=(2.,), max_workers=1)
+    assert loaded.stamps == index.stamps
+    assert np.array_equal(loaded.values()[1], values)
+    assert loaded.refresh() == 0   # nothing new or changed
+
+    os.remove(os.path.join(output_dir, 'frame00000003.npy'))
+    fname = write_frame(output_dir, 1, 10)
+    st = os.stat(fname)
+    os.utime(fname, ns=(st.st_atime_ns, st.st_mtime_ns + 1000))
+    assert loaded.refresh() == 1   # only the rewritten frame
+    frames, values = loaded.values()
+    assert list(frames) == [0, 1, 2]
+    assert np.array_equal(values[1], [30., 60.])
+
+    other = RunIndex(output_dir, 'sums', 'frame%08d.npy', frame_sum, args=(3.,), max_workers=1)
+    assert other.values()[1] is None   # other args: the stored results don't apply
+
+
+def test_unreadable_frames_are_retried(tmp_path):
+    output_dir = str(tmp_path)
+    write_frame(output_dir, 0, 1)
+    with open(os.path.join(output_dir, 'frame00000001.npy'), 'wb') as f:
+        f.write(b'partly written')
+    index = RunIndex(output_dir, 'sums', 'frame%08d.npy', frame_sum, args=(1.,), max_workers=1)
+    assert index.refresh() == 2
+    assert list(index.frames()) == [0]
+    assert index.refresh() == 1
+
+
+def test_map_frames_in_processes(tmp_path):
+    fnames = [write_frame(str(tmp_path), frame, frame) for frame in range(3)]
+    results = run_index.map_frames(frame_sum, fnames, (1.,), max_workers=2)
+    assert [r[0] for r in results] == [0., 3., 6.]
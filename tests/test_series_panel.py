@@ -0,0 +1,61 @@
+# The Plots tab panels: refreshed in the tab's series_worker, not in update()
+
+import threading
+import pytest
+
+
+def shown_png(panel):
+    return [out['data']['image/png'] for out in panel.output.outputs if 'image/png' in out.get('data', {})]
+
+
+@pytest.mark.parametrize('name', ['series_panel', 'population_panel', 'distribution_panel', 'dose_panel'])
+def test_panel_refreshes_in_background(substrate_tab, name):
+    panel = getattr(substrate_tab, name)
+    started = threading.Event()
+    release = threading.Event()
+    substrate_tab.series_worker.submit(lambda: (started.set(), release.wait()))
+    started.wait()
+
+    panel.update()   # queued behind the blocked job
+    assert panel.active
+    assert panel.status.value == panel.busy_text
+    assert not shown_png(panel)
+
+    release.set()
+    panel.wait()
+    assert panel.status.value.startswith('1 frames')
+    assert len(shown_png(panel)) == 1
+
+
+def test_updates_while_busy_refresh_once_more(substrate_tab):
+    panel = substrate_tab.series_panel
+    calls = []
+    refresh = panel.refresh
+    release = threading.Event()
+
+    def slow_refresh():
+        calls.append(1)
+        release.wait()
+        refresh()
+    panel.refresh = slow_refresh
+
+    panel.update()
+    panel.update()
+    panel.update()
+    release.set()
+    panel.wait()
+    assert len(calls) == 2
+    assert len(shown_png(panel)) == 1
+
+
+def test_probe_panel(substrate_tab):
+    panel = substrate_tab.probe_panel
+    panel.update()   # no probes: nothing to do
+    assert not panel.active
+    panel.add_probe(0., 0.)
+    panel.wait()
+    assert panel.status.value == '1 probes, 1 frames'
+    assert len(shown_png(panel)) == 1
+    panel.clear()
+    assert not panel.active
+    assert not shown_png(panel)
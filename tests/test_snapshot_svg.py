@@ -0,0 +1,65 @@
+import os
+import re
+import pytest
+import numpy as np
+import snapshot_svg
+
+
+def assert_same_cells(a, b):
+    for name in ('x', 'y', 'r', 'rgba', 'outer', 'cell'):
+        assert np.array_equal(a[name], b[name]), name
+    for name in ('num_cells', 'width', 'time_text'):
+        assert a[name] == b[name], name
+
+
+def test_regex_matches_etree(sample_dir):
+    fname = os.path.join(sample_dir, 'initial.svg')
+    cells = snapshot_svg.read_cells(fname, -1000., -500.)
+    tree = snapshot_svg._read_cells_etree(fname, -1000., -500., 10000., cells['width'], cells['time_text'])
+    assert cells['num_cells'] > 0
+    assert cells['outer'].sum() == cells['num_cells']
+    assert_same_cells(cells, tree)
+
+
+def test_other_attribute_order(sample_dir, tmp_path):
+    fname = os.path.join(sample_dir, 'initial.svg')
+    with open(fname, 'rb') as f:
+        text = f.read()
+    reordered = str(tmp_path / 'reordered.svg')
+    with open(reordered, 'wb') as f:   # only the ElementTree walk can read this one
+        f.write(re.sub(rb'<circle cx="([^"]*)" cy="([^"]*)" r="([^"]*)" stroke-width="([^"]*)" stroke="([^"]*)" fill="([^"]*)"',
+                       rb'<circle fill="\6" r="\3" cy="\2" cx="\1" stroke="\5"', text))
+    assert_same_cells(snapshot_svg.read_cells(reordered, 10., 20.), snapshot_svg.read_cells(fname, 10., 20.))
+
+
+FILLS = [('black', (0., 0., 0., 1.)),
+         ('red', (1., 0., 0., 1.)),
+         ('yellowgreen', (154 / 255., 205 / 255., 50 / 255., 1.)),
+         ('#ff0000', (1., 0., 0., 1.)),
+         ('#00ff0080', (0., 1., 0., 128 / 255.)),
+         ('rgb(175,175,80)', (175 / 255., 175 / 255., 80 / 255., 1.)),
+         ('rgb(0,0,255)', (0., 0., 1., 1.))]
+
+
+@pytest.mark.parametrize('fill,rgba', FILLS)
+def test_decode_fill(fill, rgba):
+    assert np.allclose(snapshot_svg.decode_fill(fill), rgba)
+
+
+@pytest.mark.parametrize('fill,rgba', FILLS)
+def test_color_table(fill, rgba):
+    colors = snapshot_svg.ColorTable()
+    num_named = len(colors)
+    rows, table = colors.rows([fill.encode(), b'black', fill.encode()])
+    assert rows[0] == rows[2]
+    assert np.allclose(table[rows], [rgba, (0., 0., 0., 1.), rgba])
+    assert len(colors) == num_named + fill.startswith(('#', 'rgb('))   # named colors are in the table up front
+    assert len(table) == len(colors)
+
+
+def test_color_table_rgba():
+    colors = snapshot_svg.ColorTable()
+    fills = np.array([f.encode() for f, _ in FILLS] * 2)
+    assert np.allclose(colors.rgba(fills), [rgba for _, rgba in FILLS] * 2)
+    assert colors.rgba(fills).dtype == np.float32
+    assert colors.rgba(np.array([], dtype=bytes)).shape == (0, 4)
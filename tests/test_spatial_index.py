@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+from spatial_index import CellGrid
+
+
+@pytest.fixture
+def circles():
+    rng = np.random.default_rng(0)
+    n = 3000
+    return rng.uniform(-500., 500., n), rng.uniform(-200., 300., n), rng.uniform(2., 12., n)
+
+
+def test_pick_matches_brute_force(circles):
+    x, y, r = circles
+    grid = CellGrid(x, y, r)
+    rng = np.random.default_rng(1)
+    for px, py in zip(rng.uniform(-520., 520., 500), rng.uniform(-220., 320., 500)):
+        inside = np.nonzero((x - px)**2 + (y - py)**2 <= r**2)[0]
+        assert grid.pick(px, py) == (int(inside.max()) if len(inside) else None)
+    assert grid.pick(x[7], y[7]) is not None
+
+
+def test_in_rect_matches_brute_force(circles):
+    x, y, r = circles
+    grid = CellGrid(x, y, r)
+    for xmin, xmax, ymin, ymax in [(-100., 100., -50., 50.), (-600., 600., -300., 400.),
+                                   (490., 520., 290., 320.), (1000., 1100., 0., 10.), (0., 0., 0., 0.)]:
+        dx = np.maximum(np.maximum(xmin - x, x - xmax), 0.)
+        dy = np.maximum(np.maximum(ymin - y, y - ymax), 0.)
+        assert np.array_equal(grid.in_rect(xmin, xmax, ymin, ymax), np.nonzero(dx**2 + dy**2 <= r**2)[0])
+
+
+def test_within_radius_matches_brute_force(circles):
+    x, y, r = circles
+    grid = CellGrid(x, y, r)
+    for px, py, radius in [(0., 0., 30.), (-480., 280., 5.), (200., -100., 0.)]:
+        expected = np.nonzero((x - px)**2 + (y - py)**2 <= (radius + r)**2)[0]
+        assert np.array_equal(grid.within_radius(px, py, radius), expected)
+
+
+def test_empty_grid():
+    grid = CellGrid([], [], [])
+    assert len(grid) == 0
+    assert grid.pick(0., 0.) is None
+    assert len(grid.in_rect(-1., 1., -1., 1.)) == 0
@@ -0,0 +1,27 @@
+import os
+import numpy as np
+import scipy.io
+import voxel_probe
+
+
+def test_probes_cached_per_voxel(run_dir, monkeypatch):
+    matrix = scipy.io.loadmat(os.path.join(run_dir, 'output00000000_microenvironment0.mat'))['multiscale_microenvironment']
+    index = voxel_probe.ProbeIndex(run_dir, [0, 17])
+    index.refresh()
+    frames, values = index.histories()
+    assert list(frames) == [0]
+    assert np.allclose(values[0], matrix[4:, [0, 17]].T)
+
+    read = []
+    voxel_values = voxel_probe.voxel_values
+
+    def spy(fname, voxels):
+        read.append(voxels)
+        return voxel_values(fname, voxels)
+    spy.__name__ = voxel_values.__name__   # the same function, as far as the cached indexes can tell
+    monkeypatch.setattr(voxel_probe, 'voxel_values', spy)
+    index = voxel_probe.ProbeIndex(run_dir, [17, 0, 42])   # 0 and 17 come from their cache files
+    index.refresh()
+    assert read == [(42,)]
+    frames, values = index.histories()
+    assert np.allclose(values[0], matrix[4:, [17, 0, 42]].T)